@@ -8,11 +8,12 @@
 cdef class Grid:
     cdef:
         Py_ssize_t dims
-        double dz
+        public double dz
         double dzi
         double lz
-        Py_ssize_t gw
-        Py_ssize_t nz
-        Py_ssize_t nzg
+        public Py_ssize_t gw
+        public Py_ssize_t nz
+        public Py_ssize_t nzg
+        public Py_ssize_t ncol
         double [:] z
         double [:] z_half
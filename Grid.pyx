@@ -24,6 +24,8 @@ cdef class Grid:
     # Gr.dims.npl = nl[0] * nl[1] * nl[2]                           --> local number of pts in 3D grid
     # Gr.dims.npg = nlg[0] * nlg[1] * nlg[2] ( = nxg * nyg * nzg )  --> local number of pts in 3D grid incl. ghost pts
 
+    # Column model: Gr.nzg = nz + 2*gw points per column; Gr.ncol independent columns (ensemble members)
+
 
     def __init__(self,namelist):
         # dimensions = #velocity direction
@@ -40,6 +42,12 @@ cdef class Grid:
         self.nz = namelist['grid']['nz']
         self.nzg = self.nz + 2 * self.gw
 
+        # number of independent columns (ensemble members) that are advanced together
+        try:
+            self.ncol = namelist['grid']['ncol']
+        except:
+            self.ncol = 1
+
         self.compute_coordinates()
 
         return
@@ -0,0 +1,29 @@
+from Grid cimport Grid
+from PrognosticVariables cimport MeanVariables, SecondOrderMomenta
+from ReferenceState cimport ReferenceState
+from TimeStepping cimport TimeStepping
+from SparseSolvers cimport TDMA
+
+cdef class ImplicitDiffusion:
+    cdef:
+        public bint implicit
+        double theta
+        Py_ssize_t nsys
+        Py_ssize_t n
+        TDMA tdma
+        double [:] a
+        double [:] b
+        double [:] c
+        double [:] x
+        double [:] rhok_lower
+        double [:] rhok_upper
+        # per system: container (0 = M1, 1 = M2), offset in values, staggering (1 = w-grid), coefficient array and offset
+        long [:] sys_container
+        Py_ssize_t [:] sys_shift
+        long [:] sys_w_grid
+        long [:] sys_coeff
+        Py_ssize_t [:] sys_coeff_shift
+
+    cpdef initialize(self, Grid Gr, MeanVariables M1, SecondOrderMomenta M2)
+    cpdef update(self, Grid Gr, ReferenceState Ref, MeanVariables M1, SecondOrderMomenta M2, SGS, TimeStepping TS)
+    cpdef stats_io(self)
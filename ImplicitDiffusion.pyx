@@ -0,0 +1,199 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+from Grid cimport Grid
+from PrognosticVariables cimport PrognosticVariables, MeanVariables, SecondOrderMomenta
+from ReferenceState cimport ReferenceState
+from TimeStepping cimport TimeStepping
+from SparseSolvers cimport TDMA
+# from NetCDFIO cimport NetCDFIO_Stats
+
+import numpy as np
+cimport numpy as np
+
+'''
+Implicit vertical diffusion of all mean variables (M1) and second order momenta (M2):
+    (1 - theta dt L) phi^{n+1} = (1 + (1-theta) dt L) phi^n,      L phi = 1/rho0 \partialz(rho0 K \partialz phi)
+theta = 1.0: backward Euler (default); theta = 0.5: Crank-Nicolson
+The diffusion step is applied once per time step after the Runge-Kutta stages. All variables are solved in a single
+batched tridiagonal sweep over the physical levels (k = gw, ..., nzg-gw-1).
+
+Staggering (var_stagger of the frozen layout, as registered in add_variable):
+    phi-grid variables (u, v, th, qt, uu, vv, ww, ...): zero flux at the surface and at the top
+    w-grid variables (w, wu, wv, wth, ...): value below the surface (k=gw-1) and at the top (k=nzg-gw-1) held fixed
+K: viscosity for velocity-type variables, diffusivity for scalars (SGS.viscosity_M1, SGS.diffusivity_M1, ...)
+'''
+
+cdef class ImplicitDiffusion:
+    def __init__(self, namelist):
+        try:
+            self.implicit = namelist['diffusion']['implicit']
+        except:
+            self.implicit = True
+        try:
+            self.theta = namelist['diffusion']['implicit_theta']
+        except:
+            self.theta = 1.0
+        self.tdma = TDMA()
+        return
+
+    cpdef initialize(self, Grid Gr, MeanVariables M1, SecondOrderMomenta M2):
+        cdef:
+            Py_ssize_t n, i, s
+            Py_ssize_t vel_count, scalar_count
+            PrognosticVariables PV
+
+        self.nsys = Gr.ncol * (M1.nv + M2.nv)
+        self.n = Gr.nz
+        self.a = np.zeros((self.nsys*self.n),dtype=np.double,order='c')
+        self.b = np.zeros((self.nsys*self.n),dtype=np.double,order='c')
+        self.c = np.zeros((self.nsys*self.n),dtype=np.double,order='c')
+        self.x = np.zeros((self.nsys*self.n),dtype=np.double,order='c')
+        self.rhok_lower = np.zeros((self.n),dtype=np.double,order='c')
+        self.rhok_upper = np.zeros((self.n),dtype=np.double,order='c')
+
+        self.sys_container = np.zeros((self.nsys),dtype=np.int_,order='c')
+        self.sys_shift = np.zeros((self.nsys),dtype=np.intp,order='c')
+        self.sys_w_grid = np.zeros((self.nsys),dtype=np.int_,order='c')
+        self.sys_coeff = np.zeros((self.nsys),dtype=np.int_,order='c')
+        self.sys_coeff_shift = np.zeros((self.nsys),dtype=np.intp,order='c')
+
+        # coefficient arrays: 0 = viscosity_M1, 1 = diffusivity_M1, 2 = viscosity_M2, 3 = diffusivity_M2
+        # one system per column and variable (layout of values and SGS coefficients: (ncol, nv, nzg))
+        s = 0
+        for n in xrange(Gr.ncol):
+            for PV, container in ((M1, 0), (M2, 1)):
+                vel_count = 0
+                scalar_count = 0
+                for i in xrange(PV.nv):
+                    self.sys_container[s] = container
+                    self.sys_shift[s] = (n * PV.nv + i) * Gr.nzg
+                    self.sys_w_grid[s] = PV.var_stagger[i]
+                    if PV.var_type[i] == 0:
+                        self.sys_coeff[s] = 2 * container
+                        self.sys_coeff_shift[s] = (n * PV.nv_velocities + vel_count) * Gr.nzg
+                        vel_count += 1
+                    else:
+                        self.sys_coeff[s] = 2 * container + 1
+                        self.sys_coeff_shift[s] = (n * PV.nv_scalars + scalar_count) * Gr.nzg
+                        scalar_count += 1
+                    s += 1
+
+        self.tdma.initialize(self.n)
+        return
+
+
+    cpdef update(self, Grid Gr, ReferenceState Ref, MeanVariables M1, SecondOrderMomenta M2, SGS, TimeStepping TS):
+        if not self.implicit:
+            return
+
+        cdef:
+            Py_ssize_t s, j, k, sys_shift
+            Py_ssize_t gw = Gr.gw
+            Py_ssize_t n = self.n
+            double dzi2 = Gr.dzi * Gr.dzi
+            double dt = TS.dt
+            double theta = self.theta
+            double f, lower, upper, phi_lower, phi_upper, l_phi
+            double* values
+            double* K
+
+            double [:] viscosity_M1 = SGS.viscosity_M1
+            double [:] diffusivity_M1 = SGS.diffusivity_M1
+            double [:] viscosity_M2 = SGS.viscosity_M2
+            double [:] diffusivity_M2 = SGS.diffusivity_M2
+
+            double [:] rho0 = Ref.rho0
+            double [:] rho0_half = Ref.rho0_half
+            double [:] alpha0 = Ref.alpha0
+            double [:] alpha0_half = Ref.alpha0_half
+
+            double [:] a = self.a
+            double [:] b = self.b
+            double [:] c = self.c
+            double [:] x = self.x
+            double [:] rhok_lower = self.rhok_lower
+            double [:] rhok_upper = self.rhok_upper
+
+        # (1) Assemble the tridiagonal systems
+        for s in xrange(self.nsys):
+            if self.sys_container[s] == 0:
+                values = &M1.values[self.sys_shift[s]]
+            else:
+                values = &M2.values[self.sys_shift[s]]
+            if self.sys_coeff[s] == 0:
+                K = &viscosity_M1[self.sys_coeff_shift[s]]
+            elif self.sys_coeff[s] == 1:
+                K = &diffusivity_M1[self.sys_coeff_shift[s]]
+            elif self.sys_coeff[s] == 2:
+                K = &viscosity_M2[self.sys_coeff_shift[s]]
+            else:
+                K = &diffusivity_M2[self.sys_coeff_shift[s]]
+            sys_shift = s * n
+
+            with nogil:
+                if self.sys_w_grid[s] == 1:
+                    # w-grid: faces at z_half[k] (lower) and z_half[k+1] (upper)
+                    for j in xrange(n):
+                        k = gw + j
+                        rhok_lower[j] = rho0_half[k] * 0.5 * (K[k-1] + K[k])
+                        rhok_upper[j] = rho0_half[k+1] * 0.5 * (K[k] + K[k+1])
+                    for j in xrange(n-1):
+                        k = gw + j
+                        f = alpha0[k] * dzi2
+                        lower = f * rhok_lower[j]
+                        upper = f * rhok_upper[j]
+                        l_phi = upper * (values[k+1] - values[k]) - lower * (values[k] - values[k-1])
+                        a[sys_shift+j] = -theta * dt * lower
+                        b[sys_shift+j] = 1.0 + theta * dt * (lower + upper)
+                        c[sys_shift+j] = -theta * dt * upper
+                        x[sys_shift+j] = values[k] + (1.0 - theta) * dt * l_phi
+                    # fixed value below the first level (k=gw-1) enters the right hand side
+                    x[sys_shift] -= a[sys_shift] * values[gw-1]
+                    a[sys_shift] = 0.0
+                    # fixed value at the top (k=nzg-gw-1)
+                    a[sys_shift+n-1] = 0.0
+                    b[sys_shift+n-1] = 1.0
+                    c[sys_shift+n-1] = 0.0
+                    x[sys_shift+n-1] = values[gw+n-1]
+                else:
+                    # phi-grid: faces at z[k-1] (lower) and z[k] (upper); zero flux through the bottom and top faces
+                    for j in xrange(n):
+                        k = gw + j
+                        rhok_lower[j] = rho0[k-1] * 0.5 * (K[k-1] + K[k])
+                        rhok_upper[j] = rho0[k] * 0.5 * (K[k] + K[k+1])
+                    rhok_lower[0] = 0.0
+                    rhok_upper[n-1] = 0.0
+                    for j in xrange(n):
+                        k = gw + j
+                        f = alpha0_half[k] * dzi2
+                        lower = f * rhok_lower[j]
+                        upper = f * rhok_upper[j]
+                        l_phi = upper * (values[k+1] - values[k]) - lower * (values[k] - values[k-1])
+                        a[sys_shift+j] = -theta * dt * lower
+                        b[sys_shift+j] = 1.0 + theta * dt * (lower + upper)
+                        c[sys_shift+j] = -theta * dt * upper
+                        x[sys_shift+j] = values[k] + (1.0 - theta) * dt * l_phi
+
+        # (2) Solve all systems in one sweep
+        with nogil:
+            self.tdma.solve_batched(self.nsys, &x[0], &a[0], &b[0], &c[0])
+
+        # (3) Copy the solution back to the prognostic variables
+        for s in xrange(self.nsys):
+            if self.sys_container[s] == 0:
+                values = &M1.values[self.sys_shift[s]]
+            else:
+                values = &M2.values[self.sys_shift[s]]
+            sys_shift = s * n
+            with nogil:
+                for j in xrange(n):
+                    values[gw+j] = x[sys_shift+j]
+        return
+
+    # cpdef stats_io(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, NetCDFIO_Stats NS):
+    cpdef stats_io(self):
+        return
@@ -25,12 +25,14 @@ cdef class InitializationBase:
     cpdef initialize_surface(self, Grid Gr, ReferenceState Ref)
     cpdef initialize_io(self, NetCDFIO_Stats Stats)
     cpdef update_surface(self, MeanVariables MV)
+    cpdef perturb_profiles(self, Grid Gr, ReferenceState Ref, MeanVariables M1, random_state)
     # cpdef initialize_entropy(self, double [:] theta, Grid Gr, ReferenceState Ref, MeanVariables MV)
 
 
 cdef class InitSoares(InitializationBase):
     cpdef initialize_reference(self, Grid Gr, ReferenceState Ref, NetCDFIO_Stats NS)
     cpdef initialize_profiles(self, Grid Gr, ReferenceState Ref, MeanVariables M1, SecondOrderMomenta M2, NetCDFIO_Stats NS)
+    cpdef perturb_profiles(self, Grid Gr, ReferenceState Ref, MeanVariables M1, random_state)
     # cpdef initialize_surface(self, Grid Gr, ReferenceState Ref )
     # cpdef initialize_io(self, NetCDFIO_Stats Stats)
     # cpdef update_surface(self, MeanVariables MV)
@@ -98,6 +98,9 @@ cdef class InitializationBase:
         return
     cpdef update_surface(self, MeanVariables MV):
         return
+    cpdef perturb_profiles(self, Grid Gr, ReferenceState Ref, MeanVariables M1, random_state):
+        # perturbations added to a forked member (Simulation1d.fork); random_state: np.random.RandomState
+        return
 
     # cpdef initialize_entropy(self, double [:] theta, Grid Gr, ReferenceState Ref, MeanVariables M1):
     #     cdef:
@@ -133,9 +136,8 @@ cdef class InitSoares(InitializationBase):
 
     cpdef initialize_reference(self, Grid Gr, ReferenceState Ref, NetCDFIO_Stats NS):
         #Generate the reference profiles
-        Ref.Pg = 1.0e5      # Pressure at ground (Soares)
-        Ref.Tg = 300.0      # Temperature at ground (Soares)
-        Ref.qtg = 5e-3      # Total water mixing ratio at surface: qt = 5 g/kg (Soares)
+        # Pressure at ground, temperature at ground, total water mixing ratio at surface: qt = 5 g/kg (Soares)
+        Ref.set_surface(1.0e5, 300.0, 5e-3)
         Ref.u0 = 0.01       # velocities removed in Galilean transformation (Soares: u = 0.01 m/s, IOP: 0.0 m/s)
         Ref.v0 = 0.0        # (Soares: v = 0.0 m/s)
 
@@ -149,7 +151,8 @@ cdef class InitSoares(InitializationBase):
         # (1) Generate initial perturbations
         self.pert_min = 0.0
         self.pert_max = 200.0
-        cdef double [:] theta_pert = np.random.random_sample(Gr.nzg)
+        # each column of the ensemble gets its own random draw
+        cdef double [:] theta_pert = np.random.random_sample(Gr.ncol*Gr.nzg)
         cdef double theta_pert_
 
         # (2) Initialize Mean Variables
@@ -160,7 +163,7 @@ cdef class InitSoares(InitializationBase):
             Py_ssize_t v_varshift = M1.get_varshift(Gr,'v')
             Py_ssize_t w_varshift = M1.get_varshift(Gr,'w')
             Py_ssize_t th_varshift = M1.get_varshift(Gr,'th')
-            Py_ssize_t k
+            Py_ssize_t k, n, col_shift
             # Py_ssize_t e_varshift
             double [:] theta = np.empty((Gr.nzg),dtype=np.double,order='c')
             double temp
@@ -182,23 +185,27 @@ cdef class InitSoares(InitializationBase):
             double ql = 0.0
             double qi = 0.0
         print('Initializing Velocity and Entropy')
-        for k in xrange(Gr.nzg):
-            if Gr.z_half[k] < 200.0:
-                theta_pert_ = (theta_pert[k] - 0.5)* 0.1
-            else:
-                theta_pert_ = 0.0
-            temp = (theta[k] + theta_pert_)*exner_c(Ref.p0_half[k])
-            M1.values[th_varshift + k] = entropy_from_tp(Ref.p0_half[k],temp,qt,ql,qi)               # s = Thermodynamics.entropy(p_half[k],temperature_half[k],self.qtg,ql_half[k],qi_half[k])
-            M1.values[u_varshift + k] = 0.0
-            M1.values[v_varshift + k] = 0.0
-            M1.values[w_varshift + k] = 0.0
+        for n in xrange(Gr.ncol):
+            col_shift = M1.get_colshift(Gr, n)
+            for k in xrange(Gr.nzg):
+                if Gr.z_half[k] < 200.0:
+                    theta_pert_ = (theta_pert[n*Gr.nzg+k] - 0.5)* 0.1
+                else:
+                    theta_pert_ = 0.0
+                temp = (theta[k] + theta_pert_)*exner_c(Ref.p0_half[k])
+                M1.values[col_shift + th_varshift + k] = entropy_from_tp(Ref.p0_half[k],temp,qt,ql,qi)               # s = Thermodynamics.entropy(p_half[k],temperature_half[k],self.qtg,ql_half[k],qi_half[k])
+                M1.values[col_shift + u_varshift + k] = 0.0
+                M1.values[col_shift + v_varshift + k] = 0.0
+                M1.values[col_shift + w_varshift + k] = 0.0
 
         # (2) Initialize Second Order Momenta
         print(M2.name_index.keys())
         cdef:
             Py_ssize_t ww_varshift = M2.get_varshift(Gr,'ww')
-        for k in xrange(Gr.nzg):
-            M2.values[ww_varshift + k] = 0.0
+        for n in xrange(Gr.ncol):
+            col_shift = M2.get_colshift(Gr, n)
+            for k in xrange(Gr.nzg):
+                M2.values[col_shift + ww_varshift + k] = 0.0
 
 
          # # if 'e' in PV.name_index:
@@ -210,6 +217,23 @@ cdef class InitSoares(InitializationBase):
 
 
 
+    cpdef perturb_profiles(self, Grid Gr, ReferenceState Ref, MeanVariables M1, random_state):
+        # same perturbations as in initialize_profiles (fluctuation height = 200m; amplitude = 0.1 K), added to the
+        # entropy of the (spun-up) state: ds = cpd * dtheta / theta with theta ~ Tg near the surface
+        cdef:
+            Py_ssize_t th_varshift = M1.get_varshift(Gr,'th')
+            Py_ssize_t k, n, col_shift
+            double [:] theta_pert = random_state.random_sample(Gr.ncol*Gr.nzg)
+
+        for n in xrange(Gr.ncol):
+            col_shift = M1.get_colshift(Gr, n)
+            for k in xrange(Gr.nzg):
+                if Gr.z_half[k] < 200.0:
+                    M1.values[col_shift + th_varshift + k] += cpd * (theta_pert[n*Gr.nzg+k] - 0.5)* 0.1 / Ref.Tg
+        return
+
+
+
 cdef class InitBomex(InitializationBase):
 # cdef class InitSoares:
     def __init__(self):
@@ -218,9 +242,7 @@ cdef class InitBomex(InitializationBase):
 
     cpdef initialize_reference(self, Grid Gr, ReferenceState Ref, NetCDFIO_Stats NS):
         #Generate the reference profiles
-        Ref.Pg = 0.0
-        Ref.Tg = 0.0
-        Ref.qtg = 0.0
+        Ref.set_surface(0.0, 0.0, 0.0)
         Ref.u0 = 0.0
         Ref.v0 = 0.0
 
@@ -244,9 +266,8 @@ cdef class InitTest(InitializationBase):
 
     cpdef initialize_reference(self, Grid Gr, ReferenceState Ref, NetCDFIO_Stats NS):
         #Generate the reference profiles
-        Ref.Pg = 1.0e5      # Pressure at ground (Soares)
-        Ref.Tg = 300.0      # Temperature at ground (Soares)
-        Ref.qtg = 5e-3      # Total water mixing ratio at surface: qt = 5 g/kg (Soares)
+        # Pressure at ground, temperature at ground, total water mixing ratio at surface: qt = 5 g/kg (Soares)
+        Ref.set_surface(1.0e5, 300.0, 5e-3)
         Ref.u0 = 0.01       # velocities removed in Galilean transformation (Soares: u = 0.01 m/s, IOP: 0.0 m/s)
         Ref.v0 = 0.0        # (Soares: v = 0.0 m/s)
 
@@ -268,7 +289,7 @@ cdef class InitTest(InitializationBase):
             Py_ssize_t v_varshift = M1.get_varshift(Gr,'v')
             Py_ssize_t w_varshift = M1.get_varshift(Gr,'w')
             Py_ssize_t th_varshift = M1.get_varshift(Gr,'th')
-            Py_ssize_t k
+            Py_ssize_t k, n, col_shift
             Py_ssize_t nv_vel = M1.nv_velocities
 
             # double [:] s = M1.values[s_varshift:s_varshift+Gr.nzg]
@@ -276,11 +297,13 @@ cdef class InitTest(InitializationBase):
             # double [:] p0 = Ref.p0_half
 
         # (i) Theta (potential temperature) profile (Soares) incl. perturbations
-        for k in xrange(Gr.nzg):
-            M1.values[th_varshift+k] = 6000.0
-            M1.values[u_varshift+k] = 0.0
-            M1.values[v_varshift+k] = 0.0
-            M1.values[w_varshift+k] = 0.0
+        for n in xrange(Gr.ncol):
+            col_shift = M1.get_colshift(Gr, n)
+            for k in xrange(Gr.nzg):
+                M1.values[col_shift+th_varshift+k] = 6000.0
+                M1.values[col_shift+u_varshift+k] = 0.0
+                M1.values[col_shift+v_varshift+k] = 0.0
+                M1.values[col_shift+w_varshift+k] = 0.0
 
         # # (ii) Velocities & Entropy
         cdef:
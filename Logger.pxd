@@ -0,0 +1,29 @@
+cdef enum:
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+cdef class Logger:
+    cdef:
+        public int level
+        public double min_interval
+        dict last_time
+        dict suppressed
+
+    cdef log(self, int level, str message, key=*)
+
+    # check before building expensive messages: if Log.enabled(DEBUG): Log.debug('...' + str(...))
+    cdef inline bint enabled(self, int level):
+        return level >= self.level
+    cdef inline debug(self, str message, key=None):
+        if DEBUG >= self.level:
+            self.log(DEBUG, message, key)
+    cdef inline info(self, str message, key=None):
+        if INFO >= self.level:
+            self.log(INFO, message, key)
+    cdef inline warning(self, str message, key=None):
+        if WARNING >= self.level:
+            self.log(WARNING, message, key)
+    cdef inline error(self, str message, key=None):
+        self.log(ERROR, message, key)
@@ -0,0 +1,79 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+import sys
+import time
+
+'''
+Log messages of the time loop
+
+    namelist['logging']['level']:           'debug', 'info' (default), 'warning' or 'error'
+    namelist['logging']['min_interval']:    minimum wall clock time (s) between two messages with the same key
+                                            (default 0.0: no rate limit); errors are never suppressed
+
+usage (in a .pyx):
+    cimport Logger
+    import Logger
+    cdef Logger.Logger Log = Logger.Log
+
+    Log.debug('Turb: update M1')                                    # constant message: nothing is formatted
+    if Log.enabled(Logger.DEBUG):                                   # expensive message: only built if enabled
+        Log.debug('M2: name index ' + str(M2.name_index))
+    Log.info('time: ' + str(t), 'time')                             # rate limited by key 'time'
+'''
+
+level_names = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+level_values = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+
+
+cdef class Logger:
+    def __init__(self):
+        self.level = INFO
+        self.min_interval = 0.0
+        self.last_time = {}
+        self.suppressed = {}
+        return
+
+    cdef log(self, int level, str message, key=None):
+        cdef double now
+
+        if self.min_interval > 0.0 and level < ERROR:
+            if key is None:
+                key = message
+            now = time.time()
+            if key in self.last_time and now - self.last_time[key] < self.min_interval:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return
+            self.last_time[key] = now
+            n = self.suppressed.pop(key, 0)
+            if n > 0:
+                message = message + ' (' + str(n) + ' suppressed)'
+
+        print(level_names[level] + ': ' + message)
+        return
+
+
+Log = Logger()
+
+
+def configure(namelist):
+    cdef Logger Log_ = Log
+    try:
+        level = namelist['logging']['level']
+    except:
+        level = 'info'
+    try:
+        Log_.level = level_values[level]
+    except KeyError:
+        print('logging level ' + str(level) + ' not known --> using info')
+        Log_.level = INFO
+    try:
+        Log_.min_interval = namelist['logging']['min_interval']
+    except:
+        Log_.min_interval = 0.0
+    Log_.last_time = {}
+    Log_.suppressed = {}
+    return
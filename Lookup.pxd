@@ -0,0 +1,53 @@
+cdef struct lookup_struct:
+    double x_min
+    double x_max
+    double dx
+    double dxi
+    Py_ssize_t n
+    double *table
+
+cdef class Lookup:
+    cdef:
+        lookup_struct ls
+        object table_array
+        public int order
+
+    cpdef initialize(self, double x_min, double x_max, double [:] table)
+    cpdef initialize_function(self, f, double x_min, double x_max, double dx)
+    cpdef double lookup(self, double x)
+    cpdef dict accuracy(self, f, Py_ssize_t n_test)
+
+    cdef inline double fast_lookup(self, double x) nogil:
+        if self.order == 3:
+            return lookup_cubic(&self.ls, x)
+        return lookup_linear(&self.ls, x)
+
+
+# outside of [x_min, x_max] the first / last interval is extrapolated
+cdef inline double lookup_linear(lookup_struct *ls, double x) nogil:
+    cdef:
+        double xi = (x - ls.x_min) * ls.dxi
+        Py_ssize_t i = <Py_ssize_t> xi
+        double w
+    if xi < 0.0:
+        i = 0
+    elif i > ls.n - 2:
+        i = ls.n - 2
+    w = xi - i
+    return (1.0 - w) * ls.table[i] + w * ls.table[i+1]
+
+# cubic interpolation (Lagrange polynomial through 4 points; the stencil is shifted at the ends of the table)
+cdef inline double lookup_cubic(lookup_struct *ls, double x) nogil:
+    cdef:
+        double xi = (x - ls.x_min) * ls.dxi
+        Py_ssize_t i = <Py_ssize_t> xi - 1
+        double t
+    if xi < 1.0:
+        i = 0
+    elif i > ls.n - 4:
+        i = ls.n - 4
+    t = xi - i
+    return (- (t - 1.0) * (t - 2.0) * (t - 3.0) / 6.0 * ls.table[i]
+            + t * (t - 2.0) * (t - 3.0) * 0.5 * ls.table[i+1]
+            - t * (t - 1.0) * (t - 3.0) * 0.5 * ls.table[i+2]
+            + t * (t - 1.0) * (t - 2.0) / 6.0 * ls.table[i+3])
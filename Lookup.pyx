@@ -0,0 +1,72 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+import sys
+import numpy as np
+cimport numpy as np
+
+'''
+Lookup table on an equidistant grid x_min, x_min + dx, ..., x_max (e.g. latent heat and saturation vapour pressure
+as functions of temperature, see thermodynamic_functions.configure)
+    - order = 1: linear interpolation; order = 3: cubic (4-point Lagrange) interpolation
+    - fast_lookup (nogil) and lookup_linear / lookup_cubic on the lookup_struct are declared inline in Lookup.pxd
+    - accuracy(f, n_test): maximum absolute and relative error with respect to f at n_test points in [x_min, x_max]
+'''
+
+cdef class Lookup:
+    def __init__(self, int order=1):
+        if order != 1 and order != 3:
+            print('Lookup: order must be 1 (linear) or 3 (cubic), not ' + str(order))
+            sys.exit()
+        self.order = order
+        self.table_array = None
+        return
+
+    cpdef initialize(self, double x_min, double x_max, double [:] table):
+        cdef:
+            double [:] table_ = np.ascontiguousarray(table, dtype=np.double)
+        if table_.shape[0] < 4:
+            print('Lookup: the table needs at least 4 points')
+            sys.exit()
+        # the table is owned by this instance; lookup_struct only holds a pointer to it
+        self.table_array = table_
+        self.ls.x_min = x_min
+        self.ls.x_max = x_max
+        self.ls.n = table_.shape[0]
+        self.ls.dx = (x_max - x_min) / (self.ls.n - 1)
+        self.ls.dxi = 1.0 / self.ls.dx
+        self.ls.table = &table_[0]
+        return
+
+    cpdef initialize_function(self, f, double x_min, double x_max, double dx):
+        cdef:
+            Py_ssize_t n = <Py_ssize_t> ((x_max - x_min) / dx + 0.5) + 1
+            double [:] x = np.linspace(x_min, x_max, n)
+            double [:] table = np.empty(n, dtype=np.double)
+            Py_ssize_t i
+
+        for i in xrange(n):
+            table[i] = f(x[i])
+        self.initialize(x_min, x_max, table)
+        return
+
+    cpdef double lookup(self, double x):
+        return self.fast_lookup(x)
+
+    cpdef dict accuracy(self, f, Py_ssize_t n_test):
+        cdef:
+            double [:] x = np.linspace(self.ls.x_min, self.ls.x_max, n_test)
+            Py_ssize_t i
+            double exact, err, max_abs = 0.0, max_rel = 0.0
+
+        for i in xrange(n_test):
+            exact = f(x[i])
+            err = abs(self.fast_lookup(x[i]) - exact)
+            max_abs = max(max_abs, err)
+            if exact != 0.0:
+                max_rel = max(max_rel, err / abs(exact))
+        return {'max_abs_error': max_abs, 'max_rel_error': max_rel, 'order': self.order, 'dx': self.ls.dx,
+                'x_min': self.ls.x_min, 'x_max': self.ls.x_max, 'n': self.ls.n}
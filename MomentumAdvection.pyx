@@ -13,6 +13,10 @@ from ReferenceState cimport ReferenceState
 import numpy as np
 cimport numpy as np
 import sys
+cimport Logger
+import Logger
+
+cdef Logger.Logger Log = Logger.Log
 
 cdef class MomentumAdvection:
     def __init__(self, namelist):
@@ -29,8 +33,8 @@ cdef class MomentumAdvection:
     # cpdef initialize(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, NetCDFIO_Stats NS):
     cpdef initialize(self, Grid Gr, MeanVariables M1):
         # initialize scheme for Mean Variables & Second Order Momenta
-        self.flux = np.zeros((M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
-        self.tendencies = np.zeros((M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
+        self.flux = np.zeros((Gr.ncol*M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
+        self.tendencies = np.zeros((Gr.ncol*M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
 
         return
 
@@ -62,7 +66,7 @@ cdef class MomentumAdvection:
 
     # cpdef update(self, Grid.Grid Gr, ReferenceState.ReferenceState Rs, PrognosticVariables.PrognosticVariables PV):
     cpdef update_M1_2nd(self, Grid Gr, ReferenceState Ref, MeanVariables M1):
-        print('Momentum Advection M1: update 2nd')
+        Log.debug('Momentum Advection M1: update 2nd')
         # (1) update tendencies for Mean Variables
         #       - only vertical advection
         # (1a) advection by mean velocity: 1/rho0*\partialz(rho0 <w><u_i>)
@@ -70,7 +74,8 @@ cdef class MomentumAdvection:
         cdef:
             Py_ssize_t d_advected       # Direction of advected momentum component
             Py_ssize_t shift_advected
-            Py_ssize_t w_varshift = M1.get_varshift(Gr,'w')
+            Py_ssize_t w_varshift = M1.shift.w
+            Py_ssize_t n, col_shift, flux_col_shift, vel_shift, w_shift, flux_shift
 
             Py_ssize_t k
             Py_ssize_t kmax = Gr.nzg-Gr.gw
@@ -98,37 +103,41 @@ cdef class MomentumAdvection:
 
         # print('MomentumAdvection: ', vel_advecting.shape, vel_advecting.size, Gr.nzg)
 
-        for d_advected in xrange(Gr.dims):
-            shift_advected = M1.velocity_directions[d_advected] * Gr.nzg
+        for n in xrange(Gr.ncol):
+            col_shift = M1.get_colshift(Gr, n)                  # shift of column n in M1.values
+            flux_col_shift = n * M1.nv_velocities * Gr.nzg      # shift of column n in flux and tendency
+            for d_advected in xrange(Gr.dims):
+                shift_advected = M1.velocity_directions[d_advected] * Gr.nzg
+                vel_shift = col_shift + shift_advected
+                w_shift = col_shift + w_varshift
+                flux_shift = flux_col_shift + shift_advected
+
+                if(d_advected == 2):
+                    for k in xrange(Gr.nzg-1):
+                        # vel_advecting_int = 0.5*(vel_advecting[k]+vel_advecting[k+1])
+                        vel_advecting_int = 0.5*(velocities[w_shift+k]+velocities[w_shift+k+1])
+                        vel_advected_int = 0.5*(velocities[vel_shift+k]+velocities[vel_shift+k+1])
+                        flux[flux_shift+k] = rho0_half[k+1]*vel_advecting_int*vel_advected_int
+                        # print('d_advected:', d_advected, 'M1 Momentum flux:', flux[k])
+                else:
+                    for k in xrange(Gr.nzg-1):
+                        vel_advecting_int = 0.5*(velocities[w_shift+k]+velocities[w_shift+k+1])
+                        vel_advected_int = 0.5*(velocities[vel_shift+k]+velocities[vel_shift+k+1])
+                        flux[flux_shift+k] = rho0[k]*vel_advecting_int*vel_advected_int
+                        # print('d_advected:', d_advected, 'M1 Momentum flux:', flux[k])
+                # print(d_advected, shift_advected, shift_advected+k, Gr.nzg)
+
+                if(d_advected == 2):
+                    for k in xrange(gw,kmax):
+                        tendency[flux_shift+k] = \
+                            alpha0[k]*(flux[flux_shift+k] - flux[flux_shift+k+sm1_ed])*dzi
+                else:
+                    for k in xrange(gw,kmax):
+                        tendency[flux_shift+k] = \
+                            alpha0_half[k]*(flux[flux_shift+k]-flux[flux_shift+k+sm1_ed])*dzi
 
-            if(d_advected == 2):
-                for k in xrange(Gr.nzg):
-                    # vel_advecting_int = 0.5*(vel_advecting[k]+vel_advecting[k+1])
-                    vel_advecting_int = 0.5*(velocities[w_varshift+k]+velocities[w_varshift+k+1])
-                    vel_advected_int = 0.5*(velocities[shift_advected+k]+velocities[shift_advected+k+1])
-                    flux[shift_advected+k] = rho0_half[k+1]*vel_advecting_int*vel_advected_int
-                    # print('d_advected:', d_advected, 'M1 Momentum flux:', flux[k])
-            else:
                 for k in xrange(Gr.nzg):
-                    vel_advecting_int = 0.5*(velocities[w_varshift+k]+velocities[w_varshift+k+1])
-                    vel_advected_int = 0.5*(velocities[shift_advected+k]+velocities[shift_advected+k+1])
-                    flux[shift_advected+k] = rho0[k]*vel_advecting_int*vel_advected_int
-                    # print('d_advected:', d_advected, 'M1 Momentum flux:', flux[k])
-            # print(d_advected, shift_advected, shift_advected+k, Gr.nzg)
-
-            if(d_advected == 2):
-                for k in xrange(gw,kmax):
-                    # pass
-                    tendency[shift_advected+k] = \
-                        alpha0[k]*(flux[shift_advected+k] - flux[shift_advected+k+sm1_ed])*dzi
-            else:
-                for k in xrange(gw,kmax):
-                    # pass
-                    tendency[shift_advected+k] = \
-                        alpha0_half[k]*(flux[shift_advected+k]-flux[shift_advected+k+sm1_ed])*dzi
-
-            for k in xrange(Gr.nzg):
-                tendency_M1[shift_advected+k] += tendency[shift_advected+k]
+                    tendency_M1[vel_shift+k] += tendency[flux_shift+k]
 
         return
 
@@ -0,0 +1,86 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+from Grid cimport Grid
+from PrognosticVariables cimport MeanVariables
+from ReferenceState cimport ReferenceState
+# from NetCDFIO cimport NetCDFIO_Stats
+
+import numpy as np
+cimport numpy as np
+
+cdef class MomentumDiffusion:
+    def __init__(self, namelist):
+        # with implicit vertical diffusion (ImplicitDiffusion) the explicit tendencies are not computed
+        try:
+            self.implicit = namelist['diffusion']['implicit']
+        except:
+            self.implicit = True
+        return
+
+    cpdef initialize(self, Grid Gr, MeanVariables M1):
+        self.flux = np.zeros((Gr.ncol*M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
+        self.tendencies = np.zeros((Gr.ncol*M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
+        return
+
+    cpdef update(self, Grid Gr, ReferenceState Ref, MeanVariables M1, SGS):
+        # explicit vertical diffusion of the mean velocities: 1/rho0*\partialz(rho0 nu \partialz u_i)
+        #       u,v: on phi-grid    --> flux on w-grid
+        #       w: on w-grid        --> flux on phi-grid
+        # zero flux at the surface and at the top of the domain for u,v; w is held fixed at the surface and top
+        if self.implicit:
+            return
+
+        cdef:
+            Py_ssize_t i, k
+            Py_ssize_t n, col_shift, var_shift, flux_shift
+            Py_ssize_t vel_count
+            Py_ssize_t w_index = M1.velocity_directions[2]
+            Py_ssize_t kmin = Gr.gw
+            Py_ssize_t kmax = Gr.nzg - Gr.gw
+            double dzi = Gr.dzi
+
+            double [:] values = M1.values
+            double [:] tendency_M1 = M1.tendencies
+            double [:] flux = self.flux
+            double [:] tendency = self.tendencies
+            double [:] viscosity = SGS.viscosity_M1
+
+            double [:] rho0 = Ref.rho0
+            double [:] rho0_half = Ref.rho0_half
+            double [:] alpha0 = Ref.alpha0
+            double [:] alpha0_half = Ref.alpha0_half
+
+        for n in xrange(Gr.ncol):
+            col_shift = M1.get_colshift(Gr, n)
+            vel_count = 0
+            for i in xrange(M1.nv):
+                if M1.var_type[i] == 0:
+                    var_shift = col_shift + i * Gr.nzg
+                    flux_shift = (n * M1.nv_velocities + vel_count) * Gr.nzg
+                    with nogil:
+                        if i == w_index:
+                            for k in xrange(kmin-1,kmax-1):
+                                flux[flux_shift+k] = -rho0_half[k+1] * 0.5*(viscosity[flux_shift+k]+viscosity[flux_shift+k+1]) \
+                                                     * (values[var_shift+k+1]-values[var_shift+k]) * dzi
+                            for k in xrange(kmin,kmax-1):
+                                tendency[flux_shift+k] = -alpha0[k] * (flux[flux_shift+k]-flux[flux_shift+k-1]) * dzi
+                                tendency_M1[var_shift+k] += tendency[flux_shift+k]
+                        else:
+                            for k in xrange(kmin-1,kmax):
+                                flux[flux_shift+k] = -rho0[k] * 0.5*(viscosity[flux_shift+k]+viscosity[flux_shift+k+1]) \
+                                                     * (values[var_shift+k+1]-values[var_shift+k]) * dzi
+                            flux[flux_shift+kmin-1] = 0.0
+                            flux[flux_shift+kmax-1] = 0.0
+                            for k in xrange(kmin,kmax):
+                                tendency[flux_shift+k] = -alpha0_half[k] * (flux[flux_shift+k]-flux[flux_shift+k-1]) * dzi
+                                tendency_M1[var_shift+k] += tendency[flux_shift+k]
+                    vel_count += 1
+        return
+
+    # cpdef stats_io(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, NetCDFIO_Stats NS):
+    cpdef stats_io(self):
+        return
@@ -12,24 +12,59 @@ cdef class NetCDFIO_Stats:
         str stats_file_name
         str stats_path
         str output_path
-        str path_plus_file
+        public str path_plus_file
         str uuid
 
         public double last_output_time
         public double frequency
         public bint do_output
 
+        # deferred schema registration
+        public bint deferred
+        bint schema_written
+        Py_ssize_t chunk_t
+        list profile_names
+        list ts_names
+        list reference_names
+        dict reference_data
+
+        # buffered output
+        public bint buffered
+        Py_ssize_t n_buffered
+        object buffer_t
+        dict profile_buffers
+        dict ts_buffers
+        bint zlib
+        bint shuffle
+
+        # asynchronous output (writer thread)
+        public bint asynchronous
+        Py_ssize_t queue_size
+        object write_queue
+        object free_buffers
+        object writer
+        object writer_error
+
     cpdef initialize(self, dict namelist, Grid.Grid Gr)
     cpdef setup_stats_file(self, Grid.Grid Gr)
+    cpdef write_schema(self, Grid.Grid Gr)
+    cdef create_groups(self, root_grp, Grid.Grid Gr)
+    cpdef NetCDFIO_Stats branch(self, Py_ssize_t member)
     cpdef add_profile(self, var_name)
     cpdef add_reference_profile(self, var_name, Grid.Grid Gr)
     cpdef add_ts(self, var_name, Grid.Grid Gr)
     cpdef open_files(self)
     cpdef close_files(self)
+    cpdef flush(self)
+    cpdef drain(self)
+    cpdef finish(self)
+    cdef check_writer(self)
+    cpdef start_writer(self)
     cpdef write_profile(self, var_name, double[:] data)
     cpdef write_reference_profile(self, var_name, double[:] data)
     cpdef write_ts(self, var_name, double data)
     cpdef write_simulation_time(self, double t)
+    cpdef write_timers(self, list names, totals, counts, histogram, bin_edges)
 
 
 
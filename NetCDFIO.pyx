@@ -6,7 +6,13 @@
 
 import netCDF4 as nc
 import os
+import sys
 import shutil
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 # cimport ParallelMPI
 # cimport TimeStepping
 cimport PrognosticVariables
@@ -21,6 +27,20 @@ cdef class NetCDFIO_Stats:
         self.root_grp = None
         self.profiles_grp = None
         self.ts_grp = None
+        self.deferred = False
+        self.schema_written = False
+        self.profile_names = []
+        self.ts_names = []
+        self.reference_names = []
+        self.reference_data = {}
+        self.buffered = False
+        self.n_buffered = 0
+        self.buffer_t = None
+        self.profile_buffers = {}
+        self.ts_buffers = {}
+        self.asynchronous = False
+        self.writer = None
+        self.writer_error = None
         return
 
     @cython.wraparound(True)
@@ -31,6 +51,50 @@ cdef class NetCDFIO_Stats:
         self.uuid = str(namelist['meta']['uuid'])
         self.frequency = namelist['stats_io']['frequency']
 
+        # deferred setup: add_profile, add_ts, add_reference_profile and write_reference_profile only register the
+        # variables; the file is created with all of them in write_schema (one open instead of one per variable).
+        # Variables registered after write_schema are added to the file directly.
+        try:
+            self.deferred = namelist['stats_io']['deferred_setup']
+        except:
+            self.deferred = True
+        # chunk length along t of the profile and timeseries variables
+        try:
+            self.chunk_t = namelist['stats_io']['chunk_t']
+        except:
+            self.chunk_t = 16
+        # buffered output: keep chunk_t output times in memory and write them with one open of the file (flush)
+        try:
+            self.buffered = namelist['stats_io']['buffered']
+        except:
+            self.buffered = True
+        self.n_buffered = 0
+        self.buffer_t = np.zeros(self.chunk_t, dtype=np.double)
+        # optional compression of the profile and timeseries variables
+        # asynchronous output: buffered output is written by a writer thread; queue_size = number of flushes that
+        # can be pending before the simulation waits for the writer
+        try:
+            self.asynchronous = namelist['stats_io']['asynchronous']
+        except:
+            self.asynchronous = False
+        try:
+            self.queue_size = namelist['stats_io']['queue_size']
+        except:
+            self.queue_size = 2
+        if self.asynchronous and not self.buffered:
+            print('NetCDFIO_Stats: asynchronous output requires buffered output --> buffered = True')
+            self.buffered = True
+        if self.asynchronous:
+            self.start_writer()
+        try:
+            self.zlib = namelist['stats_io']['zlib']
+        except:
+            self.zlib = False
+        try:
+            self.shuffle = namelist['stats_io']['shuffle']
+        except:
+            self.shuffle = True
+
         # Setup the statistics output path
         outpath = str(os.path.join(namelist['output']['output_root'] + 'Output.' + namelist['meta']['simname'] + '.' + self.uuid[-5:]))
         print(outpath)
@@ -48,20 +112,26 @@ cdef class NetCDFIO_Stats:
 
         # Setup the restart repository
         self.path_plus_file = str( self.stats_path + '/' + 'Stats.' + namelist['meta']['simname'] + '.nc')
-        # if os.path.exists(self.path_plus_file):
-        #     for i in range(100):
-        #         res_name = 'Restart_'+str(i)
-        #         print "Here " + res_name
-        #         if os.path.exists(self.path_plus_file):
-        #             self.path_plus_file = str( self.stats_path + '/' + 'Stats.' + namelist['meta']['simname']
-        #                    + '.' + res_name + '.nc')
-        #         else:
-        #             break
+        # a restarted run writes to a new stats file (Stats.<simname>.Restart_<i>.nc) in the same directory;
+        # a fresh run overwrites the stats file of a previous run
+        try:
+            init_from_restart = namelist['restart']['init_from']
+        except:
+            init_from_restart = False
+        if init_from_restart and os.path.exists(self.path_plus_file):
+            for i in range(100):
+                res_name = 'Restart_'+str(i)
+                if os.path.exists(self.path_plus_file):
+                    self.path_plus_file = str( self.stats_path + '/' + 'Stats.' + namelist['meta']['simname']
+                           + '.' + res_name + '.nc')
+                else:
+                    break
 
         shutil.copyfile(
                 os.path.join( './', namelist['meta']['simname'] + '.in'),
                 os.path.join( outpath, namelist['meta']['simname'] + '.in'))
-        self.setup_stats_file(Gr)
+        if not self.deferred:
+            self.setup_stats_file(Gr)
         return
 #
 
@@ -70,21 +140,199 @@ cdef class NetCDFIO_Stats:
 
 
 
+    @cython.wraparound(True)
+    cpdef NetCDFIO_Stats branch(self, Py_ssize_t member):
+        # a forked member continues in a copy of the stats file (schema and output up to the fork)
+        cdef NetCDFIO_Stats NS = NetCDFIO_Stats()
+        self.drain()
+        NS.uuid = self.uuid
+        NS.stats_path = self.stats_path
+        NS.path_plus_file = str(self.path_plus_file[:-3] + '.member_' + str(member) + '.nc')
+        NS.last_output_time = self.last_output_time
+        NS.frequency = self.frequency
+        NS.deferred = self.deferred
+        NS.schema_written = self.schema_written
+        NS.chunk_t = self.chunk_t
+        NS.buffered = self.buffered
+        NS.buffer_t = np.zeros(self.chunk_t, dtype=np.double)
+        NS.zlib = self.zlib
+        NS.shuffle = self.shuffle
+        NS.asynchronous = self.asynchronous
+        NS.queue_size = self.queue_size
+        if NS.asynchronous:
+            NS.start_writer()
+        shutil.copyfile(self.path_plus_file, NS.path_plus_file)
+        return NS
+
+
     cpdef open_files(self):
+        # buffered: the file is only opened in flush
+        if self.buffered:
+            return
         self.root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
         self.profiles_grp = self.root_grp.groups['profiles']
         self.ts_grp = self.root_grp.groups['timeseries']
         return
 
     cpdef close_files(self):
+        # buffered: one output time is complete; written when the buffers are full
+        if self.buffered:
+            self.n_buffered += 1
+            if self.n_buffered == self.chunk_t:
+                self.flush()
+            return
         self.root_grp.close()
         return
 
+    cpdef flush(self):
+        '''
+        Writes all buffered output times to the stats file (one hyperslab per variable) and empties the buffers.
+        Called when the buffers are full, before a restart file is written and at the end of the run.
+        Asynchronous: the filled buffers are handed to the writer thread and the simulation continues with a free set
+        of buffers; put blocks if the writer thread is more than queue_size flushes behind (backpressure).
+        '''
+        cdef:
+            Py_ssize_t n = self.n_buffered
+
+        if not self.buffered or n == 0:
+            return
+
+        if self.asynchronous:
+            self.check_writer()
+            self.write_queue.put((self.buffer_t, self.profile_buffers, self.ts_buffers, n))
+            try:
+                self.buffer_t, self.profile_buffers, self.ts_buffers = self.free_buffers.get_nowait()
+            except queue.Empty:
+                # buffers of the variables are allocated at their first write
+                self.buffer_t = np.zeros(self.chunk_t, dtype=np.double)
+                self.profile_buffers = {}
+                self.ts_buffers = {}
+        else:
+            self.write_buffers(self.buffer_t, self.profile_buffers, self.ts_buffers, n)
+        self.n_buffered = 0
+        return
+
+    cpdef drain(self):
+        # flush and wait until the writer thread has written everything (e.g. before the stats file is copied)
+        self.flush()
+        if self.asynchronous:
+            self.write_queue.join()
+            self.check_writer()
+        return
+
+    cpdef finish(self):
+        # end of the run: drain and stop the writer thread (also if the writer thread failed and drain exits)
+        try:
+            self.drain()
+        finally:
+            if self.asynchronous and self.writer is not None:
+                self.write_queue.put(None)
+                self.writer.join()
+                self.writer = None
+        return
+
+    cdef check_writer(self):
+        # the writer thread is a daemon thread: the queued writes are waited for before a failed write stops the run
+        if self.writer_error is not None:
+            self.write_queue.join()
+            print('NetCDFIO_Stats: writer thread failed: ' + repr(self.writer_error))
+            print('Killing simulation now!')
+            sys.exit()
+        return
+
+    def write_buffers(self, buffer_t, dict profile_buffers, dict ts_buffers, Py_ssize_t n):
+        cdef:
+            Py_ssize_t nt
+
+        root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
+        profile_grp = root_grp.groups['profiles']
+        ts_grp = root_grp.groups['timeseries']
+
+        nt = profile_grp.variables['t'].shape[0]
+        profile_grp.variables['t'][nt:nt+n] = buffer_t[:n]
+        for var_name in profile_buffers:
+            profile_grp.variables[var_name][nt:nt+n, :] = profile_buffers[var_name][:n, :]
+        nt = ts_grp.variables['t'].shape[0]
+        ts_grp.variables['t'][nt:nt+n] = buffer_t[:n]
+        for var_name in ts_buffers:
+            ts_grp.variables[var_name][nt:nt+n] = ts_buffers[var_name][:n]
+        root_grp.close()
+
+        # variables that are not written at an output time are filled with nan
+        for var_name in profile_buffers:
+            profile_buffers[var_name][:, :] = np.nan
+        for var_name in ts_buffers:
+            ts_buffers[var_name][:] = np.nan
+        return
+
+    def write_loop(self):
+        # writer thread: the only place where the stats file is accessed while the thread is running
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                self.write_queue.task_done()
+                break
+            buffer_t, profile_buffers, ts_buffers, n = item
+            try:
+                self.write_buffers(buffer_t, profile_buffers, ts_buffers, n)
+            except Exception as e:
+                self.writer_error = e
+            self.free_buffers.put((buffer_t, profile_buffers, ts_buffers))
+            self.write_queue.task_done()
+        return
+
+    cpdef start_writer(self):
+        self.write_queue = queue.Queue(maxsize=self.queue_size)
+        self.free_buffers = queue.Queue()
+        self.writer_error = None
+        self.writer = threading.Thread(target=self.write_loop, name='NetCDFIO_Stats writer')
+        self.writer.daemon = True
+        self.writer.start()
+        return
+
     cpdef setup_stats_file(self, Grid.Grid Gr):
         print('NetCDFIO_Stats: setup_stats_file')
 
         root_grp = nc.Dataset(self.path_plus_file, 'w', format='NETCDF4')
+        self.create_groups(root_grp, Gr)
+        root_grp.close()
+        return
+
+
+    cpdef write_schema(self, Grid.Grid Gr):
+        '''
+        Creates the stats file with all registered variables and writes the reference profiles in a single open of the
+        file (deferred setup). Profiles and timeseries are chunked as (chunk_t, nz) and (chunk_t,) for appending along t.
+        :param Gr: Grid class
+        :return:
+        '''
+        if not self.deferred:
+            return
+        print('NetCDFIO_Stats: write_schema')
+
+        root_grp = nc.Dataset(self.path_plus_file, 'w', format='NETCDF4')
+        self.create_groups(root_grp, Gr)
 
+        profile_grp = root_grp.groups['profiles']
+        for var_name in self.profile_names:
+            profile_grp.createVariable(var_name, 'f8', ('t', 'z'), chunksizes=(self.chunk_t, Gr.nz),
+                                       zlib=self.zlib, shuffle=self.shuffle)
+        ts_grp = root_grp.groups['timeseries']
+        for var_name in self.ts_names:
+            ts_grp.createVariable(var_name, 'f8', ('t',), chunksizes=(self.chunk_t,), zlib=self.zlib, shuffle=self.shuffle)
+        reference_grp = root_grp.groups['reference']
+        for var_name in self.reference_names:
+            var = reference_grp.createVariable(var_name, 'f8', ('z',))
+            if var_name in self.reference_data:
+                var[:] = self.reference_data[var_name]
+
+        root_grp.close()
+        self.reference_data = {}
+        self.schema_written = True
+        return
+
+
+    cdef create_groups(self, root_grp, Grid.Grid Gr):
         # Set profile dimensions
         profile_grp = root_grp.createGroup('profiles')
         profile_grp.createDimension('z', Gr.nz)
@@ -93,7 +341,7 @@ cdef class NetCDFIO_Stats:
         # z[:] = np.array(Gr.z[Gr.gw:-Gr.gw])
         z_half = profile_grp.createVariable('z_half', 'f8', ('z'))
 #         z_half[:] = np.array(Gr.z_half[Gr.dims.gw:-Gr.dims.gw])
-        profile_grp.createVariable('t', 'f8', ('t'))
+        profile_grp.createVariable('t', 'f8', ('t'), chunksizes=(self.chunk_t,))
 #         del z
 #         del z_half
 
@@ -108,9 +356,7 @@ cdef class NetCDFIO_Stats:
 
         ts_grp = root_grp.createGroup('timeseries')
         ts_grp.createDimension('t', None)
-        ts_grp.createVariable('t', 'f8', ('t'))
-
-        root_grp.close()
+        ts_grp.createVariable('t', 'f8', ('t'), chunksizes=(self.chunk_t,))
         return
 
 
@@ -118,6 +364,12 @@ cdef class NetCDFIO_Stats:
 
     '''adding and writing data'''
     cpdef add_profile(self, var_name):
+        if self.deferred:
+            if not self.schema_written:
+                self.profile_names.append(var_name)
+                return
+            # registered after write_schema: added to the file directly, after the pending output is written
+            self.drain()
         root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
         profile_grp = root_grp.groups['profiles']
         new_var = profile_grp.createVariable(var_name, 'f8', ('t', 'z'))
@@ -132,6 +384,12 @@ cdef class NetCDFIO_Stats:
         :param Gr: Grid class
         :return:
         '''
+        if self.deferred:
+            if not self.schema_written:
+                self.reference_names.append(var_name)
+                return
+            # registered after write_schema: added to the file directly, after the pending output is written
+            self.drain()
         root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
         reference_grp = root_grp.groups['reference']
         new_var = reference_grp.createVariable(var_name, 'f8', ('z',))
@@ -140,6 +398,12 @@ cdef class NetCDFIO_Stats:
         return
 
     cpdef add_ts(self, var_name, Grid.Grid Gr):
+        if self.deferred:
+            if not self.schema_written:
+                self.ts_names.append(var_name)
+                return
+            # registered after write_schema: added to the file directly, after the pending output is written
+            self.drain()
         root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
         ts_grp = root_grp.groups['timeseries']
         new_var = ts_grp.createVariable(var_name, 'f8', ('t',))
@@ -148,6 +412,11 @@ cdef class NetCDFIO_Stats:
         return
 
     cpdef write_profile(self, var_name, double[:] data):
+        if self.buffered:
+            if var_name not in self.profile_buffers:
+                self.profile_buffers[var_name] = np.full((self.chunk_t, data.shape[0]), np.nan, dtype=np.double)
+            self.profile_buffers[var_name][self.n_buffered, :] = data
+            return
         #root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
         #profile_grp = root_grp.groups['profiles']
         var = self.profiles_grp.variables[var_name]
@@ -163,6 +432,12 @@ cdef class NetCDFIO_Stats:
         :param data: data to be written to file
         :return:
         '''
+        if self.deferred:
+            if not self.schema_written:
+                self.reference_data[var_name] = np.array(data)
+                return
+            # registered after write_schema: added to the file directly, after the pending output is written
+            self.drain()
         root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
         reference_grp = root_grp.groups['reference']
         var = reference_grp.variables[var_name]
@@ -172,6 +447,11 @@ cdef class NetCDFIO_Stats:
 
     @cython.wraparound(True)
     cpdef write_ts(self, var_name, double data):
+        if self.buffered:
+            if var_name not in self.ts_buffers:
+                self.ts_buffers[var_name] = np.full(self.chunk_t, np.nan, dtype=np.double)
+            self.ts_buffers[var_name][self.n_buffered] = data
+            return
             #root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
             #ts_grp = root_grp.groups['timeseries']
         var = self.ts_grp.variables[var_name]
@@ -180,6 +460,9 @@ cdef class NetCDFIO_Stats:
         return
 
     cpdef write_simulation_time(self, double t):
+        if self.buffered:
+            self.buffer_t[self.n_buffered] = t
+            return
         #root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
         #profile_grp = root_grp.groups['profiles']
         #ts_grp = root_grp.groups['timeseries']
@@ -195,6 +478,38 @@ cdef class NetCDFIO_Stats:
         #root_grp.close()
         return
 
+    cpdef write_timers(self, list names, totals, counts, histogram, bin_edges):
+        '''
+        Writes the wall clock timers of the time loop (Timers.write) to the 'timers' group; called after finish
+        :param names: component names
+        :param totals: total time per component [s]
+        :param counts: number of calls per component
+        :param histogram: number of time steps per component and bin of the time used in a time step
+        :param bin_edges: edges of the histogram bins [s]
+        :return:
+        '''
+        root_grp = nc.Dataset(self.path_plus_file, 'r+', format='NETCDF4')
+        if 'timers' in root_grp.groups:
+            timers_grp = root_grp.groups['timers']
+        else:
+            timers_grp = root_grp.createGroup('timers')
+            timers_grp.createDimension('component', len(names))
+            timers_grp.createDimension('bin', len(bin_edges) - 1)
+            timers_grp.createDimension('bin_edge', len(bin_edges))
+            timers_grp.createVariable('name', str, ('component',))
+            timers_grp.createVariable('total', 'f8', ('component',))
+            timers_grp.createVariable('count', 'i8', ('component',))
+            timers_grp.createVariable('histogram', 'i8', ('component', 'bin'))
+            timers_grp.createVariable('bin_edges', 'f8', ('bin_edge',))
+        for i, name in enumerate(names):
+            timers_grp.variables['name'][i] = name
+        timers_grp.variables['total'][:] = totals
+        timers_grp.variables['count'][:] = counts
+        timers_grp.variables['histogram'][:, :] = histogram
+        timers_grp.variables['bin_edges'][:] = bin_edges
+        root_grp.close()
+        return
+
 
 
 
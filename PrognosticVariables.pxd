@@ -1,8 +1,7 @@
 from NetCDFIO cimport NetCDFIO_Stats
 from Grid cimport Grid
-from TimeStepping cimport TimeStepping
 # cimport ReferenceState
-# cimport Restart
+cimport Restart
 
 # cdef extern from "prognostic_variables.h":
 #     struct VelocityDofs:
@@ -16,12 +15,40 @@ from TimeStepping cimport TimeStepping
 #         void set_bcs(Py_ssize_t dim, Py_ssize_t s, double bc_factor,  Grid.DimStruct *dims, double* values)
 #         void set_to_zero(Py_ssize_t nv, Grid.DimStruct *dims, double* values )
 
+# varshifts (= index * Gr.nzg) of the well-known variables, frozen in initialize; -1: variable not registered
+cdef struct VariableShifts:
+    # MeanVariables
+    Py_ssize_t u
+    Py_ssize_t v
+    Py_ssize_t w
+    Py_ssize_t th
+    Py_ssize_t qt
+    # SecondOrderMomenta
+    Py_ssize_t uu
+    Py_ssize_t vv
+    Py_ssize_t ww
+    Py_ssize_t wu
+    Py_ssize_t wv
+    Py_ssize_t pu
+    Py_ssize_t pv
+    Py_ssize_t pw
+    Py_ssize_t uth
+    Py_ssize_t vth
+    Py_ssize_t wth
+    Py_ssize_t wqt
+
+# staggering of the well-known variables, frozen in initialize: 0 phi-grid (z_half), 1 w-grid (z), -1 not registered
+ctypedef VariableShifts VariableStagger
+
+# after the structs: TimeStepping.pxd cimports TurbulenceScheme.pxd, which uses them
+from TimeStepping cimport TimeStepping
+
 cdef class PrognosticVariables:
     cdef:
         dict name_index
         dict units
         list index_name
-        Py_ssize_t nv
+        public Py_ssize_t nv
         Py_ssize_t nv_scalars
         Py_ssize_t nv_velocities
         # cdef double [:] bc_type
@@ -30,10 +57,32 @@ cdef class PrognosticVariables:
         cdef double [:] tendencies
         cdef Py_ssize_t [:] velocity_directions
 
+        # staggering of the variables as registered ('phi' or 'w')
+        dict staggering
+
+        # frozen layout (set in initialize): var_shifts[i] = i * Gr.nzg; var_stagger[i] = 0 (phi-grid) or 1 (w-grid)
+        bint frozen
+        VariableShifts shift
+        VariableStagger stagger
+        Py_ssize_t [:] var_shifts
+        Py_ssize_t [:] var_stagger
+        # zero-copy ndarray views of values / tendencies with shape (ncol, nv, nzg) (set in initialize)
+        public object values_array
+        public object tendencies_array
 
-    cpdef add_variable(self,name,units,var_type)        # cpdef add_variable(self,name,units,bc_type,var_type)
+    cpdef add_variable(self,name,units,var_type,stagger=*)        # cpdef add_variable(self,name,units,bc_type,var_type)
     cpdef initialize(self, Grid Gr, NetCDFIO_Stats NS)
     cpdef update(self, Grid Gr, TimeStepping TS)
+    cpdef stats_io(self, Grid Gr, NetCDFIO_Stats NS)
+    cpdef branch(self)
+    cpdef restart(self, Grid Gr, Restart.Restart Re)
+    cpdef init_from_restart(self, Grid Gr, Restart.Restart Re)
+    cdef freeze_layout(self, Grid Gr)
+    cpdef get_variable_array(self, name, Grid Gr)
+    cpdef get_tendency_array(self, name, Grid Gr)
+    cpdef bint val_nan(self)
+    cpdef bint tend_nan(self)
+    cpdef double val_norm(self)
     # cdef:
     #     void update_all_bcs(self, Grid.Grid Gr)
     # cpdef Update_all_bcs(self,Grid.Grid Gr)
@@ -43,25 +92,22 @@ cdef class PrognosticVariables:
         return self.name_index[variable_name]
     cdef inline Py_ssize_t get_varshift(self, Grid Gr, str variable_name):
         return self.name_index[variable_name] * Gr.nzg
-    # cpdef get_variable_array(self,name,Grid.Grid Gr)
-    # cpdef get_tendency_array(self,name,Grid.Grid Gr)
-    # cpdef tend_nan(self,PA,message)
-    # cpdef val_nan(self,PA,message)
+    cdef inline Py_ssize_t get_colshift(self, Grid Gr, Py_ssize_t n) nogil:
+        return n * self.nv * Gr.nzg
     # cpdef val_bounds(self,var_name,Grid.Grid Gr)
-    # cpdef stats_io(self, Grid.Grid Gr, ReferenceState.ReferenceState RS, NetCDFIO_Stats NS)
-    # cpdef restart(self, Grid.Grid Gr, Restart.Restart Re)
-    # cpdef init_from_restart(self, Grid.Grid Gr, Restart.Restart Re)
 
 
 cdef class MeanVariables(PrognosticVariables):
     cpdef initialize(self, Grid Gr, NetCDFIO_Stats NS)
-    cpdef update(self, Grid Gr, TimeStepping TS)
     # cdef inline Py_ssize_t get_varshift(self, Grid.Grid Gr, str variable_name):
     #     return self.name_index[variable_name] * Gr.nzg
-    cpdef plot(self, str message, Grid Gr, TimeStepping TS)
 
 cdef class SecondOrderMomenta(PrognosticVariables):
     cpdef initialize(self, Grid Gr, NetCDFIO_Stats NS)
-    cpdef update(self, Grid Gr, TimeStepping TS)
     # cdef inline Py_ssize_t get_varshift(self, Grid.Grid Gr, str variable_name):
-    #     return self.name_index[variable_name] * Gr.nzg
\ No newline at end of file
+    #     return self.name_index[variable_name] * Gr.nzg
+
+
+# values += dt * tendencies; tendencies = 0 over a contiguous buffer of length n
+cdef void update_values(double* values, double* tendencies, Py_ssize_t n, double dt) noexcept nogil
+cpdef update_M1_M2(Grid Gr, MeanVariables M1, SecondOrderMomenta M2, double dt)
@@ -9,13 +9,12 @@ import numpy as np
 cimport numpy as np
 cimport mpi4py.libmpi as mpi
 import sys
-import pylab as plt
 from NetCDFIO cimport NetCDFIO_Stats
 
 from Grid cimport Grid
 from TimeStepping cimport TimeStepping
 # cimport ReferenceState
-# cimport Restart
+cimport Restart
 
 '''
 self.name_index[str name]:      returns index of variable of given name
@@ -25,14 +24,50 @@ self.nv:                        number of variables
 self.nv_scalars:                number of scalars
 self.nv_velocities:             number of velocities
 self.var_type[int i]:           type of variable (velocity==0, scalar==1)
+self.staggering[str name]:      vertical staggering of variable of given name: 'phi' (cell centres z_half, e.g. u, th, uu,
+                                ww) or 'w' (cell faces z, e.g. w, wu, wth)
+self.values, self.tendencies:   flat buffers with layout (Gr.ncol, nv, Gr.nzg); index = colshift + varshift + k
+                                with colshift = get_colshift(Gr, n) = n*nv*nzg and varshift = get_varshift(Gr, name)
 self.velocity_directions[int dir]:   returns index of velocity of given direction dir (important to change from 3d to 2d or 1d dynamics
+self.shift.<name>:              varshift of a well-known variable (VariableShifts, -1 if not registered)
+self.var_shifts[int i]:         varshift of variable i
+self.stagger.<name>, self.var_stagger[int i]:   staggering of a well-known variable / of variable i (0 phi-grid,
+                                1 w-grid; -1 if not registered)
+                                both are frozen in initialize, no variables can be added afterwards; kernels use them
+                                instead of get_varshift (dict lookup)
+self.values_array, self.tendencies_array:   zero-copy views of values / tendencies with shape (ncol, nv, nzg),
+                                values_array[n] is the (nv, nzg) block of column n; get_variable_array(name, Gr) and
+                                get_tendency_array(name, Gr) return the (ncol, nzg) view of one variable
 '''
 
+# fields of VariableShifts
+shift_names = ('u', 'v', 'w', 'th', 'qt',
+               'uu', 'vv', 'ww', 'wu', 'wv', 'pu', 'pv', 'pw', 'uth', 'vth', 'wth', 'wqt')
+
+cdef void update_values(double* values, double* tendencies, Py_ssize_t n, double dt) noexcept nogil:
+    cdef Py_ssize_t i
+    for i in xrange(n):
+        values[i] += tendencies[i] * dt
+        tendencies[i] = 0.0
+    return
+
+cpdef update_M1_M2(Grid Gr, MeanVariables M1, SecondOrderMomenta M2, double dt):
+    '''
+    Forward Euler update of the mean variables and second order momenta in one call (tendencies are set to zero).
+    '''
+    with nogil:
+        update_values(&M1.values[0], &M1.tendencies[0], Gr.ncol*M1.nv*Gr.nzg, dt)
+        update_values(&M2.values[0], &M2.tendencies[0], Gr.ncol*M2.nv*Gr.nzg, dt)
+    return
+
+
+
 cdef class PrognosticVariables:
     def __init__(self, Grid Gr):
         self.name_index = {}
         self.index_name = []
         self.units = {}
+        self.staggering = {}
         self.nv = 0
         self.nv_scalars = 0
         self.nv_velocities = 0
@@ -41,11 +76,18 @@ cdef class PrognosticVariables:
         # self.bc_type = np.array([],dtype=np.double,order='c')
         return
 
-    cpdef add_variable(self,name,units,var_type):       # cpdef add_variable(self,name,units,bc_type,var_type):
-        #Store names and units
+    cpdef add_variable(self,name,units,var_type,stagger='phi'):       # cpdef add_variable(self,name,units,bc_type,var_type):
+        if self.frozen:
+            print('Variable ' + name + ' added after initialize (variable layout is frozen). Killing simulation now!')
+            sys.exit()
+        if stagger != 'phi' and stagger != 'w':
+            print('Not a valid staggering of variable ' + name + ': ' + str(stagger) + ' (phi, w). Killing simulation now!')
+            sys.exit()
+        #Store names, units and staggering
         self.name_index[name] = self.nv
         self.index_name.append(name)
         self.units[name] = units
+        self.staggering[name] = stagger
         self.nv = len(self.name_index.keys())
         #Set the type of the variable being added 0=velocity; 1=scalars
         if var_type == "velocity":
@@ -83,8 +125,9 @@ cdef class PrognosticVariables:
 
 
     cpdef initialize(self, Grid Gr, NetCDFIO_Stats NS):
-        self.values = np.zeros((self.nv*Gr.nzg),dtype=np.double,order='c')
-        self.tendencies = np.zeros((self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.values = np.zeros((Gr.ncol*self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.tendencies = np.zeros((Gr.ncol*self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.freeze_layout(Gr)
         #Add prognostic variables to Statistics IO
         # print('Setting up statistical output files for Prognostic Variables')
         for var_name in self.name_index.keys():
@@ -108,15 +151,103 @@ cdef class PrognosticVariables:
         return
 
 
+    cdef freeze_layout(self, Grid Gr):
+        shifts = {}
+        stagger = {}
+        for name in shift_names:
+            if name in self.name_index:
+                shifts[name] = self.name_index[name] * Gr.nzg
+                stagger[name] = 1 if self.staggering[name] == 'w' else 0
+            else:
+                shifts[name] = -1
+                stagger[name] = -1
+        self.shift = shifts
+        self.stagger = stagger
+        self.var_shifts = np.arange(self.nv, dtype=np.intp) * Gr.nzg
+        self.var_stagger = np.array([1 if self.staggering[name] == 'w' else 0 for name in self.index_name], dtype=np.intp)
+        self.values_array = np.asarray(self.values).reshape(Gr.ncol, self.nv, Gr.nzg)
+        self.tendencies_array = np.asarray(self.tendencies).reshape(Gr.ncol, self.nv, Gr.nzg)
+        self.frozen = True
+        return
+
+    cpdef get_variable_array(self, name, Grid Gr):
+        return self.values_array[:, self.name_index[name], :]
+
+    cpdef get_tendency_array(self, name, Grid Gr):
+        return self.tendencies_array[:, self.name_index[name], :]
+
+    cpdef bint val_nan(self):
+        # whole container in one call (values incl. ghost points of all columns)
+        return np.isnan(self.values_array).any()
+
+    cpdef bint tend_nan(self):
+        return np.isnan(self.tendencies_array).any()
+
+    cpdef double val_norm(self):
+        # l2 norm of all values (incl. ghost points)
+        return np.linalg.norm(np.asarray(self.values))
+
+
     cpdef update(self, Grid Gr, TimeStepping TS):
-        cdef:
-            Py_ssize_t kmax = Gr.nzg
-            Py_ssize_t k
-        for var in self.name_index.keys():
-            var_shift = self.get_varshift(Gr, var)
-            for k in xrange(0,kmax):
-                self.values[var_shift + k] += self.tendencies[var_shift + k] * TS.dt
+        # forward Euler update of all variables; tendencies are set to zero
+        with nogil:
+            update_values(&self.values[0], &self.tendencies[0], Gr.ncol*self.nv*Gr.nzg, TS.dt)
+        return
+
 
+    cpdef stats_io(self, Grid Gr, NetCDFIO_Stats NS):
+        # mean over all columns
+        means = np.mean(self.values_array[:,:,Gr.gw:Gr.nzg-Gr.gw], axis=0)
+        for var_name in self.name_index.keys():
+            NS.write_profile(var_name + '_mean', means[self.get_nv(var_name),:])
+        return
+
+
+    cpdef branch(self):
+        # new container of the same type that shares the variable metadata, with its own copy of the values
+        cdef PrognosticVariables PV = type(self).__new__(type(self))
+        PV.name_index = self.name_index
+        PV.index_name = self.index_name
+        PV.units = self.units
+        PV.staggering = self.staggering
+        PV.nv = self.nv
+        PV.nv_scalars = self.nv_scalars
+        PV.nv_velocities = self.nv_velocities
+        PV.var_type = self.var_type
+        PV.velocity_directions = self.velocity_directions
+        PV.frozen = self.frozen
+        PV.shift = self.shift
+        PV.var_shifts = self.var_shifts
+        PV.stagger = self.stagger
+        PV.var_stagger = self.var_stagger
+        PV.values = np.array(self.values)
+        PV.tendencies = np.zeros_like(np.asarray(self.tendencies))
+        if self.frozen:
+            PV.values_array = np.asarray(PV.values).reshape(self.values_array.shape)
+            PV.tendencies_array = np.asarray(PV.tendencies).reshape(self.tendencies_array.shape)
+        return PV
+
+
+    cpdef restart(self, Grid Gr, Restart.Restart Re):
+        # one restart group per container (MeanVariables, SecondOrderMomenta); values incl. ghost points of all columns
+        group = type(self).__name__
+        Re.restart_data[group] = {}
+        Re.restart_data[group]['index_name'] = list(self.index_name)
+        Re.restart_data[group]['ncol'] = Gr.ncol
+        Re.restart_data[group]['nzg'] = Gr.nzg
+        Re.restart_data[group]['values'] = np.array(self.values)
+        return
+
+
+    cpdef init_from_restart(self, Grid Gr, Restart.Restart Re):
+        # the variables have to be added in the same order as in the run that wrote the restart file
+        group = type(self).__name__
+        data = Re.restart_data[group]
+        if data['index_name'] != self.index_name or data['ncol'] != Gr.ncol or data['nzg'] != Gr.nzg:
+            print('restart: ' + group + ' in restart file does not match the current setup. Killing simulation now!')
+            sys.exit()
+        np.asarray(self.values)[:] = data['values']
+        np.asarray(self.tendencies)[:] = 0.0
         return
 
 
@@ -213,32 +344,6 @@ cdef class PrognosticVariables:
     #       self.update_all_bcs(Gr, Pa)
     #       return
     #
-    # cpdef get_variable_array(self,name,Grid.Grid Gr):
-    #     index = self.name_index[name]
-    #     view = np.array(self.values).view()
-    #     view.shape = (self.nv,Gr.dims.nlg[0],Gr.dims.nlg[1],Gr.dims.nlg[2])
-    #     return view[index,:,:,:]
-    #
-    # cpdef get_tendency_array(self,name,Grid.Grid Gr):
-    #     index = self.name_index[name]
-    #     view = np.array(self.tendencies).view()
-    #     view.shape = (self.nv,Gr.dims.nlg[0],Gr.dims.nlg[1],Gr.dims.nlg[2])
-    #     return view[index,:,:,:]
-    #
-    # cpdef tend_nan(self,PA,message):
-    #     if np.isnan(self.tendencies).any():
-    #         print('Nans found in tendencies')
-    #         print(message)
-    #         PA.kill()
-    #     return
-    #
-    # cpdef val_nan(self,PA,message):
-    #     if np.isnan(self.values).any():
-    #         print('Nans found in Prognostic Variables values')
-    #         print(message)
-    #         PA.kill()
-    #     return
-    #
     # cpdef val_bounds(self,var_name,Grid.Grid Gr):
     #     var_array = self.get_variable_array(var_name, Gr)
     #     return np.amin(var_array), np.amax(var_array)
@@ -253,6 +358,7 @@ cdef class MeanVariables(PrognosticVariables):
         self.name_index = {}
         self.index_name = []
         self.units = {}
+        self.staggering = {}
         self.nv = 0
         self.nv_scalars = 0
         self.nv_velocities = 0
@@ -269,8 +375,9 @@ cdef class MeanVariables(PrognosticVariables):
             print('problem setting velocity directions')
             print('Killing simulation now!')
             sys.exit()
-        self.values = np.zeros((self.nv*Gr.nzg),dtype=np.double,order='c')
-        self.tendencies = np.zeros((self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.values = np.zeros((Gr.ncol*self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.tendencies = np.zeros((Gr.ncol*self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.freeze_layout(Gr)
         #Add prognostic variables to Statistics IO
         # print('Setting up statistical output files for PV.M1')
         for var_name in self.name_index.keys():
@@ -278,69 +385,6 @@ cdef class MeanVariables(PrognosticVariables):
             NS.add_profile(var_name+'_mean')
         return
 
-    cpdef update(self, Grid Gr, TimeStepping TS):
-        cdef:
-            kmax = Gr.nzg
-        for var in self.name_index.keys():
-            var_shift = self.get_varshift(Gr, var)
-            for k in xrange(0,kmax):
-                self.values[var_shift + k] += self.tendencies[var_shift + k] * TS.dt
-                self.tendencies[var_shift + k] = 0.0
-
-
-        print('M1: M1_tendencies[u,k=10]: ', self.tendencies[10], np.amax(self.tendencies))
-        th_varshift = self.get_varshift(Gr, 'th')
-        print('M1: M1_tendencies[phi=th,k=10]: ', self.tendencies[th_varshift+10], np.amax(self.tendencies))
-
-        return
-
-
-    cpdef plot(self, str message, Grid Gr, TimeStepping TS):
-        cdef:
-            double [:] values = self.values
-            double [:] tendencies = self.tendencies
-            Py_ssize_t th_varshift = self.get_varshift(Gr,'th')
-            Py_ssize_t w_varshift = self.get_varshift(Gr,'w')
-            Py_ssize_t v_varshift = self.get_varshift(Gr,'v')
-            Py_ssize_t u_varshift = self.get_varshift(Gr,'u')
-
-        plt.figure(1,figsize=(15,7))
-        # plt.plot(values[s_varshift+Gr.gw:s_varshift+Gr.nzg-Gr.gw], Gr.z)
-        plt.subplot(1,4,1)
-        plt.plot(values[th_varshift:th_varshift+Gr.nzg], Gr.z)
-        plt.title('th')
-        plt.subplot(1,4,2)
-        plt.plot(values[w_varshift:w_varshift+Gr.nzg], Gr.z)
-        plt.title('w')
-        plt.subplot(1,4,3)
-        plt.plot(values[v_varshift:v_varshift+Gr.nzg], Gr.z)
-        plt.title('v')
-        plt.subplot(1,4,4)
-        plt.plot(values[u_varshift:u_varshift+Gr.nzg], Gr.z)
-        plt.title('u')
-        # plt.show()
-        plt.savefig('./figs/profiles_' + message + '_' + np.str(TS.t) + '.png')
-        plt.close()
-
-        plt.figure(2,figsize=(15,7))
-        # plt.plot(values[s_varshift+Gr.gw:s_varshift+Gr.nzg-Gr.gw], Gr.z)
-        plt.subplot(1,4,1)
-        plt.plot(tendencies[th_varshift:th_varshift+Gr.nzg], Gr.z)
-        plt.title('s tend')
-        plt.subplot(1,4,2)
-        plt.plot(tendencies[w_varshift:w_varshift+Gr.nzg], Gr.z)
-        plt.title('w tend')
-        plt.subplot(1,4,3)
-        plt.plot(tendencies[v_varshift:v_varshift+Gr.nzg], Gr.z)
-        plt.title('v tend')
-        plt.subplot(1,4,4)
-        plt.plot(tendencies[u_varshift:u_varshift+Gr.nzg], Gr.z)
-        plt.title('u tend')
-        # plt.show()
-        plt.savefig('./figs/tendencies_' + message + '_' + np.str(TS.t) + '.png')
-        plt.close()
-        return
-
     # cpdef plot_tendencies(self, Grid Gr, TimeStepping TS):
     #     cdef:
     #         double [:] values = self.values
@@ -385,6 +429,7 @@ cdef class SecondOrderMomenta(PrognosticVariables):
         self.name_index = {}
         self.index_name = []
         self.units = {}
+        self.staggering = {}
         self.nv = 0
         self.nv_scalars = 0
         self.nv_velocities = 0
@@ -392,8 +437,9 @@ cdef class SecondOrderMomenta(PrognosticVariables):
         return
 
     cpdef initialize(self, Grid Gr, NetCDFIO_Stats NS):
-        self.values = np.zeros((self.nv*Gr.nzg),dtype=np.double,order='c')
-        self.tendencies = np.zeros((self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.values = np.zeros((Gr.ncol*self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.tendencies = np.zeros((Gr.ncol*self.nv*Gr.nzg),dtype=np.double,order='c')
+        self.freeze_layout(Gr)
         # try:
         #     self.velocity_directions[0] = self.get_nv('u')      # Causes Problems!!!
         #     self.velocity_directions[1] = self.get_nv('v')
@@ -409,105 +455,3 @@ cdef class SecondOrderMomenta(PrognosticVariables):
             #Add mean profile
             NS.add_profile(var_name+'_mean')
         return
-
-    cpdef update(self, Grid Gr, TimeStepping TS):
-        cdef:
-            kmax = Gr.nzg
-        for var in self.name_index.keys():
-            var_shift = self.get_varshift(Gr, var)
-            for k in xrange(0,kmax):
-                self.values[var_shift + k] += self.tendencies[var_shift + k] * TS.dt
-
-
-        return
-
-
-
-
-    # cpdef restart(self, Grid.Grid Gr, Restart.Restart Re):
-    #
-    #     Re.restart_data['PV'] = {}
-    #     Re.restart_data['PV']['name_index'] = self.name_index
-    #     Re.restart_data['PV']['units'] = self.units
-    #     Re.restart_data['PV']['index_name'] = self.index_name
-    #     Re.restart_data['PV']['nv'] = self.nv
-    #     Re.restart_data['PV']['nv_scalars'] = self.nv_scalars
-    #     Re.restart_data['PV']['nv_velocities'] = self.nv_velocities
-    #     Re.restart_data['PV']['bc_type'] = np.array(self.bc_type)
-    #     Re.restart_data['PV']['var_type'] = np.array(self.var_type)
-    #     Re.restart_data['PV']['velocity_directions'] = np.array(self.velocity_directions)
-    #     Re.restart_data['PV']['velocity_names_directional'] = self.velocity_names_directional
-    #
-    #     cdef:
-    #         double [:] values = np.empty((self.nv * Gr.dims.npl),dtype=np.double,order='c')
-    #         Py_ssize_t imin = Gr.dims.gw
-    #         Py_ssize_t jmin = Gr.dims.gw
-    #         Py_ssize_t kmin = Gr.dims.gw
-    #         Py_ssize_t imax = Gr.dims.nlg[0] - Gr.dims.gw
-    #         Py_ssize_t jmax = Gr.dims.nlg[1] - Gr.dims.gw
-    #         Py_ssize_t kmax = Gr.dims.nlg[2] - Gr.dims.gw
-    #         Py_ssize_t i, j, k, count, ijk, n, v_shift
-    #         Py_ssize_t ishift, jshift
-    #         Py_ssize_t istride = Gr.dims.nlg[1] * Gr.dims.nlg[2]
-    #         Py_ssize_t jstride = Gr.dims.nlg[2]
-    #
-    #     with nogil:
-    #         count = 0
-    #         for n in xrange(self.nv):
-    #             v_shift = Gr.dims.nlg[0] * Gr.dims.nlg[1] * Gr.dims.nlg[2] * n
-    #             for i in xrange(imin, imax):
-    #                 ishift = istride * i
-    #                 for j in xrange(jmin, jmax):
-    #                     jshift = jstride * j
-    #                     for k in xrange(kmin, kmax):
-    #                         ijk = v_shift + ishift + jshift + k
-    #                         values[count] = self.values[ijk]
-    #                         count += 1
-    #
-    #     Re.restart_data['PV']['values'] = np.array(values)
-    #
-    #     return
-    #
-    #
-    # cpdef init_from_restart(self, Grid.Grid Gr, Restart.Restart Re):
-    #
-    #     self.name_index = Re.restart_data['PV']['name_index']
-    #     self.units  = Re.restart_data['PV']['units']
-    #     self.index_name =  Re.restart_data['PV']['index_name']
-    #     self.nv = Re.restart_data['PV']['nv']
-    #     self.nv_scalars = Re.restart_data['PV']['nv_scalars']
-    #     self.nv_velocities = Re.restart_data['PV']['nv_velocities']
-    #     self.bc_type = Re.restart_data['PV']['bc_type']
-    #     self.var_type = Re.restart_data['PV']['var_type']
-    #     self.velocity_directions = Re.restart_data['PV']['velocity_directions']
-    #     self.velocity_names_directional = Re.restart_data['PV']['velocity_names_directional']
-    #
-    #
-    #     cdef:
-    #         double [:] values = Re.restart_data['PV']['values']
-    #         Py_ssize_t imin = Gr.dims.gw
-    #         Py_ssize_t jmin = Gr.dims.gw
-    #         Py_ssize_t kmin = Gr.dims.gw
-    #         Py_ssize_t imax = Gr.dims.nlg[0] - Gr.dims.gw
-    #         Py_ssize_t jmax = Gr.dims.nlg[1] - Gr.dims.gw
-    #         Py_ssize_t kmax = Gr.dims.nlg[2] - Gr.dims.gw
-    #         Py_ssize_t i, j, k, count, ijk, n
-    #         Py_ssize_t ishift, jshift, v_shift
-    #         Py_ssize_t istride = Gr.dims.nlg[1] * Gr.dims.nlg[2]
-    #         Py_ssize_t jstride = Gr.dims.nlg[2]
-    #
-    #
-    #     with nogil:
-    #         count = 0
-    #         for n in xrange(self.nv):
-    #             v_shift = Gr.dims.nlg[0] * Gr.dims.nlg[1] * Gr.dims.nlg[2] * n
-    #             for i in xrange(imin, imax):
-    #                 ishift = istride * i
-    #                 for j in xrange(jmin, jmax):
-    #                     jshift = jstride * j
-    #                     for k in xrange(kmin, kmax):
-    #                         ijk = v_shift + ishift + jshift + k
-    #                         self.values[ijk] =  values[count]
-    #                         count += 1
-    #
-    #     return
\ No newline at end of file
@@ -1,5 +1,6 @@
-cimport Grid
-# cimport Restart
+from Grid cimport Grid
+from NetCDFIO cimport NetCDFIO_Stats
+cimport Restart
 cdef class ReferenceState:
     cdef:
         public double [:] p0
@@ -8,17 +9,26 @@ cdef class ReferenceState:
         public double [:] alpha0_half
         public double [:] rho0
         public double [:] rho0_half
+        public double [:] temperature0_half
+        public double [:] ql0_half
+        public double [:] qv0_half
+        public double [:] qi0_half
 
         double sg
+        str integrator
+        double tolerance
+        Py_ssize_t cache_size
+        object cache_dir
 
     cdef public:
-        #These public values should be set in the case initialization routine
+        #These public values should be set in the case initialization routine (surface values: set_surface)
         double Tg  #Temperature at ground level
         double Pg  #Pressure at ground level
         double qtg #Surface total water mixing ratio
         double u0 #u velocity removed in Galilean transformation
         double v0 #v velocity removed in Galilean transformation
 
-    # cpdef restart(self, Grid.Grid Gr, Restart.Restart Re)
-    # cpdef init_from_restart(self, Grid.Grid Gr, Restart.Restart Re)
+    cpdef restart(self, Grid Gr, Restart.Restart Re)
+    cpdef init_from_restart(self, Grid Gr, Restart.Restart Re, NetCDFIO_Stats NS)
+    cdef write_reference_profiles(self, Grid Gr, NetCDFIO_Stats NS)
 
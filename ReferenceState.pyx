@@ -5,14 +5,20 @@
 # cython: cdivision=True
 
 from Grid cimport Grid
-# cimport Restart
+cimport Restart
 cimport numpy as np
 import numpy as np
 import sys
+import os
+import json
+import hashlib
+from collections import OrderedDict
 
 from NetCDFIO cimport NetCDFIO_Stats
 from scipy.integrate import odeint
-from thermodynamic_functions import entropy_from_tp, eos, alpha_from_tp
+from thermodynamic_functions import eos, lookup_config
+from thermodynamic_functions cimport entropy_from_tp, alpha_from_tp, eos_profile, eos_c, eos_struct
+from libc.math cimport exp, fabs
 include 'parameters.pxi'
 
 
@@ -20,15 +26,117 @@ include 'parameters.pxi'
 #     inline double qt_from_pv(double p0, double pv)
 '''
 Idea:
-1) read in case specific surface values
+1) read in case specific surface values (set_surface); the reference state is shared by all columns of an ensemble
+   (grid.ncol), so the surface values are single values and cannot be given per column
 2) compute remaining surface values, using thermodynamic functions (e.g. compute surface entropy from temperature and moisture)
     Note: use same thermodynamic functions for dry and moist conditions, since equivalent with qt=ql=qi=0
 3) compute pressure profile by integrating the hydrostatic equation
 4) compute other thermodynamic profiles
+
+Hydrostatic integrator (namelist['reference_state']['integrator']):
+    - 'rk4' (default): RK4 on log(p) with step dz/2 from the surface, i.e. the full and half levels in one pass; each
+      step is checked by step doubling and subdivided until the difference is below reference_state.tolerance
+      (default 1e-8 in log(p), about the accuracy of the saturation adjustment); the saturation adjustment in the right hand side is warm started from the previous
+      evaluation
+    - 'odeint': scipy.integrate.odeint with hmax = 1 m (for validation)
+
+Cache of the reference profiles, keyed by a hash of the surface values, the grid, the integrator, the latent heat /
+pv_star lookup and the parameters (parameters.pxi):
+    - in-process LRU cache with reference_state.cache_size entries (default 16, 0: off)
+    - optional on disk: reference_state.cache_dir/Ref.<hash>.npz (default: none; sweep.py uses <output_root>/ReferenceCache)
 '''
 
+reference_cache = OrderedDict()
+
+def cache_get(str key, Py_ssize_t cache_size, cache_dir):
+    cdef dict profiles
+    if cache_size > 0 and key in reference_cache:
+        profiles = reference_cache.pop(key)
+        reference_cache[key] = profiles
+        return profiles
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, 'Ref.' + key + '.npz')
+        if os.path.exists(path):
+            data = np.load(path)
+            profiles = {}
+            for name in data.files:
+                profiles[name] = data[name]
+            data.close()
+            if cache_size > 0:
+                reference_cache[key] = profiles
+                while len(reference_cache) > cache_size:
+                    reference_cache.popitem(last=False)
+            return profiles
+    return None
+
+def cache_put(str key, dict profiles, Py_ssize_t cache_size, cache_dir):
+    if cache_size > 0:
+        reference_cache[key] = profiles
+        while len(reference_cache) > cache_size:
+            reference_cache.popitem(last=False)
+    if cache_dir is not None:
+        try:
+            os.makedirs(cache_dir)
+        except:
+            pass
+        # write and rename, so that a member running in parallel never reads a partial file
+        path = os.path.join(cache_dir, 'Ref.' + key + '.npz')
+        tmp_path = path + '.' + str(os.getpid()) + '.tmp.npz'
+        np.savez(tmp_path, **profiles)
+        os.rename(tmp_path, path)
+    return
+
+
+cdef inline double hydrostatic_rhs(double logp, double qt, double s, double *T) nogil:
+    # d(log p)/dz = -g/(Rd*T*(1 - qt + eps_vi*qv)); T is the first guess of the saturation adjustment and is updated
+    cdef eos_struct ret
+    eos_c(exp(logp), qt, s, T[0], &ret)
+    T[0] = ret.T
+    return -g / (Rd * ret.T * (1.0 - qt + eps_vi * (qt - ret.ql)))
+
+cdef inline double rk4_step(double logp, double h, double qt, double s, double *T) nogil:
+    cdef double k1, k2, k3, k4
+    k1 = hydrostatic_rhs(logp, qt, s, T)
+    k2 = hydrostatic_rhs(logp + 0.5 * h * k1, qt, s, T)
+    k3 = hydrostatic_rhs(logp + 0.5 * h * k2, qt, s, T)
+    k4 = hydrostatic_rhs(logp + h * k3, qt, s, T)
+    return logp + h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+
+cdef Py_ssize_t integrate_hydrostatic(double logp0, double qt, double s, double h, double tol, double [:] logp) nogil:
+    '''
+    log(p) at z = m*h, m = 0, ..., logp.shape[0]-1; every interval h is integrated with nsub and 2*nsub RK4 steps, nsub
+    is doubled (up to 64) until the two results differ by less than tol and halved again if they agree to tol/32
+    :return: maximum number of RK4 steps per interval
+    '''
+    cdef:
+        Py_ssize_t m, i, nsub = 1, nsub_max = 1
+        double coarse, fine, err, T = 0.0
+
+    logp[0] = logp0
+    for m in xrange(1, logp.shape[0]):
+        coarse = logp[m-1]
+        for i in xrange(nsub):
+            coarse = rk4_step(coarse, h / nsub, qt, s, &T)
+        while True:
+            fine = logp[m-1]
+            for i in xrange(2 * nsub):
+                fine = rk4_step(fine, 0.5 * h / nsub, qt, s, &T)
+            err = fabs(fine - coarse)
+            # err != err: nan (e.g. T < 0 at the top of a very deep column)
+            if err <= tol or nsub >= 64 or err != err:
+                break
+            coarse = fine
+            nsub *= 2
+        logp[m] = fine
+        if nsub > nsub_max:
+            nsub_max = nsub
+        if err < tol / 32.0 and nsub > 1:
+            nsub /= 2
+    return 2 * nsub_max
+
+
 cdef class ReferenceState:
-    def __init__(self, Grid Gr ):
+    def __init__(self, Grid Gr, namelist):
 
         self.p0 = np.zeros(Gr.nzg, dtype=np.double, order='c')
         self.p0_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
@@ -36,9 +144,45 @@ cdef class ReferenceState:
         self.alpha0_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
         self.rho0 = np.zeros(Gr.nzg, dtype=np.double, order='c')
         self.rho0_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
+        self.temperature0_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
+        self.ql0_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
+        self.qv0_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
+        self.qi0_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
+
+        try:
+            self.integrator = str(namelist['reference_state']['integrator'])
+        except:
+            self.integrator = 'rk4'
+        try:
+            self.tolerance = namelist['reference_state']['tolerance']
+        except:
+            self.tolerance = 1.0e-8
+        try:
+            self.cache_size = namelist['reference_state']['cache_size']
+        except:
+            self.cache_size = 16
+        try:
+            self.cache_dir = namelist['reference_state']['cache_dir']
+        except:
+            self.cache_dir = None
+        if self.integrator != 'rk4' and self.integrator != 'odeint':
+            print('Not a valid reference state integrator: ' + self.integrator + ' (rk4, odeint)')
+            sys.exit()
 
         return
 
+    def set_surface(self, Pg, Tg, qtg):
+        # all columns see the same p0, alpha0, ... : per column surface values would need a reference state per column
+        for name, value in (('Pg', Pg), ('Tg', Tg), ('qtg', qtg)):
+            if np.ndim(value) != 0:
+                print('Reference state: surface value ' + name + ' = ' + repr(value) + ' must be a single value '
+                      '(the reference state is shared by all columns). Killing simulation now!')
+                sys.exit()
+        self.Pg = Pg
+        self.Tg = Tg
+        self.qtg = qtg
+        return
+
     # def initialize(self, Grid Gr, Thermodynamics, NetCDFIO_Stats NS):
     def initialize(self, Grid Gr, NetCDFIO_Stats NS):
         '''
@@ -56,6 +200,62 @@ cdef class ReferenceState:
         qig = 0.0
         self.sg = entropy_from_tp(self.Pg, self.Tg, self.qtg, qlg, qig)
 
+        key = self.cache_key(Gr)
+        profiles = cache_get(key, self.cache_size, self.cache_dir)
+        if profiles is None:
+            profiles = self.compute_profiles(Gr)
+            cache_put(key, profiles, self.cache_size, self.cache_dir)
+        else:
+            print('Reference state: profiles from cache (' + key[:8] + ')')
+
+        # copies: the cached profiles are shared by all simulations with the same key
+        self.alpha0_half = np.array(profiles['alpha0_half'])
+        self.alpha0 = np.array(profiles['alpha0'])
+        self.p0 = np.array(profiles['p0'])
+        self.p0_half = np.array(profiles['p0_half'])
+        self.rho0 = 1.0 / np.array(self.alpha0)
+        self.rho0_half = 1.0 / np.array(self.alpha0_half)
+
+        self.temperature0_half = np.array(profiles['temperature_half'])
+        self.ql0_half = np.array(profiles['ql_half'])
+        self.qv0_half = np.array(profiles['qv_half'])
+        self.qi0_half = np.array(profiles['qi_half'])
+
+        self.write_reference_profiles(Gr, NS)
+        return
+
+    cdef write_reference_profiles(self, Grid Gr, NetCDFIO_Stats NS):
+        # Write reference profiles to StatsIO
+        NS.add_reference_profile('alpha0', Gr)
+        NS.write_reference_profile('alpha0', self.alpha0_half[Gr.gw:-Gr.gw])
+        NS.add_reference_profile('p0', Gr)
+        NS.write_reference_profile('p0', self.p0_half[Gr.gw:-Gr.gw])
+        NS.add_reference_profile('rho0', Gr)
+        NS.write_reference_profile('rho0', self.rho0_half[Gr.gw:-Gr.gw])
+        NS.add_reference_profile('temperature0', Gr)
+        NS.write_reference_profile('temperature0', self.temperature0_half[Gr.gw:-Gr.gw])
+        NS.add_reference_profile('ql0', Gr)
+        NS.write_reference_profile('ql0', self.ql0_half[Gr.gw:-Gr.gw])
+        NS.add_reference_profile('qv0', Gr)
+        NS.write_reference_profile('qv0', self.qv0_half[Gr.gw:-Gr.gw])
+        NS.add_reference_profile('qi0', Gr)
+        NS.write_reference_profile('qi0', self.qi0_half[Gr.gw:-Gr.gw])
+        return
+
+    def cache_key(self, Grid Gr):
+        # everything the reference profiles depend on (repr: floats are compared exactly)
+        inputs = {'Pg': repr(self.Pg), 'Tg': repr(self.Tg), 'qtg': repr(self.qtg),
+                  'nz': Gr.nz, 'gw': Gr.gw, 'dz': repr(Gr.dz),
+                  'integrator': self.integrator, 'tolerance': repr(self.tolerance), 'lookup': lookup_config(),
+                  'parameters': [repr(g), repr(Rd), repr(Rv), repr(eps_vi), repr(cpd), repr(cpv), repr(cl),
+                                 repr(T_tilde), repr(p_tilde), repr(sd_tilde), repr(sv_tilde)]}
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def compute_profiles(self, Grid Gr):
+        '''
+        Integrates the hydrostatic equation and computes the thermodynamic reference profiles (uses self.sg)
+        :return: dictionary of the profiles (full and half levels, incl. ghost points)
+        '''
         # ((2)) Pressure Profile (Hydrostatic)
         # (2a) Construct arrays for integration points
         z = np.array(Gr.z[Gr.gw - 1:-Gr.gw + 1])
@@ -67,7 +267,7 @@ cdef class ReferenceState:
         #       (i) Form the right hand side of the hydrostatic equation to calculate log(p)
         def rhs(p,z):
             # return of structure a necessary for multiple return from cython function
-            a = eos(np.exp(p), self.qtg, self.sg)       # # T, ql, qi = Thermodynamics.eos(np.exp(p), self.sg, self.qtg)
+            a = eos(np.exp(p[0]), self.qtg, self.sg)       # # T, ql, qi = Thermodynamics.eos(np.exp(p), self.sg, self.qtg)
             qi = 0.0
             ql = a['ql']
             T = a['T']
@@ -79,8 +279,21 @@ cdef class ReferenceState:
         p_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
 
         #       (iii) Integrate for log(p)
-        p[Gr.gw - 1:-Gr.gw +1] = odeint(rhs, p0, z, hmax=1.0)[:, 0]     # only unsaturated eos in DCBLSoares
-        p_half[Gr.gw:-Gr.gw] = odeint(rhs, p0, z_half, hmax=1.0)[1:, 0]     # only unsaturated eos in DCBLSoares
+        cdef:
+            double[:] logp
+            double logp_surface = p0
+            Py_ssize_t nsub
+        if self.integrator == 'odeint':
+            p[Gr.gw - 1:-Gr.gw +1] = odeint(rhs, p0, z, hmax=1.0)[:, 0]     # only unsaturated eos in DCBLSoares
+            p_half[Gr.gw:-Gr.gw] = odeint(rhs, p0, z_half, hmax=1.0)[1:, 0]     # only unsaturated eos in DCBLSoares
+        else:
+            # z = m*dz/2: full levels (z = 0, ..., (nz+1)*dz) at even m, half levels (z = dz/2, ...) at odd m
+            logp = np.zeros(2 * Gr.nz + 3, dtype=np.double, order='c')
+            with nogil:
+                nsub = integrate_hydrostatic(logp_surface, self.qtg, self.sg, 0.5 * Gr.dz, self.tolerance, logp)
+            p[Gr.gw - 1:-Gr.gw + 1] = np.array(logp[0::2])
+            p_half[Gr.gw:-Gr.gw] = np.array(logp[1:2 * Gr.nz:2])
+            print('Reference state: RK4 with up to ' + str(nsub) + ' substeps per dz')
 
         # (2c) Set boundary conditions
         p[:Gr.gw - 1] = p[2 * Gr.gw - 2:Gr.gw - 1:-1]
@@ -112,17 +325,19 @@ cdef class ReferenceState:
         cdef double[:] qv_half = np.zeros(Gr.nzg, dtype=np.double, order='c')
 
 
+        # saturation adjustment of the full and half levels (constant entropy and qt)
+        cdef:
+            Py_ssize_t k
+            double[:] qt_ = np.full(Gr.nzg, self.qtg, dtype=np.double, order='c')
+            double[:] s_ = np.full(Gr.nzg, self.sg, dtype=np.double, order='c')
+        eos_profile(p_, qt_, s_, temperature, ql, False)       # temperature[k], ql[k], qi[k] = Thermodynamics.eos(p_[k], self.sg, self.qtg)
+        eos_profile(p_half_, qt_, s_, temperature_half, ql_half, False)
+
         for k in xrange(Gr.nzg):
-            a = eos(p_[k], self.qtg, self.sg)       # temperature[k], ql[k], qi[k] = Thermodynamics.eos(p_[k], self.sg, self.qtg)
-            temperature[k] = a['T']
-            ql[k] = a['ql']
             qi[k] = 0.0
             qv[k] = self.qtg - (ql[k] + qi[k])
             alpha[k] = alpha_from_tp(p_[k], temperature[k], self.qtg, qv[k])        # alpha[k] = Thermodynamics.alpha(p_[k], temperature[k], self.qtg, qv[k])
 
-            a = eos(p_half_[k], self.qtg, self.sg)      # temperature_half[k], ql_half[k], qi_half[k] = Thermodynamics.eos(p_half_[k], self.sg, self.qtg)
-            temperature_half[k] = a['T']
-            ql_half[k] = a['ql']
             qi_half[k] = 0.0
             qv_half[k] = self.qtg - (ql_half[k] + qi_half[k])
             alpha_half[k] = alpha_from_tp(p_half_[k], temperature_half[k], self.qtg, qv_half[k])        # alpha_half[k] = Thermodynamics.alpha(p_half_[k], temperature_half[k], self.qtg, qv_half[k])
@@ -138,90 +353,56 @@ cdef class ReferenceState:
                 print('Kill Simulation Now!')
                 sys.exit()
 
-        self.alpha0_half = alpha_half
-        self.alpha0 = alpha
-        self.p0 = p_
-        self.p0_half = p_half
-        self.rho0 = 1.0 / np.array(self.alpha0)
-        self.rho0_half = 1.0 / np.array(self.alpha0_half)
-
-        # Write reference profiles to StatsIO
-        NS.add_reference_profile('alpha0', Gr)
-        NS.write_reference_profile('alpha0', alpha_half[Gr.gw:-Gr.gw])
-        NS.add_reference_profile('p0', Gr)
-        NS.write_reference_profile('p0', p_half[Gr.gw:-Gr.gw])
-        NS.add_reference_profile('rho0', Gr)
-        NS.write_reference_profile('rho0', 1.0 / np.array(alpha_half[Gr.gw:-Gr.gw]))
-        NS.add_reference_profile('temperature0', Gr)
-        NS.write_reference_profile('temperature0', temperature_half[Gr.gw:-Gr.gw])
-        NS.add_reference_profile('ql0', Gr)
-        NS.write_reference_profile('ql0', ql_half[Gr.gw:-Gr.gw])
-        NS.add_reference_profile('qv0', Gr)
-        NS.write_reference_profile('qv0', qv_half[Gr.gw:-Gr.gw])
-        NS.add_reference_profile('qi0', Gr)
-        NS.write_reference_profile('qi0', qi_half[Gr.gw:-Gr.gw])
-
-        return
-
-
-
-
+        return {'p0': np.array(p_), 'p0_half': np.array(p_half_), 'alpha0': np.array(alpha),
+                'alpha0_half': np.array(alpha_half), 'temperature_half': np.array(temperature_half),
+                'ql_half': np.array(ql_half), 'qv_half': np.array(qv_half), 'qi_half': np.array(qi_half)}
 
 
 
 
 
+    cpdef restart(self, Grid Gr, Restart.Restart Re):
+        Re.restart_data['Ref'] = {}
 
+        Re.restart_data['Ref']['p0'] = np.array(self.p0)
+        Re.restart_data['Ref']['p0_half'] = np.array(self.p0_half)
+        Re.restart_data['Ref']['alpha0'] = np.array(self.alpha0)
+        Re.restart_data['Ref']['alpha0_half'] = np.array(self.alpha0_half)
+        Re.restart_data['Ref']['temperature0_half'] = np.array(self.temperature0_half)
+        Re.restart_data['Ref']['ql0_half'] = np.array(self.ql0_half)
+        Re.restart_data['Ref']['qv0_half'] = np.array(self.qv0_half)
+        Re.restart_data['Ref']['qi0_half'] = np.array(self.qi0_half)
 
+        Re.restart_data['Ref']['Tg'] = self.Tg
+        Re.restart_data['Ref']['Pg'] = self.Pg
+        Re.restart_data['Ref']['sg'] = self.sg
+        Re.restart_data['Ref']['qtg'] = self.qtg
+        Re.restart_data['Ref']['u0'] = self.u0
+        Re.restart_data['Ref']['v0'] = self.v0
 
+        return
 
-    # cpdef restart(self, Grid Gr, Restart.Restart Re):
-    #     Re.restart_data['Ref'] = {}
-    #
-    #     Re.restart_data['Ref']['p0'] = np.array(self.p0)
-    #     Re.restart_data['Ref']['p0_half'] = np.array(self.p0_half)
-    #     Re.restart_data['Ref']['alpha0'] = np.array(self.alpha0)
-    #     Re.restart_data['Ref']['alpha0_half'] = np.array(self.alpha0_half)
-    #
-    #     Re.restart_data['Ref']['p0_global'] = np.array(self.p0_global)
-    #     Re.restart_data['Ref']['p0_half_global'] = np.array(self.p0_half_global)
-    #     Re.restart_data['Ref']['alpha0_global'] = np.array(self.alpha0_global)
-    #     Re.restart_data['Ref']['alpha0_half_global'] = np.array(self.alpha0_half_global)
-    #
-    #     Re.restart_data['Ref']['Tg'] = self.Tg
-    #     Re.restart_data['Ref']['Pg'] = self.Pg
-    #     Re.restart_data['Ref']['sg'] = self.sg
-    #     Re.restart_data['Ref']['qtg'] = self.qtg
-    #     Re.restart_data['Ref']['u0'] = self.u0
-    #     Re.restart_data['Ref']['v0'] = self.v0
-    #
-    #     return
-
-
-    # cpdef init_from_restart(self, Grid.Grid Gr, Restart.Restart Re):
-    #
-    #     self.Tg = Re.restart_data['Ref']['Tg']
-    #     self.Pg = Re.restart_data['Ref']['Pg']
-    #     self.sg = Re.restart_data['Ref']['sg']
-    #     self.qtg = Re.restart_data['Ref']['qtg']
-    #     self.u0 = Re.restart_data['Ref']['u0']
-    #     self.v0 = Re.restart_data['Ref']['v0']
-    #
-    #     self.p0 = Re.restart_data['Ref']['p0']
-    #     self.p0_half = Re.restart_data['Ref']['p0_half']
-    #     self.alpha0 = Re.restart_data['Ref']['alpha0']
-    #     self.alpha0_half = Re.restart_data['Ref']['alpha0_half']
-    #     self.rho0 = 1.0 / Re.restart_data['Ref']['alpha0']
-    #     self.rho0_half = 1.0 / Re.restart_data['Ref']['alpha0_half']
-    #
-    #     self.p0_global = Re.restart_data['Ref']['p0_global']
-    #     self.p0_half_global = Re.restart_data['Ref']['p0_half_global']
-    #     self.alpha0_global = Re.restart_data['Ref']['alpha0_global']
-    #     self.alpha0_half_global = Re.restart_data['Ref']['alpha0_half_global']
-    #     self.rho0_global = 1.0 / Re.restart_data['Ref']['alpha0_global']
-    #     self.rho0_half_global = 1.0 / Re.restart_data['Ref']['alpha0_half_global']
 
-    #     return
+    cpdef init_from_restart(self, Grid Gr, Restart.Restart Re, NetCDFIO_Stats NS):
+        # replaces initialize (no integration of the hydrostatic equation)
+        self.Tg = Re.restart_data['Ref']['Tg']
+        self.Pg = Re.restart_data['Ref']['Pg']
+        self.sg = Re.restart_data['Ref']['sg']
+        self.qtg = Re.restart_data['Ref']['qtg']
+        self.u0 = Re.restart_data['Ref']['u0']
+        self.v0 = Re.restart_data['Ref']['v0']
 
+        self.p0 = np.array(Re.restart_data['Ref']['p0'])
+        self.p0_half = np.array(Re.restart_data['Ref']['p0_half'])
+        self.alpha0 = np.array(Re.restart_data['Ref']['alpha0'])
+        self.alpha0_half = np.array(Re.restart_data['Ref']['alpha0_half'])
+        self.rho0 = 1.0 / np.array(self.alpha0)
+        self.rho0_half = 1.0 / np.array(self.alpha0_half)
+        self.temperature0_half = np.array(Re.restart_data['Ref']['temperature0_half'])
+        self.ql0_half = np.array(Re.restart_data['Ref']['ql0_half'])
+        self.qv0_half = np.array(Re.restart_data['Ref']['qv0_half'])
+        self.qi0_half = np.array(Re.restart_data['Ref']['qi0_half'])
 
+        self.write_reference_profiles(Gr, NS)
 
+        return
@@ -0,0 +1,16 @@
+cdef class Restart:
+    cdef:
+        public dict restart_data
+        str restart_path
+        str input_path
+        str uuid
+        public double last_restart_time
+        public double frequency
+        public bint do_restart
+        public bint is_restart_run
+
+    cpdef initialize(self)
+    cpdef write(self)
+    cpdef read(self)
+    cpdef Restart branch(self, Py_ssize_t member)
+    cpdef free_memory(self)
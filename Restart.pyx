@@ -0,0 +1,175 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+import os
+import json
+import struct
+import sys
+import numpy as np
+cimport numpy as np
+import cython
+cimport Logger
+import Logger
+
+cdef Logger.Logger Log = Logger.Log
+
+'''
+Restart files: one flat binary file per checkpoint (Output.<simname>.<uuid>/Restart/<t>.bin)
+
+    bytes 0-7:      magic ('SCMRST01')
+    bytes 8-15:     length of the header (int64, little endian)
+    header:         json, padded with blanks to a multiple of 8 bytes
+                    {'arrays': {group: {name: [offset, size]}}, 'scalars': {group: {name: value}}}
+    data:           all arrays as one contiguous float64 (little endian) block; offset and size in units of doubles
+
+The data block is read with np.memmap, i.e. nothing is unpickled and the arrays are only paged in when they are
+copied into the buffers of the model components (init_from_restart).
+
+self.restart_data[group][name]: filled by the restart(...) methods of the components before write();
+                                numpy arrays go to the data block, all other entries (json serializable) to the header
+'''
+
+_magic = b'SCMRST01'
+
+
+cdef class Restart:
+    @cython.wraparound(True)
+    def __init__(self, dict namelist):
+        self.uuid = str(namelist['meta']['uuid'])
+        outpath = str(os.path.join(namelist['output']['output_root'] + 'Output.' + namelist['meta']['simname'] + '.' + self.uuid[-5:]))
+        self.restart_path = str(os.path.join(outpath, 'Restart'))
+
+        try:
+            self.do_restart = namelist['restart']['output']
+        except:
+            self.do_restart = False
+        try:
+            self.frequency = namelist['restart']['frequency']
+        except:
+            self.frequency = 600.0
+
+        # restart from a checkpoint file or from the latest checkpoint in a Restart directory
+        try:
+            self.is_restart_run = namelist['restart']['init_from']
+        except:
+            self.is_restart_run = False
+        if self.is_restart_run:
+            try:
+                self.input_path = str(namelist['restart']['input_path'])
+            except:
+                print('restart: init_from = True but no input_path given. Killing simulation now!')
+                sys.exit()
+
+        self.last_restart_time = 0.0
+        self.restart_data = {}
+        return
+
+    cpdef initialize(self):
+        self.restart_data = {}
+        if self.do_restart:
+            try:
+                os.makedirs(self.restart_path)
+            except:
+                pass
+        return
+
+    cpdef write(self):
+        cdef:
+            dict arrays = {}
+            dict scalars = {}
+            list blocks = []
+            Py_ssize_t offset = 0
+
+        self.restart_data['Restart'] = {'last_restart_time': self.last_restart_time}
+        for group in sorted(self.restart_data.keys()):
+            arrays[group] = {}
+            scalars[group] = {}
+            for name in sorted(self.restart_data[group].keys()):
+                value = self.restart_data[group][name]
+                if isinstance(value, np.ndarray):
+                    value = np.ascontiguousarray(value, dtype='<f8').ravel()
+                    arrays[group][name] = [offset, value.size]
+                    blocks.append(value)
+                    offset += value.size
+                else:
+                    scalars[group][name] = value
+
+        header = json.dumps({'arrays': arrays, 'scalars': scalars}, sort_keys=True).encode('utf-8')
+        header += b' ' * (-len(header) % 8)
+
+        # write to a temporary file first, so that a preempted run never leaves a truncated checkpoint behind
+        file_name = os.path.join(self.restart_path, '%.6f' % self.last_restart_time + '.bin')
+        fh = open(file_name + '.tmp', 'wb')
+        fh.write(_magic)
+        fh.write(struct.pack('<q', len(header)))
+        fh.write(header)
+        for block in blocks:
+            block.tofile(fh)
+        fh.close()
+        os.rename(file_name + '.tmp', file_name)
+        Log.info('Restart: written ' + file_name)
+        return
+
+    @cython.wraparound(True)
+    cpdef read(self):
+        file_name = self.input_path
+        if os.path.isdir(file_name):
+            # latest checkpoint in the directory
+            checkpoints = {}
+            for f in os.listdir(file_name):
+                if f.endswith('.bin'):
+                    checkpoints[float(f[:-4])] = f
+            if len(checkpoints) == 0:
+                print('restart: no checkpoint found in ' + file_name + '. Killing simulation now!')
+                sys.exit()
+            file_name = os.path.join(file_name, checkpoints[max(checkpoints)])
+
+        fh = open(file_name, 'rb')
+        if fh.read(8) != _magic:
+            print('restart: ' + file_name + ' is not a restart file. Killing simulation now!')
+            sys.exit()
+        header_len = struct.unpack('<q', fh.read(8))[0]
+        header = json.loads(fh.read(header_len).decode('utf-8'))
+        fh.close()
+
+        size = 0
+        for group in header['arrays']:
+            for name in header['arrays'][group]:
+                offset, n = header['arrays'][group][name]
+                size = max(size, offset + n)
+        if size > 0:
+            data = np.memmap(file_name, dtype='<f8', mode='r', offset=16 + header_len, shape=(size,))
+
+        self.restart_data = {}
+        for group in header['scalars']:
+            self.restart_data[group] = dict(header['scalars'][group])
+        for group in header['arrays']:
+            for name in header['arrays'][group]:
+                offset, n = header['arrays'][group][name]
+                self.restart_data[group][name] = data[offset:offset+n]
+
+        self.last_restart_time = self.restart_data['Restart']['last_restart_time']
+        print('Restart: read ' + file_name)
+        return
+
+    cpdef Restart branch(self, Py_ssize_t member):
+        # checkpoints of a forked member go to Restart/member_<i>
+        cdef Restart Re = Restart.__new__(Restart)
+        Re.uuid = self.uuid
+        Re.restart_path = str(os.path.join(self.restart_path, 'member_' + str(member)))
+        Re.input_path = self.input_path
+        Re.frequency = self.frequency
+        Re.do_restart = self.do_restart
+        Re.is_restart_run = False
+        Re.last_restart_time = self.last_restart_time
+        Re.restart_data = {}
+        Re.initialize()
+        return Re
+
+    cpdef free_memory(self):
+        # drops the references to the arrays (and the memory map)
+        self.restart_data = {}
+        return
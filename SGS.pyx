@@ -6,6 +6,7 @@
 
 from Grid cimport Grid
 cimport PrognosticVariables
+cimport Restart
 # cimport DiagnosticVariables
 # cimport Kinematics
 # cimport Surface
@@ -43,32 +44,43 @@ class UniformViscosity():
     def initialize(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
         print('initializing UniformViscosity')
         self.is_init = False
-        self.viscosity_M1 = np.zeros((M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
-        self.diffusivity_M1 = np.zeros((M1.nv_scalars*Gr.nzg),dtype=np.double,order='c')
-        self.viscosity_M2 = np.zeros((M2.nv_velocities*Gr.nzg),dtype=np.double,order='c')
-        self.diffusivity_M2 = np.zeros((M2.nv_scalars*Gr.nzg),dtype=np.double,order='c')
+        # the constants can be given per column (list of length Gr.ncol) or as a single value for all columns
+        self.const_viscosity = np.ones((Gr.ncol,),dtype=np.double) * np.array(self.const_viscosity,dtype=np.double)
+        self.const_diffusivity = np.ones((Gr.ncol,),dtype=np.double) * np.array(self.const_diffusivity,dtype=np.double)
+        self.viscosity_M1 = np.zeros((Gr.ncol*M1.nv_velocities*Gr.nzg),dtype=np.double,order='c')
+        self.diffusivity_M1 = np.zeros((Gr.ncol*M1.nv_scalars*Gr.nzg),dtype=np.double,order='c')
+        self.viscosity_M2 = np.zeros((Gr.ncol*M2.nv_velocities*Gr.nzg),dtype=np.double,order='c')
+        self.diffusivity_M2 = np.zeros((Gr.ncol*M2.nv_scalars*Gr.nzg),dtype=np.double,order='c')
         return
 
 
     # cpdef update(self, Grid Gr,  DiagnosticVariables.DiagnosticVariables DV,
     #              PrognosticVariables.PrognosticVariables PV, Kinematics.Kinematics Ke, Surface.SurfaceBase Sur):
     def update(self, Grid Gr):
-        # Py_ssize_t k
-        size_visc_M1 = self.viscosity_M1.size
-        size_diff_M1 = self.diffusivity_M1.size
-        size_visc_M2 = self.viscosity_M2.size
-        size_diff_M2 = self.diffusivity_M2.size
-
+        # layout of the coefficient arrays: (ncol, nv_velocities or nv_scalars, nzg)
         if not self.is_init:
             self.is_init = True
-            for k in xrange(size_visc_M1):
-                self.viscosity_M1[k] = self.const_viscosity
-            for k in xrange(size_visc_M2):
-                self.viscosity_M2[k] = self.const_viscosity
-            for k in xrange(size_diff_M1):
-                self.diffusivity_M1[k] = self.const_diffusivity
-            for k in xrange(size_diff_M2):
-                self.diffusivity_M2[k] = self.const_diffusivity
+            for coeff, const in ((self.viscosity_M1, self.const_viscosity), (self.viscosity_M2, self.const_viscosity),
+                                 (self.diffusivity_M1, self.const_diffusivity), (self.diffusivity_M2, self.const_diffusivity)):
+                coeff.reshape(Gr.ncol, -1)[:,:] = const[:,np.newaxis]
+        return
+
+
+    def restart(self, Restart.Restart Re):
+        Re.restart_data['SGS'] = {}
+        Re.restart_data['SGS']['viscosity_M1'] = np.array(self.viscosity_M1)
+        Re.restart_data['SGS']['diffusivity_M1'] = np.array(self.diffusivity_M1)
+        Re.restart_data['SGS']['viscosity_M2'] = np.array(self.viscosity_M2)
+        Re.restart_data['SGS']['diffusivity_M2'] = np.array(self.diffusivity_M2)
+        return
+
+
+    def init_from_restart(self, Grid Gr, Restart.Restart Re):
+        self.viscosity_M1[:] = Re.restart_data['SGS']['viscosity_M1']
+        self.diffusivity_M1[:] = Re.restart_data['SGS']['diffusivity_M1']
+        self.viscosity_M2[:] = Re.restart_data['SGS']['viscosity_M2']
+        self.diffusivity_M2[:] = Re.restart_data['SGS']['diffusivity_M2']
+        self.is_init = True
         return
 
 
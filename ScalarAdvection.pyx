@@ -19,8 +19,12 @@ cimport numpy as np
 import sys
 
 import cython
+cimport Logger
+import Logger
 
 
+cdef Logger.Logger Log = Logger.Log
+
 cdef class ScalarAdvection:
     def __init__(self, namelist):
         try:
@@ -38,8 +42,8 @@ cdef class ScalarAdvection:
 
     cpdef initialize(self, Grid Gr, MeanVariables M1):
         # self.flux = np.zeros((PV.nv_scalars*Gr.dims.npg*Gr.dims,),dtype=np.double,order='c')
-        self.flux = np.zeros((M1.nv_scalars*Gr.nzg),dtype=np.double,order='c')
-        self.tendencies = np.zeros((M1.nv_scalars*Gr.nzg),dtype=np.double,order='c')
+        self.flux = np.zeros((Gr.ncol*M1.nv_scalars*Gr.nzg),dtype=np.double,order='c')
+        self.tendencies = np.zeros((Gr.ncol*M1.nv_scalars*Gr.nzg),dtype=np.double,order='c')
         return
 
 
@@ -58,7 +62,7 @@ cdef class ScalarAdvection:
 
 
     cpdef update_M1_2nd(self, Grid Gr, ReferenceState Ref, MeanVariables M1):
-        print('Scalar Advection M1: update 2nd')
+        Log.debug('Scalar Advection M1: update 2nd')
         # (1) update tendencies for Mean Variables
         #       - only vertical advection
         # (1a) advection by mean velocity: 1/rho0*\partialz(rho0 <w><phi>)
@@ -69,7 +73,8 @@ cdef class ScalarAdvection:
             Py_ssize_t d
             Py_ssize_t scalar_count=0
             Py_ssize_t k
-            Py_ssize_t w_varshift = M1.get_varshift(Gr,'w')
+            Py_ssize_t w_varshift = M1.shift.w
+            Py_ssize_t n, col_shift, w_shift, flux_shift
             double dzi = Gr.dzi
 
             double [:] M1_values = M1.values
@@ -86,20 +91,24 @@ cdef class ScalarAdvection:
             # Py_ssize_t t_shift = DV.get_varshift(Gr,'temperature')
             # Py_ssize_t ql_shift, qv_shift, qt_shift
 
-        for i in xrange(M1.nv): #Loop over the prognostic variables
-            if M1.var_type[i] == 1: #Only compute advection if variable i is a scalar
-                scalar_shift = i * Gr.nzg
-                flux_shift = scalar_count * Gr.nzg      #The flux has a different shift since it is only for the scalars
-                # print('scalar count', scalar_count)
-                # print('scalar shift', scalar_shift)
-                # print('flux_shift', flux_shift)
-                for k in xrange(1,Gr.nzg-1):
-                    scalar_int = 0.5*(M1_values[scalar_shift+k]+M1_values[scalar_shift+k+1])
-                    flux[flux_shift+k] = rho0[k]*M1_values[w_varshift+k]*scalar_int
-                    # pass
-                    # flux[ijk] = interp_2(scalar[ijk],scalar[ijk+sp1]) * velocity[ijk]*rho0[k]
-                    tendency[flux_shift+k] = - alpha0_half[k]*(flux[k]-flux[k-1])*dzi
-                scalar_count += 1
+        for n in xrange(Gr.ncol):
+            col_shift = M1.get_colshift(Gr, n)
+            scalar_count = 0
+            for i in xrange(M1.nv): #Loop over the prognostic variables
+                if M1.var_type[i] == 1: #Only compute advection if variable i is a scalar
+                    scalar_shift = col_shift + M1.var_shifts[i]
+                    w_shift = col_shift + w_varshift
+                    flux_shift = (n * M1.nv_scalars + scalar_count) * Gr.nzg      #The flux has a different shift since it is only for the scalars
+                    # print('scalar count', scalar_count)
+                    # print('scalar shift', scalar_shift)
+                    # print('flux_shift', flux_shift)
+                    for k in xrange(1,Gr.nzg-1):
+                        scalar_int = 0.5*(M1_values[scalar_shift+k]+M1_values[scalar_shift+k+1])
+                        flux[flux_shift+k] = rho0[k]*M1_values[w_shift+k]*scalar_int
+                        # pass
+                        # flux[ijk] = interp_2(scalar[ijk],scalar[ijk+sp1]) * velocity[ijk]*rho0[k]
+                        tendency[flux_shift+k] = - alpha0_half[k]*(flux[flux_shift+k]-flux[flux_shift+k-1])*dzi
+                    scalar_count += 1
         # print(tendency.shape, tendency.size, scalar_shift, k)
 
 
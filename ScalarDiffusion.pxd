@@ -0,0 +1,13 @@
+from Grid cimport Grid
+from PrognosticVariables cimport MeanVariables
+from ReferenceState cimport ReferenceState
+
+cdef class ScalarDiffusion:
+    cdef:
+        bint implicit
+        double [:] flux
+        double [:] tendencies
+
+    cpdef initialize(self, Grid Gr, MeanVariables M1)
+    cpdef update(self, Grid Gr, ReferenceState Ref, MeanVariables M1, SGS)
+    cpdef stats_io(self)
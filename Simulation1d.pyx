@@ -5,6 +5,7 @@
 
 
 import time
+import sys
 import numpy as np
 cimport numpy as np
 import os       # for self.outpath
@@ -20,18 +21,29 @@ cimport ScalarAdvection
 from SGS import SGSFactory
 cimport MomentumDiffusion
 cimport ScalarDiffusion
+cimport ImplicitDiffusion
 cimport NetCDFIO
+cimport Restart
+cimport VisualizationOutput
+cimport Timers
 from Thermodynamics import ThermodynamicsFactory
+import thermodynamic_functions
 from TurbulenceScheme import TurbulenceFactory
+cimport Logger
+import Logger
 # cimport TurbulenceScheme
 
 
 
+cdef Logger.Logger Log = Logger.Log
+
 class Simulation1d:
     def __init__(self, namelist):
+        Logger.configure(namelist)
+        thermodynamic_functions.configure(namelist)       # latent heat / pv_star: analytic or lookup tables
         self.Gr = Grid(namelist)
         self.TS = TimeStepping.TimeStepping()
-        self.Ref = ReferenceState.ReferenceState(self.Gr)
+        self.Ref = ReferenceState.ReferenceState(self.Gr, namelist)
         self.Init = InitializationFactory(namelist)
 
         self.PV = PrognosticVariables.PrognosticVariables(self.Gr)
@@ -45,10 +57,14 @@ class Simulation1d:
         self.Turb = TurbulenceFactory(namelist)
 
         self.SGS = SGSFactory(namelist)
-        self.MD = MomentumDiffusion.MomentumDiffusion()
+        self.MD = MomentumDiffusion.MomentumDiffusion(namelist)
         self.SD = ScalarDiffusion.ScalarDiffusion(namelist)
+        self.ID = ImplicitDiffusion.ImplicitDiffusion(namelist)
 
         self.StatsIO = NetCDFIO.NetCDFIO_Stats()
+        self.Restart = Restart.Restart(namelist)
+        self.VO = VisualizationOutput.VisualizationOutput(namelist)
+        self.Timers = Timers.Timers(namelist)
         return
 
     def initialize(self, namelist):
@@ -57,41 +73,45 @@ class Simulation1d:
         self.outpath = str(os.path.join(namelist['output']['output_root'] + 'Output.' + namelist['meta']['simname'] + '.' + uuid[-5:]))
         self.StatsIO.initialize(namelist, self.Gr)
 
-        self.TS.initialize(namelist)
-
         # Add new prognostic variables
-        self.PV.add_variable('phi', 'm/s', "velocity")      # self.PV.add_variable('phi', 'm/s', "sym", "velocity")
-        # cdef:
-        #     PV_ = self.PV
-        # print(PV_.nv)     #not accessible (also not as # print(self.PV.nv))
-        self.M1.add_variable('u', 'm/s', "velocity")
-        self.M1.add_variable('v', 'm/s', "velocity")
-        self.M1.add_variable('w', 'm/s', "velocity")
-
-        self.M2.add_variable('uu', '(m/s)^2', "velocity")
-        self.M2.add_variable('vv', '(m/s)^2', "velocity")
-        self.M2.add_variable('wu', '(m/s)^2', "velocity")
-        self.M2.add_variable('wv', '(m/s)^2', "velocity")
-        self.M2.add_variable('ww', '(m/s)^2', "velocity")
-        self.M2.add_variable('pu', '(m/s)^2', "velocity")
-        self.M2.add_variable('pv', '(m/s)^2', "velocity")
-        self.M2.add_variable('pw', '(m/s)^2', "velocity")
-
+        self.add_variables()
 
         # AuxillaryVariables(namelist, self.PV, self.DV, self.Pa)
         self.Th.initialize(self.Gr, self.M1, self.M2)        # adding prognostic thermodynamic variables
         self.PV.initialize(self.Gr, self.StatsIO)
         self.M1.initialize(self.Gr, self.StatsIO)
         self.M2.initialize(self.Gr, self.StatsIO)
-
-        self.Init.initialize_reference(self.Gr, self.Ref, self.StatsIO)
-        self.Init.initialize_profiles(self.Gr, self.Ref, self.M1, self.M2, self.StatsIO)
+        self.TS.initialize(namelist, self.M1, self.M2)
+
+        if self.Restart.is_restart_run:
+            # reference state, profiles and time from the checkpoint (no integration of the hydrostatic equation)
+            self.Restart.read()
+            self.Ref.init_from_restart(self.Gr, self.Restart, self.StatsIO)
+            self.M1.init_from_restart(self.Gr, self.Restart)
+            self.M2.init_from_restart(self.Gr, self.Restart)
+            self.TS.init_from_restart(self.Restart)
+            self.StatsIO.last_output_time = self.TS.t
+        else:
+            self.Init.initialize_reference(self.Gr, self.Ref, self.StatsIO)
+            self.Init.initialize_profiles(self.Gr, self.Ref, self.M1, self.M2, self.StatsIO)
 
         self.MA.initialize(self.Gr, self.M1)
         self.SA.initialize(self.Gr, self.M1)
         self.SGS.initialize(self.Gr, self.M1, self.M2)
         self.MD.initialize(self.Gr, self.M1)
         self.SD.initialize(self.Gr, self.M1)
+        self.ID.initialize(self.Gr, self.M1, self.M2)
+        self.Turb.initialize(self.Gr, self.M1, self.M2)
+
+        if self.Restart.is_restart_run:
+            self.SGS.init_from_restart(self.Gr, self.Restart)
+            self.Restart.free_memory()
+        self.Restart.initialize()
+        self.VO.initialize()
+        self.VO.last_vis_time = self.TS.t
+
+        # create the stats file with all variables registered above
+        self.StatsIO.write_schema(self.Gr)
 
         print('Initialization completed!')
         # self.plot()
@@ -99,48 +119,169 @@ class Simulation1d:
 
 
 
+    def add_variables(self):
+        # prognostic variables of the column model (the thermodynamic variables are added by Th.initialize)
+        self.PV.add_variable('phi', 'm/s', "velocity")      # self.PV.add_variable('phi', 'm/s', "sym", "velocity")
+        # cdef:
+        #     PV_ = self.PV
+        # print(PV_.nv)     #not accessible (also not as # print(self.PV.nv))
+        self.M1.add_variable('u', 'm/s', "velocity")
+        self.M1.add_variable('v', 'm/s', "velocity")
+        self.M1.add_variable('w', 'm/s', "velocity", 'w')
+
+        self.M2.add_variable('uu', '(m/s)^2', "velocity")
+        self.M2.add_variable('vv', '(m/s)^2', "velocity")
+        self.M2.add_variable('wu', '(m/s)^2', "velocity", 'w')
+        self.M2.add_variable('wv', '(m/s)^2', "velocity", 'w')
+        self.M2.add_variable('ww', '(m/s)^2', "velocity")
+        self.M2.add_variable('pu', '(m/s)^2', "velocity")
+        self.M2.add_variable('pv', '(m/s)^2', "velocity")
+        self.M2.add_variable('pw', '(m/s)^2', "velocity", 'w')
+        return
+
+
+
+    def fork(self, namelist, n_members, seed=0):
+        '''
+        Branch n_members perturbed runs from the current (initialized and spun-up) state, without re-initialization.
+        Shared with all members: Grid, ReferenceState and the operators, which only hold scratch space or constant
+        coefficients (Init, MA, SA, SGS, MD, SD, ID, Turb) --> the members have to be advanced one after the other.
+        Per member: copies of M1 and M2, a copy of the thermodynamics (ThermodynamicsSA keeps T and ql as first guess
+        of the saturation adjustment), a TimeStepping at the current time, a copy of the stats file
+        (Stats.<simname>.member_<i>.nc), checkpoints in Restart/member_<i> and the perturbation stream
+        np.random.RandomState(seed + i).
+        :return: list of Simulation1d
+        '''
+        members = []
+        for i in xrange(n_members):
+            Sim = Simulation1d.__new__(Simulation1d)
+            Sim.__dict__.update(self.__dict__)
+
+            Sim.PV = self.PV.branch()
+            Sim.M1 = self.M1.branch()
+            Sim.M2 = self.M2.branch()
+            Sim.Th = self.Th.branch()
+            Sim.TS = TimeStepping.TimeStepping()
+            Sim.TS.initialize(namelist, Sim.M1, Sim.M2)
+            Sim.TS.t = self.TS.t
+            Sim.TS.dt = self.TS.dt
+            Sim.TS.nstep = self.TS.nstep
+            Sim.StatsIO = self.StatsIO.branch(i)
+            Sim.Restart = self.Restart.branch(i)
+            Sim.VO = self.VO.branch(i)
+            Sim.Timers = Timers.Timers(namelist)
+
+            Sim.random_state = np.random.RandomState(seed + i)
+            Sim.Init.perturb_profiles(Sim.Gr, Sim.Ref, Sim.M1, Sim.random_state)
+            members.append(Sim)
+        return members
+
+
+
     def run(self):
+        cdef:
+            Timers.Timers Ti = self.Timers
+            Py_ssize_t t_sgs = Ti.add('SGS')
+            Py_ssize_t t_th = Ti.add('Thermodynamics')
+            Py_ssize_t t_ma = Ti.add('MomentumAdvection')
+            Py_ssize_t t_sa = Ti.add('ScalarAdvection')
+            Py_ssize_t t_md = Ti.add('MomentumDiffusion')
+            Py_ssize_t t_sd = Ti.add('ScalarDiffusion')
+            Py_ssize_t t_turb_m1 = Ti.add('Turb.update_M1')
+            Py_ssize_t t_vis = Ti.add('Visualization')
+            Py_ssize_t t_turb = Ti.add('Turb.update')
+            Py_ssize_t t_ts = Ti.add('TS.update')
+            Py_ssize_t t_id = Ti.add('ImplicitDiffusion')
+            Py_ssize_t t_relax = Ti.add('Turb.update_relaxation')
+            Py_ssize_t t_dt = Ti.add('TS.adjust_timestep')
+            Py_ssize_t t_io = Ti.add('io')
         print('Sim: start run')
 
-        while(self.TS.t < self.TS.t_max):
-            # (0) update auxiliary fields
-            self.SGS.update(self.Gr)       # --> compute diffusivity / viscosity for M1 and M2 (being the same at the moment)
-            self.M1.plot('beginning of timestep', self.Gr, self.TS)
-            # (1) update mean field (M1) tendencies
-            # self.Th.update()
-            self.MA.update_M1_2nd(self.Gr, self.Ref, self.M1)       # self.MA.update(self.Gr, self.Ref, self.M1)
-            self.SA.update_M1_2nd(self.Gr, self.Ref, self.M1)       # self.SA.update(self.Gr, self.Ref, self.M1)
-
-            self.MD.update(self.Gr, self.Ref, self.M1, self.SGS)
-            self.SD.update(self.Gr, self.Ref, self.M1, self.SGS)
-            # self.M1.plot('after SD update', self.Gr, self.TS)
-
-            self.Turb.update_M1(self.Gr, self.M1, self.M2)                         # --> add turbulent flux divergence to mean field tendencies: dz<w'phi'>
-            # ??? surface fluxes ??? (--> in SGS or MD/SD scheme?)
-            # ??? update boundary conditions ???
-            # ??? pressure solver ???
-
-            self.M1.plot('without tendency update', self.Gr, self.TS)
-
-
-            # (2) update second order momenta (M2) tendencies
-            # self.MA.update                        # --> self.MA.update_M2(): advection of M2
-            # self.SA.update                        # --> self.SA.update_M2(): advection of M2
-            # self.MD.update()
-            # self.SD.update()
-            # self.Turb.update_M2()                 # update higher order terms in M2 tendencies
-            print('Sim: Turb update')
-            self.Turb.update(self.Gr, self.M1, self.M2)
-                # Turb.advect_M2_local(Gr, M1, M2)
-            # ??? update boundary conditions???
-            # ??? pressure correlations ???
-            # ??? surface fluxes ??? (--> in SGS or MD/SD scheme?)
-
-
-            self.M1.update(self.Gr, self.TS)        # --> updating values by adding tendencies
-            self.M2.update(self.Gr, self.TS)        # --> updating values by adding tendencies
-            self.TS.update()
-
+        # sys.exit() in a component (invalid time step, NaNs, ...): write the buffered output times before exiting
+        try:
+            while(self.TS.t < self.TS.t_max):
+                for self.TS.rk_step in xrange(self.TS.n_rk_steps):
+                    # (0) update auxiliary fields
+                    Ti.start(t_sgs)
+                    self.SGS.update(self.Gr)       # --> compute diffusivity / viscosity for M1 and M2 (being the same at the moment)
+                    Ti.stop(t_sgs)
+                    Ti.start(t_th)
+                    self.Th.update(self.Gr, self.Ref, self.M1)       # --> saturation adjustment (moist thermodynamics)
+                    Ti.stop(t_th)
+                    # (1) update mean field (M1) tendencies
+                    Ti.start(t_ma)
+                    self.MA.update_M1_2nd(self.Gr, self.Ref, self.M1)       # self.MA.update(self.Gr, self.Ref, self.M1)
+                    Ti.stop(t_ma)
+                    Ti.start(t_sa)
+                    self.SA.update_M1_2nd(self.Gr, self.Ref, self.M1)       # self.SA.update(self.Gr, self.Ref, self.M1)
+                    Ti.stop(t_sa)
+
+                    Ti.start(t_md)
+                    self.MD.update(self.Gr, self.Ref, self.M1, self.SGS)       # --> explicit diffusion (skipped if implicit)
+                    Ti.stop(t_md)
+                    Ti.start(t_sd)
+                    self.SD.update(self.Gr, self.Ref, self.M1, self.SGS)       # --> explicit diffusion (skipped if implicit)
+                    Ti.stop(t_sd)
+                    # self.M1.plot('after SD update', self.Gr, self.TS)
+
+                    Ti.start(t_turb_m1)
+                    self.Turb.update_M1(self.Gr, self.M1, self.M2)                         # --> add turbulent flux divergence to mean field tendencies: dz<w'phi'>
+                    Ti.stop(t_turb_m1)
+                    # ??? surface fluxes ??? (--> in SGS or MD/SD scheme?)
+                    # ??? update boundary conditions ???
+                    # ??? pressure solver ???
+
+                    Ti.start(t_vis)
+                    self.VO.update(self.Gr, self.TS, self.M1)      # --> snapshot of M1 values and tendencies at vis times
+                    Ti.stop(t_vis)
+
+
+                    # (2) update second order momenta (M2) tendencies
+                    # self.MA.update                        # --> self.MA.update_M2(): advection of M2
+                    # self.SA.update                        # --> self.SA.update_M2(): advection of M2
+                    # self.MD.update()
+                    # self.SD.update()
+                    # self.Turb.update_M2()                 # update higher order terms in M2 tendencies
+                    Log.debug('Sim: Turb update')
+                    Ti.start(t_turb)
+                    self.Turb.update(self.Gr, self.M1, self.M2)
+                    Ti.stop(t_turb)
+                        # Turb.advect_M2_local(Gr, M1, M2)
+                    # ??? update boundary conditions???
+                    # ??? pressure correlations ???
+                    # ??? surface fluxes ??? (--> in SGS or MD/SD scheme?)
+
+
+                    Ti.start(t_ts)
+                    self.TS.update(self.Gr, self.M1, self.M2)       # --> updating M1 and M2 values by adding tendencies (one RK stage)
+                    Ti.stop(t_ts)
+
+                # (3) implicit vertical diffusion of M1 and M2 (one batched tridiagonal solve per time step)
+                Ti.start(t_id)
+                self.ID.update(self.Gr, self.Ref, self.M1, self.M2, self.SGS, self.TS)
+                Ti.stop(t_id)
+                # (4) exponential integration of the stiff M2 relaxation terms (pressure, dissipation) over the time step
+                Ti.start(t_relax)
+                self.Turb.update_relaxation(self.Gr, self.M1, self.M2, self.TS)
+                Ti.stop(t_relax)
+
+                Ti.start(t_dt)
+                self.TS.adjust_timestep(self.Gr, self.M1, self.M2, self.SGS, self.Turb)
+                Ti.stop(t_dt)
+                Ti.start(t_io)
+                self.io()
+                Ti.stop(t_io)
+                Ti.end_step()
+        except SystemExit:
+            self.StatsIO.finish()
+            raise
+
+        # write the output times that are still buffered (and stop the writer thread)
+        self.StatsIO.finish()
+        self.VO.finish()
+        # timers: totals, call counts and per-step histograms to the stats file, summary table
+        Ti.write(self.StatsIO)
+        Ti.summary()
         return
 
 
@@ -161,68 +302,54 @@ class Simulation1d:
 
 
     def io(self):
-        print('calling io')
         cdef:
             double stats_dt = 0.0
-            double condstats_dt = 0.0
+            # double condstats_dt = 0.0
             double restart_dt = 0.0
             double vis_dt = 0.0
             double min_dt = 0.0
 
         if self.TS.t > 0 and self.TS.rk_step == self.TS.n_rk_steps - 1:
-            print('doing io: ' + str(self.TS.t) + ', ' + str(self.TS.rk_step))
             # Adjust time step for output if necessary
             stats_dt = self.StatsIO.last_output_time + self.StatsIO.frequency - self.TS.t
-            condstats_dt = self.CondStatsIO.last_output_time + self.CondStatsIO.frequency - self.TS.t
-            restart_dt = self.Restart.last_restart_time + self.Restart.frequency - self.TS.t
-            vis_dt = self.VO.last_vis_time + self.VO.frequency - self.TS.t
-
-
-            # dts = np.array([fields_dt, stats_dt, condstats_dt, restart_dt, vis_dt,
-            #                 self.TS.dt, self.TS.dt_max, self.VO.frequency, self.Restart.frequency,
-            #                 self.StatsIO.frequency, self.CondStatsIO.frequency, self.FieldsIO.frequency])
-            dts = np.array([stats_dt, condstats_dt, restart_dt, vis_dt,
-                            self.TS.dt, self.TS.dt_max, self.VO.frequency, self.Restart.frequency,
-                            self.StatsIO.frequency, self.CondStatsIO.frequency])
-
-
-
+            # condstats_dt = self.CondStatsIO.last_output_time + self.CondStatsIO.frequency - self.TS.t
+
+            dts = [stats_dt, self.TS.dt, self.TS.dt_max, self.StatsIO.frequency]
+            if self.VO.do_vis:
+                vis_dt = self.VO.last_vis_time + self.VO.frequency - self.TS.t
+                dts += [vis_dt, self.VO.frequency]
+            if self.Restart.do_restart:
+                restart_dt = self.Restart.last_restart_time + self.Restart.frequency - self.TS.t
+                dts += [restart_dt, self.Restart.frequency]
+            dts = np.array(dts)
             self.TS.dt = np.amin(dts[dts > 0.0])
+
             # If time to ouput stats do output
-            # self.Pa.root_print('StatsIO freq: ' + str(self.StatsIO.frequency) + ', ' + str(self.StatsIO.last_output_time) + ', ' + str(self.TS.t))
             if self.StatsIO.last_output_time + self.StatsIO.frequency == self.TS.t:
-            #if self.StatsIO.last_output_time + self.StatsIO.frequency == self.TS.t or self.StatsIO.last_output_time + self.StatsIO.frequency + 10.0 == self.TS.t:
-            #if (1==1):
-                self.Pa.root_print('Doing StatsIO')
+                Log.debug('Doing StatsIO')
+                if self.M1.val_nan() or self.M2.val_nan():
+                    print('NaNs found in M1 or M2 values at t = ' + str(self.TS.t) + '. Killing simulation now!')
+                    sys.exit()
                 self.StatsIO.last_output_time = self.TS.t
-                self.StatsIO.open_files(self.Pa)
-                self.StatsIO.write_simulation_time(self.TS.t, self.Pa)
-                self.Micro.stats_io(self.Gr, self.Ref, self.PV, self.DV, self.StatsIO, self.Pa) # do Micro.stats_io prior to DV.stats_io to get sedimentation velocity only in output
-                self.PV.stats_io(self.Gr, self.Ref, self.StatsIO, self.Pa)
-
-                self.DV.stats_io(self.Gr, self.StatsIO, self.Pa)
-                self.Fo.stats_io(self.Gr, self.Ref, self.PV, self.DV, self.StatsIO, self.Pa)
-                self.Th.stats_io(self.Gr, self.Ref, self.PV, self.DV, self.StatsIO, self.Pa)
-
-                self.Sur.stats_io(self.Gr, self.StatsIO, self.Pa)
-                self.SGS.stats_io(self.Gr,self.DV,self.PV,self.Ke,self.StatsIO,self.Pa)
-                self.SA.stats_io(self.Gr, self.PV, self.StatsIO, self.Pa)
-                self.MA.stats_io(self.Gr, self.PV, self.StatsIO, self.Pa)
-                self.SD.stats_io(self.Gr, self.Ref,self.PV, self.DV, self.StatsIO, self.Pa)
-                self.MD.stats_io(self.Gr, self.PV, self.DV, self.Ke, self.StatsIO, self.Pa)
-                self.Ke.stats_io(self.Gr,self.Ref,self.PV,self.StatsIO,self.Pa)
-                self.Tr.stats_io( self.Gr, self.StatsIO, self.Pa)
-                self.Ra.stats_io(self.Gr, self.DV, self.StatsIO, self.Pa)
-                self.Budg.stats_io(self.Sur, self.StatsIO, self.Pa)
-                self.Aux.stats_io(self.Gr, self.Ref, self.PV, self.DV, self.MA, self.MD, self.StatsIO, self.Pa)
-                self.StatsIO.close_files(self.Pa)
-                self.Pa.root_print('Finished Doing StatsIO')
+                self.StatsIO.open_files()
+                self.StatsIO.write_simulation_time(self.TS.t)
+                self.M1.stats_io(self.Gr, self.StatsIO)
+                self.M2.stats_io(self.Gr, self.StatsIO)
+                self.StatsIO.close_files()
+                Log.debug('Finished Doing StatsIO')
+
+            # If time to write a checkpoint do restart
+            if self.Restart.do_restart and self.Restart.last_restart_time + self.Restart.frequency == self.TS.t:
+                Log.info('Doing Restart IO')
+                self.StatsIO.drain()
+                self.Restart.last_restart_time = self.TS.t
+                self.Restart.restart_data = {}
+                self.TS.restart(self.Restart)
+                self.Ref.restart(self.Gr, self.Restart)
+                self.M1.restart(self.Gr, self.Restart)
+                self.M2.restart(self.Gr, self.Restart)
+                self.SGS.restart(self.Restart)
+                self.Restart.write()
+                self.Restart.free_memory()
 
         return
-
-
-
-
-
-
-
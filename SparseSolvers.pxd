@@ -0,0 +1,8 @@
+cdef class TDMA:
+    cdef:
+        double [:] scratch
+        Py_ssize_t n
+
+    cpdef initialize(self, Py_ssize_t n)
+    cdef void solve(self, double* x, double* a, double* b, double* c) noexcept nogil
+    cdef void solve_batched(self, Py_ssize_t nsys, double* x, double* a, double* b, double* c) noexcept nogil
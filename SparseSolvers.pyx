@@ -0,0 +1,49 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+import numpy as np
+cimport numpy as np
+
+'''
+Tridiagonal (Thomas) solver for systems of the form
+    a[i] x[i-1] + b[i] x[i] + c[i] x[i+1] = d[i],       i = 0, ..., n-1
+with a[0] and c[n-1] ignored. The right hand side d is passed in x and overwritten by the solution.
+solve_batched() solves nsys independent systems of equal size n, stored contiguously (system s at offset s*n).
+'''
+
+cdef class TDMA:
+    def __init__(self):
+        return
+
+    cpdef initialize(self, Py_ssize_t n):
+        self.n = n
+        self.scratch = np.zeros((n,),dtype=np.double,order='c')
+        return
+
+    cdef void solve(self, double* x, double* a, double* b, double* c) noexcept nogil:
+        cdef:
+            Py_ssize_t i
+            Py_ssize_t n = self.n
+            double m
+
+        self.scratch[0] = c[0]/b[0]
+        x[0] = x[0]/b[0]
+        for i in xrange(1,n):
+            m = 1.0/(b[i] - a[i] * self.scratch[i-1])
+            self.scratch[i] = c[i] * m
+            x[i] = (x[i] - a[i] * x[i-1]) * m
+        for i in xrange(n-2,-1,-1):
+            x[i] = x[i] - self.scratch[i] * x[i+1]
+        return
+
+    cdef void solve_batched(self, Py_ssize_t nsys, double* x, double* a, double* b, double* c) noexcept nogil:
+        cdef:
+            Py_ssize_t s, shift
+
+        for s in xrange(nsys):
+            shift = s * self.n
+            self.solve(&x[shift], &a[shift], &b[shift], &c[shift])
+        return
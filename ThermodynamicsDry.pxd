@@ -1,5 +1,6 @@
 cimport Grid
 cimport PrognosticVariables
+cimport ReferenceState
 cimport Thermodynamics
 
 
@@ -7,9 +8,10 @@ cdef class ThermodynamicsDry:
     # cpdef initialize(self,Grid.Grid Gr,PrognosticVariables.PrognosticVariables PV,
     #                  DiagnosticVariables.DiagnosticVariables DV, NetCDFIO_Stats NS)
     cpdef initialize(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+    cpdef branch(self)
     # cpdef update(self, Grid.Grid Gr, ReferenceState.ReferenceState RS,
     #              PrognosticVariables.PrognosticVariables PV, DiagnosticVariables.DiagnosticVariables DV)
-    cpdef update(self)
+    cpdef update(self, Grid.Grid Gr, ReferenceState.ReferenceState Ref, PrognosticVariables.MeanVariables M1)
     # cpdef stats_io(self, Grid.Grid Gr, ReferenceState.ReferenceState RS, PrognosticVariables.PrognosticVariables PV,
     #                DiagnosticVariables.DiagnosticVariables DV, NetCDFIO_Stats NS)
     cpdef stats_io(self)
\ No newline at end of file
@@ -9,6 +9,7 @@ import numpy as np
 
 from Grid cimport Grid
 cimport PrognosticVariables
+cimport ReferenceState
 # cimport Thermodynamics
 from thermodynamic_functions cimport thetas_c
 import cython
@@ -34,15 +35,19 @@ cdef class ThermodynamicsDry:
         M1.add_variable('th','K',"scalar")
         M2.add_variable('uth', '(m/s)^2', "velocity")
         M2.add_variable('vth', '(m/s)^2', "velocity")
-        M2.add_variable('wth', '(m/s)^2', "velocity")
+        M2.add_variable('wth', '(m/s)^2', "velocity", 'w')
 
         return
 
+    cpdef branch(self):
+        # no state
+        return ThermodynamicsDry.__new__(ThermodynamicsDry)
+
 
 
     # cpdef update(self, Grid Gr, ReferenceState.ReferenceState RS,
     #                  PrognosticVariables.PrognosticVariables PV, DiagnosticVariables.DiagnosticVariables DV):
-    cpdef update(self):
+    cpdef update(self, Grid Gr, ReferenceState.ReferenceState Ref, PrognosticVariables.MeanVariables M1):
         # eos update: compute T from eos_c(pd,s); compute alpha(pd,T)
         # buoyancy update: compute buoyancy_c(alpha0, alpha); compute wt (w-tendency)
         # bvf_dry: compute theta(p0,T); compute Brunt Vaisalla Frequency (bvf=g/theta*partialz theta)
@@ -1,9 +1,16 @@
 cimport Grid
 cimport PrognosticVariables
+cimport ReferenceState
 
 cdef class ThermodynamicsSA:
     cdef:
         bint do_qt_clipping
+        # saturation adjustment: temperature and liquid water of all columns (the temperature is also the
+        # first guess of the next update)
+        public double [:] T
+        public double [:] ql
+        bint warm_start
+        public Py_ssize_t eos_iterations
         # double (*L_fp)(double T, double Lambda) nogil
         # double (*Lambda_fp)(double T) nogil
         # ClausiusClapeyron CC
@@ -12,12 +19,13 @@ cdef class ThermodynamicsSA:
     # cpdef initialize(self,Grid.Grid Gr,PrognosticVariables.PrognosticVariables PV,
     #                  DiagnosticVariables.DiagnosticVariables DV, NetCDFIO_Stats NS, ParallelMPI.ParallelMPI Pa)
     cpdef initialize(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+    cpdef branch(self)
     # cpdef entropy(self, double p0, double T, double qt, double ql, double qi)
     # cpdef alpha(self, double p0, double T, double qt, double qv)
     # cpdef eos(self, double p0, double s, double qt)
     # cpdef update(self, Grid.Grid Gr, ReferenceState.ReferenceState RS,
     #           PrognosticVariables.PrognosticVariables PV, DiagnosticVariables.DiagnosticVariables DV)
-    cpdef update(self)
+    cpdef update(self, Grid.Grid Gr, ReferenceState.ReferenceState Ref, PrognosticVariables.MeanVariables M1)
     # cpdef get_pv_star(self, t)
     # cpdef get_lh(self,t)
     # cpdef write_fields(self, Grid.Grid Gr, ReferenceState.ReferenceState RS,
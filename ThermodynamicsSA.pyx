@@ -7,10 +7,12 @@
 cimport numpy as np
 import numpy as np
 
-# cimport Grid
-# cimport PrognosticVariables
+cimport Grid
+cimport PrognosticVariables
+cimport ReferenceState
 import cython
 from libc.math cimport fmax, fmin
+from thermodynamic_functions cimport eos_profile
 
 cdef extern from "entropies.h":
     # Specific entropy of dry air
@@ -43,6 +45,13 @@ cdef class ThermodynamicsSA:
         except:
             self.do_qt_clipping = True
 
+        # warm start of the saturation adjustment from the temperature of the previous update
+        try:
+            self.warm_start = namelist['thermodynamics']['warm_start']
+        except:
+            self.warm_start = True
+        self.eos_iterations = 0
+
         return
 
 
@@ -53,14 +62,46 @@ cdef class ThermodynamicsSA:
         M1.add_variable('th','K',"scalar")
         M1.add_variable('qt','g/kg',"scalar")
 
+        # T = 0: no first guess yet (cold start)
+        self.T = np.zeros(Gr.ncol*Gr.nzg, dtype=np.double, order='c')
+        self.ql = np.zeros(Gr.ncol*Gr.nzg, dtype=np.double, order='c')
         return
 
+    cpdef branch(self):
+        # same settings, with its own copy of T and ql (the first guess of the next update depends on the state)
+        cdef ThermodynamicsSA Th = ThermodynamicsSA.__new__(ThermodynamicsSA)
+        Th.do_qt_clipping = self.do_qt_clipping
+        Th.warm_start = self.warm_start
+        Th.eos_iterations = 0
+        Th.T = np.array(self.T)
+        Th.ql = np.array(self.ql)
+        return Th
+
 
 
     # cpdef update(self, Grid.Grid Gr, ReferenceState.ReferenceState RS,
     #                  PrognosticVariables.PrognosticVariables PV, DiagnosticVariables.DiagnosticVariables DV):
-    cpdef update(self):
-
+    cpdef update(self, Grid.Grid Gr, ReferenceState.ReferenceState Ref, PrognosticVariables.MeanVariables M1):
+        # saturation adjustment of all columns: T and ql from p0_half, qt and the entropy (stored as 'th')
+        cdef:
+            Py_ssize_t n, col_shift
+            Py_ssize_t gw = Gr.gw
+            Py_ssize_t nzg = Gr.nzg
+            Py_ssize_t th_shift = M1.shift.th
+            Py_ssize_t qt_shift = M1.shift.qt
+            Py_ssize_t iterations = 0
+            double [:] values = M1.values
+            double [:] p0_half = Ref.p0_half[gw:nzg-gw]
+            double [:] T = self.T
+            double [:] ql = self.ql
+
+        with nogil:
+            for n in xrange(Gr.ncol):
+                col_shift = M1.get_colshift(Gr, n)
+                iterations += eos_profile(p0_half, values[col_shift+qt_shift+gw:col_shift+qt_shift+nzg-gw],
+                                          values[col_shift+th_shift+gw:col_shift+th_shift+nzg-gw],
+                                          T[n*nzg+gw:(n+1)*nzg-gw], ql[n*nzg+gw:(n+1)*nzg-gw], self.warm_start)
+        self.eos_iterations = iterations
         return
 
 
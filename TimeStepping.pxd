@@ -1,33 +1,50 @@
+from libc.math cimport fmin
 cimport PrognosticVariables as PrognosticVariables
 # cimport DiagnosticVariables as DiagnosticVariables
 cimport Grid as Grid
-# cimport Restart
+cimport Restart
+from TurbulenceScheme cimport TurbulenceBase
 
 cdef class TimeStepping:
     cdef:
         public double dt
         public double t
-        # public double cfl_max
-        # public double cfl_limit
-        # public double dt_max
-        # public double dt_initial
+        public double cfl_max
+        public double cfl_limit
+        public double diffusive_max
+        public double diffusive_limit
+        public double relaxation_max
+        public double relaxation_limit
+        public bint implicit_diffusion
+        public double dt_max
+        public double dt_initial
         public double t_max
         public Py_ssize_t nstep
-        # double [:,:] value_copies
-        # double [:,:] tendency_copies
-        # public Py_ssize_t rk_step
-        # public Py_ssize_t n_rk_steps
-        # public Py_ssize_t ts_type
-        # void initialize(self,PrognosticVariables.PrognosticVariables PV)
+        double [:,:] value_copies_M1
+        double [:,:] value_copies_M2
+        public Py_ssize_t rk_step
+        public Py_ssize_t n_rk_steps
+        public Py_ssize_t ts_type
+        void initialize_first(self, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+        void initialize_second(self, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+        void initialize_third(self, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
 
 
-    # cpdef initialize(self, namelist, PrognosticVariables.PrognosticVariables PV)
-    cpdef initialize(self, namelist)
-    # cpdef update(self,Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV)
-    cpdef update(self)
+    cpdef initialize(self, namelist, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+    cpdef update(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+    cpdef update_second(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, double [:,:] value_copies)
+    cpdef update_third(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, double [:,:] value_copies)
 
-    # cpdef adjust_timestep(self,Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, DiagnosticVariables.DiagnosticVariables DV)
-    # cdef void compute_cfl_max(self,Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, DiagnosticVariables.DiagnosticVariables DV)
-    # cpdef restart(self, Restart.Restart Re)
+    cpdef adjust_timestep(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2, SGS, TurbulenceBase Turb)
+    cdef void compute_cfl_max(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1)
+    cdef void compute_diffusive_max(self, Grid.Grid Gr, SGS)
+    cdef void compute_relaxation_max(self, Grid.Grid Gr, PrognosticVariables.SecondOrderMomenta M2, TurbulenceBase Turb)
+    cpdef restart(self, Restart.Restart Re)
+    cpdef init_from_restart(self, Restart.Restart Re)
 
-    # cdef inline double cfl_time_step(self)
\ No newline at end of file
+    cdef inline double cfl_time_step(self):
+        return fmin(self.dt_max, self.cfl_limit/(self.cfl_max/self.dt))
+    cdef inline double diffusive_time_step(self):
+        return self.diffusive_limit/(self.diffusive_max/self.dt)
+    cdef inline double relaxation_time_step(self):
+        return self.relaxation_limit/(self.relaxation_max/self.dt)
@@ -7,22 +7,32 @@
 cimport PrognosticVariables as PrognosticVariables
 # cimport DiagnosticVariables as DiagnosticVariables
 cimport Grid as Grid
-# cimport Restart
+cimport Restart
+from TurbulenceScheme cimport TurbulenceBase
 
 import numpy as np
 cimport numpy as np
 import sys
 
 from libc.math cimport fmin, fmax, fabs
+cimport Logger
+import Logger
+
+cdef Logger.Logger Log = Logger.Log
 
 cdef class TimeStepping:
     def __init__(self):
 
         return
 
-    # cpdef initialize(self,namelist,PrognosticVariables.PrognosticVariables PV):
-    cpdef initialize(self,namelist):
+    cpdef initialize(self, namelist, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
         print('Timestepping initialize')
+        try:
+            self.ts_type = namelist['time_stepping']['ts_type']
+        except:
+            print('ts_type not given in namelist so taking default value ts_type = 3 (SSP-RK3)')
+            self.ts_type = 3
+
         try:
             self.dt = namelist['time_stepping']['dt_initial']
         except:
@@ -35,133 +45,241 @@ cdef class TimeStepping:
             print('t_max (time at end of simulation) not given in name list! Killing Simulation Now')
             sys.exit()
 
+        try:
+            self.dt_max = namelist['time_stepping']['dt_max']
+        except:
+            print('dt_max (maximum permissible time step) not given in namelist so taking default value dt_max = 10.0')
+            self.dt_max = 10.0
+
+        try:
+            self.cfl_limit = namelist['time_stepping']['cfl_limit']
+        except:
+            print('cfl_limit (maximum permissible cfl number) not given in namelist so taking default value cfl_limit = 0.7')
+            self.cfl_limit = 0.7
+
+        try:
+            self.diffusive_limit = namelist['time_stepping']['diffusive_limit']
+        except:
+            print('diffusive_limit (maximum permissible diffusive number) not given in namelist so taking default value diffusive_limit = 0.5')
+            self.diffusive_limit = 0.5
+
+        try:
+            self.relaxation_limit = namelist['time_stepping']['relaxation_limit']
+        except:
+            print('relaxation_limit (maximum permissible dt/tau for M2 relaxation) not given in namelist so taking default value relaxation_limit = 1.0')
+            self.relaxation_limit = 1.0
+
+        # with implicit vertical diffusion the diffusive number does not limit the time step
+        try:
+            self.implicit_diffusion = namelist['diffusion']['implicit']
+        except:
+            self.implicit_diffusion = True
+
         # set time
+        self.dt_initial = self.dt
         self.t = 0.0
         self.nstep = 0
+        self.cfl_max = 0.0
+        self.diffusive_max = 0.0
+        self.relaxation_max = 0.0
+
+        # Initialize the correct time stepping routine (allocates the storage for the stage copies once)
+        if self.ts_type == 1:
+            self.initialize_first(M1, M2)
+        elif self.ts_type == 2:
+            self.initialize_second(M1, M2)
+        elif self.ts_type == 3:
+            self.initialize_third(M1, M2)
+        else:
+            print('Invalid ts_type: ' + str(self.ts_type))
+            print('Killing simulation now!')
+            sys.exit()
+
+        return
+
+
+    cdef void initialize_first(self, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
+        # forward Euler: no stage copies needed
+        self.n_rk_steps = 1
+        self.rk_step = 0
+        self.value_copies_M1 = None
+        self.value_copies_M2 = None
+        return
+
+    cdef void initialize_second(self, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
+        self.n_rk_steps = 2
+        self.rk_step = 0
+        # Initialize storage
+        self.value_copies_M1 = np.zeros((1,M1.values.shape[0]),dtype=np.double,order='c')
+        self.value_copies_M2 = np.zeros((1,M2.values.shape[0]),dtype=np.double,order='c')
+        return
+
+    cdef void initialize_third(self, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
+        self.n_rk_steps = 3
+        self.rk_step = 0
+        # Initialize storage
+        self.value_copies_M1 = np.zeros((1,M1.values.shape[0]),dtype=np.double,order='c')
+        self.value_copies_M2 = np.zeros((1,M2.values.shape[0]),dtype=np.double,order='c')
+        return
 
-        #     #Initialize storage
-        # self.value_copies = np.zeros((1,PV.values.shape[0]),dtype=np.double,order='c')
-        # self.tendency_copies = None
-
-        # try:
-        #     self.dt_max = namelist['time_stepping']['dt_max']
-        # except:
-        #     Pa.root_print('dt_max (maximum permissible time step) not given in namelist so taking default value dt_max =10.0')
-        #     self.dt_max = 10.0
-        #
-        # try:
-        #     self.t = namelist['time_stepping']['t']
-        # except:
-        #     Pa.root_print('t (initial time) not given in namelist so taking default value t = 0')
-        #     self.t = 0.0
-        #
-        # try:
-        #     self.cfl_limit = namelist['time_stepping']['cfl_limit']
-        # except:
-        #     Pa.root_print('cfl_limit (maximum permissible cfl number) not given in namelist so taking default value cfl_max=0.7')
-        #     self.cfl_limit = 0.7
+
+
+    cpdef update(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
+        '''
+        Advance M1 and M2 by one Runge-Kutta stage (self.rk_step). The time is advanced in the last stage.
+        The tendencies of both containers are set to zero after each stage.
+        '''
+        if self.ts_type == 1:
+            PrognosticVariables.update_M1_M2(Gr, M1, M2, self.dt)
+        elif self.ts_type == 2:
+            self.update_second(Gr, M1, self.value_copies_M1)
+            self.update_second(Gr, M2, self.value_copies_M2)
+        elif self.ts_type == 3:
+            self.update_third(Gr, M1, self.value_copies_M1)
+            self.update_third(Gr, M2, self.value_copies_M2)
+
+        if self.rk_step == self.n_rk_steps - 1:
+            self.t += self.dt
+            self.nstep += 1
+            if Log.enabled(Logger.INFO):
+                Log.info('time: ' + str(self.t), 'time')
+        return
+
+
+    cpdef update_second(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, double [:,:] value_copies):
+        # SSP-RK2 (Heun)
+        cdef:
+            Py_ssize_t i
+            Py_ssize_t n = Gr.ncol * PV.nv * Gr.nzg
+            double dt = self.dt
+
+        with nogil:
+            if self.rk_step == 0:
+                for i in xrange(n):
+                    value_copies[0,i] = PV.values[i]
+                    PV.values[i] += PV.tendencies[i] * dt
+                    PV.tendencies[i] = 0.0
+            else:
+                for i in xrange(n):
+                    PV.values[i] = 0.5 * (value_copies[0,i] + PV.values[i] + PV.tendencies[i] * dt)
+                    PV.tendencies[i] = 0.0
+        return
+
+
+    cpdef update_third(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, double [:,:] value_copies):
+        # SSP-RK3 (Shu & Osher, 1988)
+        cdef:
+            Py_ssize_t i
+            Py_ssize_t n = Gr.ncol * PV.nv * Gr.nzg
+            double dt = self.dt
+
+        with nogil:
+            if self.rk_step == 0:
+                for i in xrange(n):
+                    value_copies[0,i] = PV.values[i]
+                    PV.values[i] += PV.tendencies[i] * dt
+                    PV.tendencies[i] = 0.0
+            elif self.rk_step == 1:
+                for i in xrange(n):
+                    PV.values[i] = 0.75 * value_copies[0,i] + 0.25 * (PV.values[i] + PV.tendencies[i] * dt)
+                    PV.tendencies[i] = 0.0
+            else:
+                for i in xrange(n):
+                    PV.values[i] = (1.0/3.0) * value_copies[0,i] + (2.0/3.0) * (PV.values[i] + PV.tendencies[i] * dt)
+                    PV.tendencies[i] = 0.0
+        return
+
+
+
+
+
+    cpdef adjust_timestep(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2, SGS, TurbulenceBase Turb):
+        '''
+        Choose the largest stable time step from (i) the vertical advective CFL number of the mean flow,
+        (ii) the diffusive number of the SGS viscosities/diffusivities and (iii) the relaxation time scale
+        of the second order momenta. The time step is limited by dt_max and clipped to t_max.
+        The diffusive number only limits the time step if the vertical diffusion is explicit; the relaxation rate is
+        given by the turbulence scheme (Turb.relaxation_rate_max, zero if the M2 relaxation is not explicit).
+        '''
+        if self.rk_step == self.n_rk_steps - 1:
+            self.compute_cfl_max(Gr, M1)
+            self.dt = self.cfl_time_step()
+            self.compute_relaxation_max(Gr, M2, Turb)
+            self.dt = fmin(self.dt, self.relaxation_time_step())
+            if not self.implicit_diffusion:
+                self.compute_diffusive_max(Gr, SGS)
+                self.dt = fmin(self.dt, self.diffusive_time_step())
+
+            if self.t + self.dt > self.t_max:
+                self.dt = self.t_max - self.t
+
+            if self.dt < 0.0:
+                print('dt = '+ str(self.dt)+ ' killing simulation!')
+                sys.exit()
 
         return
 
 
-    # cpdef update(self, Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV):
-    cpdef update(self):
-        self.t += self.dt
-        self.nstep += 1
-        print('time:', self.t)
-    #     cdef:
-    #         Py_ssize_t i
-    #
-    #     with nogil:
-    #         if self.rk_step == 0:
-    #             for i in xrange(Gr.dims.npg*PV.nv):
-    #                 self.value_copies[0,i] = PV.values[i]
-    #                 PV.values[i] += PV.tendencies[i]*self.dt
-    #                 PV.tendencies[i] = 0.0
-    #         else:
-    #             for i in xrange(Gr.dims.npg*PV.nv):
-    #                 PV.values[i] = 0.5 * (self.value_copies[0,i] + PV.values[i] + PV.tendencies[i] * self.dt)
-    #                 PV.tendencies[i] = 0.0
+    cdef void compute_cfl_max(self, Grid.Grid Gr, PrognosticVariables.MeanVariables M1):
+        cdef:
+            double cfl_max_local = -9999.0
+            double dzi = Gr.dzi
+            double dt = self.dt
+            Py_ssize_t w_shift = M1.shift.w
+            Py_ssize_t kmin = Gr.gw
+            Py_ssize_t kmax = Gr.nzg - Gr.gw
+            Py_ssize_t n, k, shift
 
+        with nogil:
+            for n in xrange(Gr.ncol):
+                shift = M1.get_colshift(Gr,n) + w_shift
+                for k in xrange(kmin,kmax):
+                    cfl_max_local = fmax(cfl_max_local, dt * fabs(M1.values[shift+k]) * dzi)
+
+        self.cfl_max = cfl_max_local + 1e-11
+
+        if self.cfl_max < 0.0:
+            print('CFL_MAX = '+ str(self.cfl_max)+ ' killing simulation!')
+            sys.exit()
         return
 
 
+    cdef void compute_diffusive_max(self, Grid.Grid Gr, SGS):
+        # diffusive number: dt * max(nu) / dz^2 (same bound for viscosity and diffusivity)
+        cdef:
+            double nu_max = 0.0
+            double dzi = Gr.dzi
+            double [:] coeff
+            Py_ssize_t i
 
+        for coeff in (SGS.viscosity_M1, SGS.diffusivity_M1, SGS.viscosity_M2, SGS.diffusivity_M2):
+            with nogil:
+                for i in xrange(coeff.shape[0]):
+                    nu_max = fmax(nu_max, fabs(coeff[i]))
 
+        self.diffusive_max = self.dt * nu_max * dzi * dzi + 1e-11
+        return
 
-    # cpdef adjust_timestep(self,Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV, DiagnosticVariables.DiagnosticVariables DV, ParallelMPI.ParallelMPI Pa):
-    #     #Compute the CFL number and diffusive stability criterion
-    #     if self.rk_step == self.n_rk_steps - 1:
-    #         self.compute_cfl_max(Gr, PV,DV, Pa)
-    #         self.dt = self.cfl_time_step()
-    #
-    #         #Diffusive limiting not yet implemented
-    #         if self.t + self.dt > self.t_max:
-    #             self.dt = self.t_max - self.t
-    #
-    #         if self.dt < 0.0:
-    #             Pa.root_print('dt = '+ str(self.dt)+ " killing simulation!")
-    #             Pa.kill()
-    #
-    #     return
-
-
-    #
-    # cdef void compute_cfl_max(self,Grid.Grid Gr, PrognosticVariables.PrognosticVariables PV,DiagnosticVariables.DiagnosticVariables DV):
-    #     Pa.root_print('Computing CFL Max')
-    #     cdef:
-    #         double cfl_max_local = -9999.0
-    #         double [3] dxi = Gr.dims.dxi
-    #         Py_ssize_t u_shift = PV.get_varshift(Gr,'u')
-    #         Py_ssize_t v_shift = PV.get_varshift(Gr,'v')
-    #         Py_ssize_t w_shift = PV.get_varshift(Gr,'w')
-    #         Py_ssize_t imin = Gr.dims.gw
-    #         Py_ssize_t jmin = Gr.dims.gw
-    #         Py_ssize_t kmin = Gr.dims.gw
-    #         Py_ssize_t imax = Gr.dims.nlg[0] - Gr.dims.gw
-    #         Py_ssize_t jmax = Gr.dims.nlg[1] - Gr.dims.gw
-    #         Py_ssize_t kmax = Gr.dims.nlg[2] - Gr.dims.gw
-    #         Py_ssize_t istride = Gr.dims.nlg[1] * Gr.dims.nlg[2]
-    #         Py_ssize_t jstride = Gr.dims.nlg[2]
-    #         Py_ssize_t i,j,k, ijk, ishift, jshift
-    #         double w
-    #         Py_ssize_t isedv
-    #
-    #     with nogil:
-    #         for i in xrange(imin,imax):
-    #             ishift = i * istride
-    #             for j in xrange(jmin,jmax):
-    #                 jshift = j * jstride
-    #                 for k in xrange(kmin,kmax):
-    #                     ijk = ishift + jshift + k
-    #                     w = fabs(PV.values[w_shift+ijk])
-    #                     for isedv in xrange(DV.nsedv):
-    #                         w = fmax(fabs( DV.values[DV.sedv_index[isedv]*Gr.dims.npg + ijk ] + PV.values[w_shift+ijk]), w)
-    #
-    #                     cfl_max_local = fmax(cfl_max_local, self.dt * (fabs(PV.values[u_shift + ijk])*dxi[0] + fabs(PV.values[v_shift+ijk])*dxi[1] + w*dxi[2]))
-    #                     # problem: second term is nan
-    #     Pa.root_print('cfl_max_local: '+ str(cfl_max_local))
-    #     Pa.root_print(str(self.dt * (fabs(PV.values[u_shift + ijk])*dxi[0] + fabs(PV.values[v_shift+ijk])*dxi[1] + w*dxi[2])))  # is a nan
-    #     # Pa.root_print('u: '+str(np.amax(PV.values[u_shift:v_shift])) + ', '+ str(np.amin(PV.values[u_shift:v_shift])))
-    #     # Pa.root_print('v: '+str(np.amax(PV.values[v_shift:w_shift])) + ', '+ str(np.amin(PV.values[v_shift:w_shift])))
-    #     # Pa.root_print('w: '+str(w))
-    #
-    #     mpi.MPI_Allreduce(&cfl_max_local,&self.cfl_max,1,
-    #                       mpi.MPI_DOUBLE,mpi.MPI_MAX,Pa.comm_world)
-    #
-    #     self.cfl_max += 1e-11
-    #
-    #     if self.cfl_max < 0.0:
-    #         Pa.root_print('CFL_MAX = '+ str(self.cfl_max)+ " killing simulation!")
-    #         Pa.kill()
-    #     return
-    #
-    # cdef inline double cfl_time_step(self):
-    #     return fmin(self.dt_max,self.cfl_limit/(self.cfl_max/self.dt))
-    #
-    # cpdef restart(self, Restart.Restart Re):
-    #     Re.restart_data['TS'] = {}
-    #     Re.restart_data['TS']['t'] = self.t
-    #     Re.restart_data['TS']['dt'] = self.dt
-    #
-    #     return
+
+    cdef void compute_relaxation_max(self, Grid.Grid Gr, PrognosticVariables.SecondOrderMomenta M2, TurbulenceBase Turb):
+        # relaxation (return-to-isotropy, dissipation) rate of the second order momenta, from the turbulence scheme
+        self.relaxation_max = self.dt * Turb.relaxation_rate_max(Gr, M2) + 1e-11
+        return
+
+
+    cpdef restart(self, Restart.Restart Re):
+        # written at the end of a full time step, so the RK value copies are not needed
+        Re.restart_data['TS'] = {}
+        Re.restart_data['TS']['t'] = self.t
+        Re.restart_data['TS']['dt'] = self.dt
+        Re.restart_data['TS']['nstep'] = self.nstep
+        Re.restart_data['TS']['ts_type'] = self.ts_type
+        return
+
+    cpdef init_from_restart(self, Restart.Restart Re):
+        self.t = Re.restart_data['TS']['t']
+        self.dt = Re.restart_data['TS']['dt']
+        self.nstep = Re.restart_data['TS']['nstep']
+        if Re.restart_data['TS']['ts_type'] != self.ts_type:
+            print('restart: changing ts_type from ' + str(Re.restart_data['TS']['ts_type']) + ' to ' + str(self.ts_type))
+        return
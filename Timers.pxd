@@ -0,0 +1,39 @@
+from posix.time cimport clock_gettime, timespec, CLOCK_MONOTONIC
+from NetCDFIO cimport NetCDFIO_Stats
+
+cdef inline double monotonic_time() nogil:
+    cdef timespec ts
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+    return ts.tv_sec + 1.0e-9 * ts.tv_nsec
+
+cdef class Timers:
+    cdef:
+        public bint enabled
+        list names
+        Py_ssize_t ncomp
+        Py_ssize_t nsteps
+        double [:] t_start
+        double [:] totals
+        long [:] counts
+        double [:] step_totals
+        long [:,:] histogram
+        double log_min
+        double bins_per_decade
+        Py_ssize_t nbins
+
+    cpdef Py_ssize_t add(self, str name)
+    cdef void end_step(self)
+    cpdef write(self, NetCDFIO_Stats NS)
+    cpdef summary(self)
+    cpdef dict results(self)
+
+    cdef inline void start(self, Py_ssize_t i):
+        if self.enabled:
+            self.t_start[i] = monotonic_time()
+    cdef inline void stop(self, Py_ssize_t i):
+        cdef double dt
+        if self.enabled:
+            dt = monotonic_time() - self.t_start[i]
+            self.totals[i] += dt
+            self.counts[i] += 1
+            self.step_totals[i] += dt
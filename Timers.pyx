@@ -0,0 +1,110 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+import numpy as np
+cimport numpy as np
+from libc.math cimport log10, floor
+
+from NetCDFIO cimport NetCDFIO_Stats
+
+'''
+Wall clock timers for the components of the Simulation1d time loop (namelist['timers']['enabled'], default False)
+
+    add(name):          registers a component, returns its index
+    start(i), stop(i):  (inline, in Timers.pxd) accumulate the time between the two calls (CLOCK_MONOTONIC) for
+                        component i; no-ops if the timers are disabled
+    end_step():         adds the time each component used in this time step to its histogram
+                        (log-spaced bins, 1e-7s to 1e2s, 4 bins per decade)
+    write(NS):          totals, call counts and histograms to the 'timers' group of the stats file
+    summary():          table of all components
+    results():          totals, call counts and histograms as a dict (benchmark.py)
+'''
+
+cdef class Timers:
+    def __init__(self, namelist):
+        try:
+            self.enabled = namelist['timers']['enabled']
+        except:
+            self.enabled = False
+
+        self.names = []
+        self.ncomp = 0
+        self.nsteps = 0
+        self.log_min = -7.0
+        self.bins_per_decade = 4.0
+        self.nbins = 36
+        self.t_start = np.zeros(0, dtype=np.double)
+        self.totals = np.zeros(0, dtype=np.double)
+        self.counts = np.zeros(0, dtype=np.int_)
+        self.step_totals = np.zeros(0, dtype=np.double)
+        self.histogram = np.zeros((0, self.nbins), dtype=np.int_)
+        return
+
+    cpdef Py_ssize_t add(self, str name):
+        if name in self.names:
+            return self.names.index(name)
+        self.names.append(name)
+        self.ncomp += 1
+        self.t_start = np.append(self.t_start, 0.0)
+        self.totals = np.append(self.totals, 0.0)
+        self.counts = np.append(self.counts, 0).astype(np.int_)
+        self.step_totals = np.append(self.step_totals, 0.0)
+        self.histogram = np.append(self.histogram, np.zeros((1, self.nbins), dtype=np.int_), axis=0)
+        return self.ncomp - 1
+
+    cdef void end_step(self):
+        cdef:
+            Py_ssize_t i, bin
+            double dt
+
+        if not self.enabled:
+            return
+        with nogil:
+            for i in xrange(self.ncomp):
+                dt = self.step_totals[i]
+                if dt > 0.0:
+                    bin = <Py_ssize_t> floor((log10(dt) - self.log_min) * self.bins_per_decade)
+                    if bin < 0:
+                        bin = 0
+                    elif bin >= self.nbins:
+                        bin = self.nbins - 1
+                    self.histogram[i, bin] += 1
+                self.step_totals[i] = 0.0
+        self.nsteps += 1
+        return
+
+    cpdef write(self, NetCDFIO_Stats NS):
+        if not self.enabled or self.ncomp == 0:
+            return
+        bin_edges = 10.0**(self.log_min + np.arange(self.nbins + 1) / self.bins_per_decade)
+        NS.write_timers(self.names, np.array(self.totals), np.array(self.counts), np.array(self.histogram), bin_edges)
+        return
+
+    cpdef summary(self):
+        if not self.enabled or self.ncomp == 0:
+            return
+        cdef:
+            Py_ssize_t i
+            double total = np.sum(self.totals)
+
+        print('Timers: ' + str(self.nsteps) + ' time steps')
+        print('{:<20s}{:>10s}{:>12s}{:>8s}{:>14s}{:>14s}'.format('component', 'calls', 'total [s]', '%', 'per call [us]', 'per step [us]'))
+        for i in np.argsort(-np.array(self.totals)):
+            print('{:<20s}{:>10d}{:>12.4f}{:>8.1f}{:>14.2f}{:>14.2f}'.format(
+                self.names[i], self.counts[i], self.totals[i], 100.0 * self.totals[i] / max(total, 1e-20),
+                1.0e6 * self.totals[i] / max(self.counts[i], 1), 1.0e6 * self.totals[i] / max(self.nsteps, 1)))
+        print('{:<20s}{:>10s}{:>12.4f}'.format('sum', '', total))
+        return
+
+    cpdef dict results(self):
+        cdef:
+            Py_ssize_t i
+            dict res = {}
+
+        for i in xrange(self.ncomp):
+            res[self.names[i]] = {'total': self.totals[i], 'count': self.counts[i],
+                                  'histogram': np.array(self.histogram[i, :]).tolist()}
+        return res
@@ -1,28 +1,101 @@
 from Grid cimport Grid
 cimport PrognosticVariables
+cimport TimeStepping
 # cimport DiagnosticVariables
 # cimport Kinematics
 # cimport Surface
 # from NetCDFIO cimport NetCDFIO_Stats
 
+# pointers to the workspace profiles (layout (Gr.ncol, Gr.nzg)) for the nogil closure kernels
+cdef struct workspace_struct:
+    double *tke
+    double *tke_w
+    double *tau_inv
+    double *tau_inv_w
+    double *Sxz
+    double *Syz
+    double *Szz
+    double *a_uu
+    double *a_vv
+    double *a_ww
+    double *a_wu
+    double *a_wv
+
+# constants of the pressure and dissipation closures (see closure_column)
+cdef struct closure_constants:
+    double c_slow
+    double c_rapid
+    double c_slow_scalar
+    double c_dissipation
+
+cdef class TurbulenceWorkspace:
+    cdef:
+        workspace_struct ws
+        double l_inf
+        double tke_min
+        public double [:] tke
+        public double [:] length
+        public double [:] tau_inv
+        public double [:] tke_w
+        public double [:] tau_inv_w
+        public double [:] Sxz
+        public double [:] Syz
+        public double [:] Szz
+        public double [:] a_uu
+        public double [:] a_vv
+        public double [:] a_ww
+        public double [:] a_wu
+        public double [:] a_wv
+    cpdef initialize(self, Grid Gr)
+    cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+
 cdef class TurbulenceBase:
-    cpdef initialize(self)
+    cpdef initialize(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
     cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
     cpdef update_M1(self,Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+    cpdef update_relaxation(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2,
+                            TimeStepping.TimeStepping TS)
+    cpdef double relaxation_rate_max(self, Grid Gr, PrognosticVariables.SecondOrderMomenta M2)
     cpdef stats_io(self)
 
 cdef class TurbulenceNone(TurbulenceBase):
-    cpdef initialize(self)
+    cpdef initialize(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
     # cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
     # cpdef stats_io(self)
 
 
 cdef class Turbulence2ndOrder(TurbulenceBase):
-    # cdef:
-    #     double const_viscosity
-    cpdef initialize(self)
+    cdef:
+        # double const_viscosity
+        str pressure_scheme
+        str dissipation_scheme
+        public closure_constants constants
+        # relaxation = 'exponential': constants without the relaxation terms (used in closure_terms)
+        str relaxation
+        closure_constants explicit_constants
+        public TurbulenceWorkspace workspace
+    cpdef initialize(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
     cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
     cpdef advect_M2_local(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
-    cpdef pressure_correlations_Mironov(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
-    cpdef pressure_correlations_Andre(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+    cpdef closure_terms(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2)
+    cpdef update_relaxation(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2,
+                            TimeStepping.TimeStepping TS)
+    cpdef double relaxation_rate_max(self, Grid Gr, PrognosticVariables.SecondOrderMomenta M2)
     cpdef stats_io(self)
+
+
+# mean-flow advection and production of all second order momenta of one column (Turbulence2ndOrder.advect_M2_local)
+cdef void advect_M2_column(double *m1, double *m2, double *m2_tend,
+                           PrognosticVariables.VariableShifts *s1, PrognosticVariables.VariableShifts *s2,
+                           PrognosticVariables.VariableStagger *g2, Py_ssize_t *var_shifts, Py_ssize_t *var_stagger,
+                           Py_ssize_t nv, Py_ssize_t kmin, Py_ssize_t kmax, double dzi) noexcept nogil
+
+# pressure correlations and dissipation of all second order momenta of one column (Turbulence2ndOrder.closure_terms)
+cdef void closure_column(double *m2, double *m2_tend, PrognosticVariables.VariableShifts *s2,
+                         PrognosticVariables.VariableStagger *g2, workspace_struct *ws, Py_ssize_t ws_shift,
+                         closure_constants *c, Py_ssize_t kmin, Py_ssize_t kmax) noexcept nogil
+
+# exponential integration of the relaxation terms of one column over dt (Turbulence2ndOrder.update_relaxation)
+cdef void relax_column(double *m2, PrognosticVariables.VariableShifts *s2, PrognosticVariables.VariableStagger *g2,
+                       workspace_struct *ws, Py_ssize_t ws_shift, closure_constants *c,
+                       Py_ssize_t kmin, Py_ssize_t kmax, double dt) noexcept nogil
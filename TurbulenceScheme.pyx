@@ -10,10 +10,18 @@ cimport PrognosticVariables
 # cimport Kinematics
 # cimport Surface
 # from NetCDFIO cimport NetCDFIO_Stats
-from libc.math cimport exp, sqrt
+from libc.math cimport exp, sqrt, fmax
+cimport TimeStepping
 cimport numpy as np
 import numpy as np
+import sys
 import cython
+cimport Logger
+import Logger
+
+cdef Logger.Logger Log = Logger.Log
+
+include 'parameters.pxi'
 
 '''
     (0) update M1.tendencies by adding M2.values
@@ -23,8 +31,54 @@ import cython
         (ii) Diffusion: SD.update_M2, MD.update_M2
         (iii) Pressure: ?
         (iv) Third and higher order terms (first guess set to zero)
+
+    Turbulence2ndOrder.workspace (TurbulenceWorkspace): profiles shared by the closure terms, allocated once in
+    initialize and computed once per RK stage at the beginning of update
+
+    Closure terms (pressure-strain, pressure-scalar, dissipation): closures are registered by name with their constants
+    (pressure_closures, dissipation_closures, register_closure) and selected with namelist['turbulence']['pressure'] and
+    namelist['turbulence']['dissipation']; single constants can be overwritten with
+    namelist['turbulence']['closure_constants'] (e.g. for calibration). All terms are computed by one kernel
+    (closure_column) in one pass over each column, with the constants in a closure_constants struct.
+
+    Relaxation (namelist['turbulence']['relaxation']):
+        'explicit': all closure terms are part of the M2 tendencies (the time step is limited by the relaxation rate,
+                    TimeStepping.compute_relaxation_max)
+        'exponential' (default): the stiff linear part (slow pressure terms and dissipation) is integrated exactly
+                    for frozen sqrt(E)/l once per time step after the RK stages (Turbulence2ndOrder.update_relaxation,
+                    relax_column); the tendencies only contain the explicit part (rapid terms) and M2 does not limit dt
 '''
 
+# registered closures: constants (fields of closure_constants) by name
+pressure_closures = {
+    'none': {'c_slow': 0.0, 'c_rapid': 0.0, 'c_slow_scalar': 0.0},
+    # Mironov (2009), based on André (1978), Launder (1975) and Rotta (1951): to be registered once its constants are
+    # calibrated
+    # André (1978): c4, c5, c6 (rapid term for the scalar fluxes (c7) not implemented)
+    'Andre': {'c_slow': 4.5, 'c_rapid': 0.0, 'c_slow_scalar': 4.85},
+}
+dissipation_closures = {
+    'none': {'c_dissipation': 0.0},
+    # isotropic dissipation eps = c_dissipation * E^(3/2) / l (Kolmogorov 1942; c_dissipation as in Deardorff 1980)
+    'Kolmogorov': {'c_dissipation': 0.7},
+}
+
+def register_closure(str kind, str name, dict constants):
+    '''add a pressure ('pressure') or dissipation ('dissipation') closure to the registry'''
+    if kind == 'pressure':
+        closures = pressure_closures
+    elif kind == 'dissipation':
+        closures = dissipation_closures
+    else:
+        print('register_closure: kind has to be pressure or dissipation, not ' + kind)
+        sys.exit()
+    for key in constants:
+        if key not in closures['none']:
+            print('register_closure: ' + key + ' is not a constant of a ' + kind + ' closure')
+            sys.exit()
+    closures[name] = dict(closures['none'], **constants)
+    return
+
 
 
 def TurbulenceFactory(namelist):
@@ -42,7 +96,7 @@ def TurbulenceFactory(namelist):
 cdef class TurbulenceNone(TurbulenceBase):
     def __init__(self,namelist):
         return
-    cpdef initialize(self):
+    cpdef initialize(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
         return
     # cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
     #     print('Turb None: update')
@@ -55,42 +109,174 @@ cdef class TurbulenceBase:
     def __init__(self,namelist):
         return
 
-    cpdef initialize(self):
+    cpdef initialize(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
         return
 
     cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
-        print('Turbulence Base: update')
+        Log.debug('Turbulence Base: update')
+        return
+
+    cpdef update_relaxation(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2,
+                            TimeStepping.TimeStepping TS):
         return
 
+    cpdef double relaxation_rate_max(self, Grid Gr, PrognosticVariables.SecondOrderMomenta M2):
+        # largest rate of the explicitly integrated M2 relaxation terms (limits the time step, TS.adjust_timestep)
+        return 0.0
+
     cpdef update_M1(self,Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
-        print('Turb: update M1')
+        Log.debug('Turb: update M1')
         cdef:
-            Py_ssize_t k
+            Py_ssize_t k, n, m1_shift, m2_shift
+
+            Py_ssize_t u_varshift = M1.shift.u
+            Py_ssize_t v_varshift = M1.shift.v
+            Py_ssize_t w_varshift = M1.shift.w
+            Py_ssize_t th_varshift = M1.shift.th
+            Py_ssize_t qt_varshift = M1.shift.qt
+
+            Py_ssize_t wu_shift = M2.shift.wu
+            Py_ssize_t wv_shift = M2.shift.wv
+            Py_ssize_t ww_shift = M2.shift.ww
+            Py_ssize_t wth_shift = M2.shift.wth
+            Py_ssize_t wqt_shift = M2.shift.wqt
+
+        if u_varshift < 0 or v_varshift < 0 or w_varshift < 0 or wu_shift < 0 or wv_shift < 0 or ww_shift < 0:
+            print('Turbulence update_M1: u, v, w, wu, wv and ww have to be registered. Killing simulation now!')
+            sys.exit()
+
+        for n in xrange(Gr.ncol):
+            m1_shift = M1.get_colshift(Gr, n)
+            m2_shift = M2.get_colshift(Gr, n)
+            for k in xrange(Gr.nzg):
+                M1.tendencies[m1_shift + u_varshift + k] -=  M2.values[m2_shift + wu_shift + k]
+                M1.tendencies[m1_shift + v_varshift + k] -=  M2.values[m2_shift + wv_shift+ k]
+                M1.tendencies[m1_shift + w_varshift+ k] -=  M2.values[m2_shift + ww_shift + k]
+        # th flux only if both are registered (ThermodynamicsSA has no wth)
+        if th_varshift >= 0 and wth_shift >= 0:
+            for n in xrange(Gr.ncol):
+                m1_shift = M1.get_colshift(Gr, n)
+                m2_shift = M2.get_colshift(Gr, n)
+                for k in xrange(Gr.nzg):
+                    M1.tendencies[m1_shift + th_varshift + k] -=  M2.values[m2_shift + wth_shift + k]
+        # qt flux only if both are registered (moist thermodynamics)
+        if qt_varshift >= 0 and wqt_shift >= 0:
+            for n in xrange(Gr.ncol):
+                m1_shift = M1.get_colshift(Gr, n)
+                m2_shift = M2.get_colshift(Gr, n)
+                for k in xrange(Gr.nzg):
+                    M1.tendencies[m1_shift + qt_varshift + k] -=  M2.values[m2_shift + wqt_shift + k]
+        return
 
-            Py_ssize_t u_varshift = M1.get_varshift(Gr, 'u')
-            Py_ssize_t v_varshift = M1.get_varshift(Gr, 'v')
-            Py_ssize_t w_varshift = M1.get_varshift(Gr, 'w')
-            Py_ssize_t th_varshift = M1.get_varshift(Gr, 'th')
+    cpdef stats_io(self):
+        return
 
-            Py_ssize_t wu_shift = M2.get_varshift(Gr, 'wu')
-            Py_ssize_t wv_shift = M2.get_varshift(Gr, 'wv')
-            Py_ssize_t ww_shift = M2.get_varshift(Gr, 'ww')
-            Py_ssize_t wth_shift = M2.get_varshift(Gr, 'wth')
 
-        if 'qt' in M1.name_index:
-            qt_varshift = M1.get_varshift(Gr, 'qt')
-            wqt_shift = M2.get_varshift(Gr, 'wqt')
-            for k in xrange(Gr.nzg):
-                M1.tendencies[u_varshift + k] +=  M2.values[wu_shift + k]
 
-        for k in xrange(Gr.nzg):
-            M1.tendencies[u_varshift + k] -=  M2.values[wu_shift + k]
-            M1.tendencies[v_varshift + k] -=  M2.values[wv_shift+ k]
-            M1.tendencies[w_varshift+ k] -=  M2.values[ww_shift + k]
-            M1.tendencies[th_varshift + k] -=  M2.values[wth_shift + k]
+cdef class TurbulenceWorkspace:
+    '''
+    Per-stage profiles of all columns (flat buffers with layout (Gr.ncol, Gr.nzg); interior levels only):
+        tke = 0.5*(<u'u'> + <v'v'> + <w'w'>)                                        phi-grid; tke_w: w-grid
+        length: 1/l = 1/(vkb*z) + 1/l_inf (Blackadar 1962)                          phi-grid
+        tau_inv = sqrt(tke)/l (inverse turbulent time scale)                        phi-grid; tau_inv_w: w-grid
+        Sxz = 1/2 du/dz, Syz = 1/2 dv/dz (mean shear)                               w-grid
+        Szz = dw/dz                                                                 phi-grid
+        a_ij = <u_i'u_j'>/tke - 2/3 delta_ij (anisotropy; 0 for tke <= tke_min)     a_uu, a_vv, a_ww: phi-grid; a_wu, a_wv: w-grid
+    the mean vorticity follows from the shear in the column: Wxz = Sxz, Wyz = Syz, Wzx = -Sxz, Wzy = -Syz, Wzz = 0
+    '''
+    def __init__(self, namelist):
+        try:
+            self.l_inf = namelist['turbulence']['length_scale']
+        except:
+            self.l_inf = 100.0
+        self.tke_min = 1.0e-10
         return
 
-    cpdef stats_io(self):
+    cpdef initialize(self, Grid Gr):
+        cdef Py_ssize_t n = Gr.ncol * Gr.nzg
+        self.tke = np.zeros(n, dtype=np.double, order='c')
+        self.length = np.zeros(n, dtype=np.double, order='c')
+        self.tau_inv = np.zeros(n, dtype=np.double, order='c')
+        self.tke_w = np.zeros(n, dtype=np.double, order='c')
+        self.tau_inv_w = np.zeros(n, dtype=np.double, order='c')
+        self.Sxz = np.zeros(n, dtype=np.double, order='c')
+        self.Syz = np.zeros(n, dtype=np.double, order='c')
+        self.Szz = np.zeros(n, dtype=np.double, order='c')
+        self.a_uu = np.zeros(n, dtype=np.double, order='c')
+        self.a_vv = np.zeros(n, dtype=np.double, order='c')
+        self.a_ww = np.zeros(n, dtype=np.double, order='c')
+        self.a_wu = np.zeros(n, dtype=np.double, order='c')
+        self.a_wv = np.zeros(n, dtype=np.double, order='c')
+
+        self.ws.tke = &self.tke[0]
+        self.ws.tke_w = &self.tke_w[0]
+        self.ws.tau_inv = &self.tau_inv[0]
+        self.ws.tau_inv_w = &self.tau_inv_w[0]
+        self.ws.Sxz = &self.Sxz[0]
+        self.ws.Syz = &self.Syz[0]
+        self.ws.Szz = &self.Szz[0]
+        self.ws.a_uu = &self.a_uu[0]
+        self.ws.a_vv = &self.a_vv[0]
+        self.ws.a_ww = &self.a_ww[0]
+        self.ws.a_wu = &self.a_wu[0]
+        self.ws.a_wv = &self.a_wv[0]
+        return
+
+    cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
+        cdef:
+            Py_ssize_t n, k, m1_shift, m2_shift, i
+            Py_ssize_t u_shift = M1.shift.u
+            Py_ssize_t v_shift = M1.shift.v
+            Py_ssize_t w_shift = M1.shift.w
+            Py_ssize_t uu_shift = M2.shift.uu
+            Py_ssize_t vv_shift = M2.shift.vv
+            Py_ssize_t ww_shift = M2.shift.ww
+            Py_ssize_t wu_shift = M2.shift.wu
+            Py_ssize_t wv_shift = M2.shift.wv
+            double dzi = Gr.dzi
+            double l_inf_i = 1.0 / self.l_inf
+            double tke_min = self.tke_min
+            double e, e_up, e_w, l_w
+
+        if uu_shift < 0 or vv_shift < 0 or ww_shift < 0 or wu_shift < 0 or wv_shift < 0:
+            print('TurbulenceWorkspace: uu, vv, ww, wu and wv have to be registered. Killing simulation now!')
+            sys.exit()
+
+        with nogil:
+            for n in xrange(Gr.ncol):
+                m1_shift = M1.get_colshift(Gr, n)
+                m2_shift = M2.get_colshift(Gr, n)
+                for k in xrange(Gr.gw, Gr.nzg-Gr.gw):
+                    i = n * Gr.nzg + k
+                    e = 0.5 * (M2.values[m2_shift+uu_shift+k] + M2.values[m2_shift+vv_shift+k] + M2.values[m2_shift+ww_shift+k])
+                    e_up = 0.5 * (M2.values[m2_shift+uu_shift+k+1] + M2.values[m2_shift+vv_shift+k+1] + M2.values[m2_shift+ww_shift+k+1])
+                    e_w = 0.5 * (e + e_up)
+
+                    self.tke[i] = e
+                    self.length[i] = 1.0 / (1.0 / (vkb * Gr.z_half[k]) + l_inf_i)
+                    self.tau_inv[i] = sqrt(fmax(e, 0.0)) / self.length[i]
+                    l_w = 1.0 / (1.0 / (vkb * Gr.z[k]) + l_inf_i)
+                    self.tke_w[i] = e_w
+                    self.tau_inv_w[i] = sqrt(fmax(e_w, 0.0)) / l_w
+
+                    self.Sxz[i] = 0.5 * (M1.values[m1_shift+u_shift+k+1] - M1.values[m1_shift+u_shift+k]) * dzi
+                    self.Syz[i] = 0.5 * (M1.values[m1_shift+v_shift+k+1] - M1.values[m1_shift+v_shift+k]) * dzi
+                    self.Szz[i] = (M1.values[m1_shift+w_shift+k] - M1.values[m1_shift+w_shift+k-1]) * dzi
+
+                    if e > tke_min:
+                        self.a_uu[i] = M2.values[m2_shift+uu_shift+k] / e - 2.0/3.0
+                        self.a_vv[i] = M2.values[m2_shift+vv_shift+k] / e - 2.0/3.0
+                        self.a_ww[i] = M2.values[m2_shift+ww_shift+k] / e - 2.0/3.0
+                    else:
+                        self.a_uu[i] = 0.0
+                        self.a_vv[i] = 0.0
+                        self.a_ww[i] = 0.0
+                    if e_w > tke_min:
+                        self.a_wu[i] = M2.values[m2_shift+wu_shift+k] / e_w
+                        self.a_wv[i] = M2.values[m2_shift+wv_shift+k] / e_w
+                    else:
+                        self.a_wu[i] = 0.0
+                        self.a_wv[i] = 0.0
         return
 
 
@@ -102,287 +288,182 @@ cdef class Turbulence2ndOrder(TurbulenceBase):
     # (4) Third and higher order terms (first guess set to zero)
     def __init__(self,namelist):
         print('initializing Turbulence 2nd')
+        try:
+            self.pressure_scheme = namelist['turbulence']['pressure']
+        except:
+            self.pressure_scheme = 'none'
+        try:
+            self.dissipation_scheme = namelist['turbulence']['dissipation']
+        except:
+            self.dissipation_scheme = 'none'
+        if self.pressure_scheme not in pressure_closures:
+            print('Not a valid pressure closure: ' + self.pressure_scheme + ' (' + ', '.join(sorted(pressure_closures)) + '). Killing simulation now!')
+            sys.exit()
+        if self.dissipation_scheme not in dissipation_closures:
+            print('Not a valid dissipation closure: ' + self.dissipation_scheme + ' (' + ', '.join(sorted(dissipation_closures)) + '). Killing simulation now!')
+            sys.exit()
+
+        constants = dict(pressure_closures[self.pressure_scheme])
+        constants.update(dissipation_closures[self.dissipation_scheme])
+        try:
+            overrides = namelist['turbulence']['closure_constants']
+        except:
+            overrides = {}
+        for key in overrides:
+            if key not in constants:
+                print('Not a valid closure constant: ' + key + ' (' + ', '.join(sorted(constants)) + '). Killing simulation now!')
+                sys.exit()
+            constants[key] = overrides[key]
+        self.constants = constants
+        print('Turbulence closure: pressure ' + self.pressure_scheme + ', dissipation ' + self.dissipation_scheme + ', ' + str(constants))
+
+        try:
+            self.relaxation = namelist['turbulence']['relaxation']
+        except:
+            self.relaxation = 'exponential'
+        if self.relaxation == 'explicit':
+            self.explicit_constants = constants
+        elif self.relaxation == 'exponential':
+            # the relaxation terms are integrated in update_relaxation
+            self.explicit_constants = dict(constants, c_slow=0.0, c_slow_scalar=0.0, c_dissipation=0.0)
+        else:
+            print('Not a valid relaxation: ' + self.relaxation + ' (explicit or exponential). Killing simulation now!')
+            sys.exit()
+
+        self.workspace = TurbulenceWorkspace(namelist)
         return
 
     # cpdef initialize(self, Grid Gr, PrognosticVariables.PrognosticVariables PV, NetCDFIO_Stats NS):
-    cpdef initialize(self):
-
+    cpdef initialize(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
+        # the kernels (advect_M2_column, closure_column, relax_column) index these variables without checks
+        if M1.shift.u < 0 or M1.shift.v < 0 or M1.shift.w < 0:
+            print('Turbulence 2nd order: u, v and w have to be registered in M1. Killing simulation now!')
+            sys.exit()
+        if M2.shift.uu < 0 or M2.shift.vv < 0 or M2.shift.ww < 0 or M2.shift.wu < 0 or M2.shift.wv < 0:
+            print('Turbulence 2nd order: uu, vv, ww, wu and wv have to be registered in M2. Killing simulation now!')
+            sys.exit()
+        # the workspace (tke, anisotropy, shear) is computed for variances on the phi-grid and wu, wv on the w-grid
+        if M1.stagger.w != 1 or M2.stagger.uu != 0 or M2.stagger.vv != 0 or M2.stagger.ww != 0 \
+                or M2.stagger.wu != 1 or M2.stagger.wv != 1:
+            print('Turbulence 2nd order: w, wu and wv have to be on the w-grid, uu, vv and ww on the phi-grid. '
+                  'Killing simulation now!')
+            sys.exit()
+        self.workspace.initialize(Gr)
         return
 
 
     cpdef update(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
-        print('Turbulence 2nd order: update')
+        Log.debug('Turbulence 2nd order: update')
+        # (0) TKE, length scale, shear and anisotropy of the current stage (used by all closure terms)
         # (1) Advection: MA.update_M2, SA.update_M2
         # (2) Diffusion: SD.update_M2, MD.update_M2
-        # (3) Pressure: ?
+        # (3) Pressure and dissipation: closure_terms
         # (4) Third and higher order terms (first guess set to zero)
+        self.workspace.update(Gr, M1, M2)
         self.advect_M2_local(Gr, M1, M2)
-        self.pressure_correlations_Mironov(Gr, M1, M2)
-        self.pressure_correlations_Andre(Gr, M1, M2)
+        self.closure_terms(Gr, M1, M2)
 
         return
 
 
 
     cpdef advect_M2_local(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
-        print('Turb update: advect M2 local')
+        Log.debug('Turb update: advect M2 local')
         # implemented for staggered grid
         # w: on w-grid
         # u,v,{s,qt}: on phi-grid
         # —> dz ws, dz wqt on phi-grid      —> ws, wqt on w-grid   -> compare to scalar advection for gradients
         # —> dz wu, dz wv on phi-grid       —> wu, wv on w-grid    -> compare to scalar advection for gradients
         # —> dz ww on w-grid                —> ww on phi-grid      -> compare to momentum advection for gradients
-
         cdef:
-            Py_ssize_t u_varshift = M1.get_varshift(Gr, 'u')
-            Py_ssize_t v_varshift = M1.get_varshift(Gr, 'v')
-            Py_ssize_t w_varshift = M1.get_varshift(Gr, 'w')
-            Py_ssize_t th_varshift = M1.get_varshift(Gr, 'th')
-
-            Py_ssize_t wu_shift = M2.get_varshift(Gr, 'wu')
-            Py_ssize_t wv_shift = M2.get_varshift(Gr, 'wv')
-            Py_ssize_t ww_shift = M2.get_varshift(Gr, 'ww')
-            Py_ssize_t wth_shift = M2.get_varshift(Gr, 'wth')
-
-            double [:] u = M1.values[u_varshift:u_varshift+Gr.nzg]
-            double [:] v = M1.values[v_varshift:v_varshift+Gr.nzg]
-            double [:] w = M1.values[w_varshift:w_varshift+Gr.nzg]
-            double [:] s = M1.values[th_varshift:th_varshift+Gr.nzg]
-
-            double dzi = Gr.dzi
-            Py_ssize_t k, var_shift
-
-        print('M2: name index', M2.name_index)
-
-        # (i) advection by mean vertical velocity
-        for name in M2.name_index:
-            if name != 'ww':
-            # w and M2.value both on w-grid --> compare to scalar advection for gradients
-                for k in xrange(Gr.nzg):
-                    var_shift = M2.get_varshift(Gr, name)
-                    M2.tendencies[var_shift + k] -= 0.5*(w[k]+w[k+1])*(M2.values[var_shift+k]-M2.values[var_shift+k-1])*dzi
-            else:
-            # w on w-grid, M2.value on phi-grid --> compare to momentum advection for gradients
-                for k in xrange(Gr.nzg):
-                    var_shift = M2.get_varshift(Gr, name)
-                    M2.tendencies[var_shift + k] -= w[k]*(M2.values[var_shift+k]-M2.values[var_shift+k-1])*dzi
+            Py_ssize_t n, m1_shift, m2_shift
 
-        # (ii) advection by M2
-        # w: on w-grid
-        # u,v,{s,qt}: on phi-grid
-        # —> dz ws, dz wqt on phi-grid      —> ws, wqt on w-grid   -> compare to scalar advection for gradients
-        # —> dz wu, dz wv on phi-grid       —> wu, wv on w-grid    -> compare to scalar advection for gradients
-        # —> dz ww on w-grid                —> ww on phi-grid      -> compare to momentum advection for gradients
-
-        # wu on w-grid --> interpolate ww; u_mean ok;  wu ok; interpolate w_mean
-        # wv on w-grid --> interpolate ww; v_mean ok; wv ok; interpolate w_mean
-        # ww on phi-grid --> ww ok; w ok
-        # ws on w-grid --> interpolate ww; s_mean ok; ws ok; interpolate w_mean
+        if M1.shift.w < 0 or M2.nv == 0:
+            return
+        if Log.enabled(Logger.DEBUG):
+            Log.debug('M2: name index ' + str(M2.name_index))
 
-        for k in xrange(Gr.nzg):
-            M2.tendencies[wu_shift+k] -= 0.5*(M2.values[ww_shift+k]+M2.values[ww_shift+k+1])*(u[k]-u[k-1])*dzi \
-                                         - M2.values[wu_shift+k]*( 0.5*(w[k]+w[k+1]) - 0.5*(w[k-1]+w[k]) )*dzi
-            M2.tendencies[wv_shift+k] -= 0.5*(M2.values[ww_shift+k]+M2.values[ww_shift+k+1])*(v[k]-v[k-1])*dzi \
-                                         - M2.values[wv_shift+k]*( 0.5*(w[k]+w[k+1]) - 0.5*(w[k-1]+w[k]) )*dzi
-            M2.tendencies[ww_shift+k] -= M2.values[ww_shift+k]*(w[k]-w[k-1])*dzi
-            M2.tendencies[wth_shift+k] -= 0.5*(M2.values[ww_shift+k]+M2.values[ww_shift+k+1])*(s[k]-s[k-1])*dzi \
-                                         - M2.values[wth_shift+k]*( 0.5*(w[k]+w[k+1]) - 0.5*(w[k-1]+w[k]) )*dzi
+        with nogil:
+            for n in xrange(Gr.ncol):
+                m1_shift = M1.get_colshift(Gr, n)
+                m2_shift = M2.get_colshift(Gr, n)
+                advect_M2_column(&M1.values[m1_shift], &M2.values[m2_shift], &M2.tendencies[m2_shift],
+                                 &M1.shift, &M2.shift, &M2.stagger, &M2.var_shifts[0], &M2.var_stagger[0], M2.nv,
+                                 Gr.gw, Gr.nzg-Gr.gw, Gr.dzi)
 
         # (iii) buoyancy terms
         # --> how to compute buoyancy b'???
         # wu --> g*
         return
 
-    cpdef pressure_correlations_Mironov(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
-        '''following Mironov (2009), based on André (1978), Launder (1975) and Rotta (1951)'''
-        cdef:
-            Py_ssize_t uu_shift = M2.get_varshift(Gr, 'uu')
-            Py_ssize_t vv_shift = M2.get_varshift(Gr, 'vv')
-            Py_ssize_t wu_shift = M2.get_varshift(Gr, 'wu')
-            Py_ssize_t wv_shift = M2.get_varshift(Gr, 'wv')
-            Py_ssize_t ww_shift = M2.get_varshift(Gr, 'ww')
-            Py_ssize_t pu_shift = M2.get_varshift(Gr, 'pu')
-            Py_ssize_t pv_shift = M2.get_varshift(Gr, 'pv')
-            Py_ssize_t pw_shift = M2.get_varshift(Gr, 'pw')
-            Py_ssize_t uth_shift = M2.get_varshift(Gr, 'uth')
-            Py_ssize_t vth_shift = M2.get_varshift(Gr, 'vth')
-            Py_ssize_t wth_shift = M2.get_varshift(Gr, 'wth')
-
-            Py_ssize_t u_shift = M1.get_varshift(Gr, 'u')
-            Py_ssize_t v_shift = M1.get_varshift(Gr, 'v')
-            Py_ssize_t w_shift = M1.get_varshift(Gr, 'w')
-
-            Py_ssize_t k, shift
-            double dzi2 = 0.5*Gr.dzi
-
-            double [:] tke = np.zeros((Gr.nzg),dtype=np.double,order='c')
-            # double [:] sxz = np.zeros((Gr.nzg),dtype=np.double,order='c')
-            # double [:] syz = np.zeros((Gr.nzg),dtype=np.double,order='c')
-            # double [:] szz = np.zeros((Gr.nzg),dtype=np.double,order='c')
-            # double [:] wxz = np.zeros((Gr.nzg),dtype=np.double,order='c')
-            # double [:] wyz = np.zeros((Gr.nzg),dtype=np.double,order='c')
-            # double [:] wzz = np.zeros((Gr.nzg),dtype=np.double,order='c')
-
-            double Sxz, Syz, Szz, Wxz, Wzx, Wyz, Wzy, Wzz
-
-            double Ctu = 0.0
-            double Cs1u = 0.0
-            double Cs2u = 0.0
-            double Cbu = 0.0
-            double Ccu = 0.0
-            double Cttheta = 0.0
-            double Cbtheta = 0.0
-
-
-
-        # M2.name_index:    {'pv': 6, 'pw': 7, 'pu': 5, 'uu': 0, 'vth': 9, 'uth': 8, 'ww': 4, 'wv': 3, 'wu': 2, 'vv': 1, 'wth': 10}
-        # M2.name_index.keys():     gives only names (=keys)
-        # M2.name_index['uu']:      gives the index of variable with name (or key) 'uu'
-        # M2.index_name[0]:         gives name (or key) at position 0
-
-        for k in xrange(Gr.nzg):
-            # Kinetic Energy ---> Diagnostic Variable (needed elsewhere?!?!)
-            tke[k] = np.sqrt(M2.values[uu_shift+k] + M2.values[vv_shift+k] + M2.values[ww_shift+k])
-        # for k in xrange(1,Gr.nzg-1):
-        #     # Mean Shear ---> Diagnostic Variable (needed elsewhere?!?!)
-        #     sxz[k] = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-        #     syz[k] = 0.5*( (M1.values[v_shift+k+1]-M1.values[v_shift+k-1])*dzi2 )
-        #     szz[k] = (M1.values[w_shift+k+1]-M1.values[w_shift+k-1])*dzi2
-        #     wxz[k] = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-        #     wyz[k] = 0.5*( (M1.values[v_shift+k+1]-M1.values[v_shift+k-1])*dzi2 )
-        #     wzz[k] = (M1.values[w_shift+k+1]-M1.values[w_shift+k-1])*dzi2
-
-        print(M2.name_index.keys())
-        print(M2.name_index)
-        print(M2.name_index['uu'])
-        print(M2.index_name[0])
-        # for var in M2.name_index.keys():        #go through all var-names
-        #     index = M2.name_index[var]          # get index of var
-        #     shift = M2.get_varshift(Gr, var)
-        #     for k in xrange(1,Gr.nzg-1):
-        #         # departure-from-isotropy tensor
-        #         if var in ['uu', 'vv', 'ww']:
-        #             a = 2*M2.values[shift+k]/tke[k] - 2.0/3.0
-        #         else:
-        #             a = 2*M2.values[shift+k]/tke[k]
-        #
-        #         # Mean Shear ---> Diagnostic Variable (needed elsewhere?!?!)
-        #         Sxz = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-        #         Syz = 0.5*( (M1.values[v_shift+k+1]-M1.values[v_shift+k-1])*dzi2 )
-        #         Szz = (M1.values[w_shift+k+1]-M1.values[w_shift+k-1])*dzi2
-        #         Wzx = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-        #         Wxz = -Wzx
-        #         Wzy = 0.5*( (M1.values[v_shift+k+1]-M1.values[v_shift+k-1])*dzi2 )
-        #         Wyz = -Wzy
-        #         Wzz = (M1.values[w_shift+k+1]-M1.values[w_shift+k-1])*dzi2
-
-
-        var = 'uu'
-        index = M2.name_index[var]          # get index of var
-        shift = M2.get_varshift(Gr, var)
-        for k in xrange(1,Gr.nzg-1):
-            # departure-from-isotropy tensor
-            a = 2*M2.values[shift+k]/tke[k] - 2.0/3.0
-            # Mean Shear ---> Diagnostic Variable (needed elsewhere?!?!)
-            Sxz = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-            Wzx = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-            Wxz = -Wzx
-
-            tend = Ctu
-
-
-
-            # departure-from-isotropy tensor
-            # (a) velocities
-            # i = 0
-            # i_shift = i*nzg
-            # a =
-
-
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-
-
+    cpdef closure_terms(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
         '''
+        Pressure correlations and dissipation of the selected closures (uses the workspace of the current stage)
+
         Anelastic 2nd order equation: pressure terms (Rotta '51; Andre '78; Golaz '02a)
         \partialt \mean{u_i u_j} = \dots + A + B
         A = \frac{1}{\rhon}\mean{p(\partialj u_i + \partiali u_j)}
         B = - \sum_{k=1}^3\partialk \mean{(\delta_{jk}u_i + \delta_{ik}u_j)\frac{p}{\rhon} }
-        \partialt \mean{u_i u_j} = \dots + \frac{1}{\rhon}\mean{p(\partialj u_i + \partiali u_j)} - \sum_{k=1}^3\partialk \mean{(\delta_{jk}u_i + \delta_{ik}u_j)\frac{p}{\rhon} }
 
         TERM A:
-        constant rho:
-        \frac{1}{\rho}\mean{p(\partialj u_i + \partiali u_j)} - \sum_{k=1}^3\mean{(\delta_{jk}u_i + \delta_{ik}u_j)\frac{p}{\rho} }
         Anelastic: \rhon(z)
         \frac{1}{\rhon}\mean{p\left(\partialj u_i + \partiali u_j \right)} = -k_p \frac{\sqrt{E}}{L}\left(\mean{u_iu_j}-\frac23\delta_{ij}e\right)
 
         TERM B: ????
          \partialk \mean{(\delta_{jk}u_i + \delta_{ik}u_j)\frac{p}{\rhon}} = ???
         '''
+        cdef:
+            Py_ssize_t n
 
+        with nogil:
+            for n in xrange(Gr.ncol):
+                closure_column(&M2.values[M2.get_colshift(Gr, n)], &M2.tendencies[M2.get_colshift(Gr, n)], &M2.shift,
+                               &M2.stagger, &self.workspace.ws, n * Gr.nzg, &self.explicit_constants,
+                               Gr.gw, Gr.nzg-Gr.gw)
         return
 
 
-    cpdef pressure_correlations_Andre(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2):
-        '''following Mironov (2009), based on André (1978), Launder (1975) and Rotta (1951)'''
+    cpdef update_relaxation(self, Grid Gr, PrognosticVariables.MeanVariables M1, PrognosticVariables.SecondOrderMomenta M2,
+                            TimeStepping.TimeStepping TS):
+        '''
+        Exponential integration of the relaxation terms over the full time step TS.dt (called after the RK stages,
+        only with relaxation = 'exponential'); sqrt(E)/l is frozen at the state after the RK stages
+        '''
         cdef:
-            Py_ssize_t uu_shift = M2.get_varshift(Gr, 'uu')
-            Py_ssize_t vv_shift = M2.get_varshift(Gr, 'vv')
-            Py_ssize_t wu_shift = M2.get_varshift(Gr, 'wu')
-            Py_ssize_t wv_shift = M2.get_varshift(Gr, 'wv')
-            Py_ssize_t ww_shift = M2.get_varshift(Gr, 'ww')
-            Py_ssize_t pu_shift = M2.get_varshift(Gr, 'pu')
-            Py_ssize_t pv_shift = M2.get_varshift(Gr, 'pv')
-            Py_ssize_t pw_shift = M2.get_varshift(Gr, 'pw')
-            Py_ssize_t uth_shift = M2.get_varshift(Gr, 'uth')
-            Py_ssize_t vth_shift = M2.get_varshift(Gr, 'vth')
-            Py_ssize_t wth_shift = M2.get_varshift(Gr, 'wth')
-
-            Py_ssize_t u_shift = M1.get_varshift(Gr, 'u')
-            Py_ssize_t v_shift = M1.get_varshift(Gr, 'v')
-            Py_ssize_t w_shift = M1.get_varshift(Gr, 'w')
-
-            Py_ssize_t k, shift
-            double dzi2 = 0.5*Gr.dzi
-
-            double [:] tke = np.zeros((Gr.nzg),dtype=np.double,order='c')
-
-            double c4 = 4.5
-            double c5 = 0.0
-            double c6 = 4.85
-            double c7 = 1.0-0.125*c6
-
-        for k in xrange(Gr.nzg):
-            # Kinetic Energy ---> Diagnostic Variable (needed elsewhere?!?!)
-            tke[k] = np.sqrt(M2.values[uu_shift+k] + M2.values[vv_shift+k] + M2.values[ww_shift+k])
-            puu[k] =
-
-        var = 'uu'
-        index = M2.name_index[var]          # get index of var
-        shift = M2.get_varshift(Gr, var)
-        for k in xrange(1,Gr.nzg-1):
-            # departure-from-isotropy tensor
-            a = 2*M2.values[shift+k]/tke[k] - 2.0/3.0
-            # Mean Shear ---> Diagnostic Variable (needed elsewhere?!?!)
-            Sxz = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-            Wzx = 0.5*( (M1.values[u_shift+k+1]-M1.values[u_shift+k-1])*dzi2 )
-            Wxz = -Wzx
-
-            tend = 0.0
-
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-            M2.tendencies[wu_shift+k] += 0
-
+            Py_ssize_t n
+            double dt = TS.dt
+
+        if self.relaxation != 'exponential':
+            return
+        self.workspace.update(Gr, M1, M2)
+        with nogil:
+            for n in xrange(Gr.ncol):
+                relax_column(&M2.values[M2.get_colshift(Gr, n)], &M2.shift, &M2.stagger, &self.workspace.ws,
+                             n * Gr.nzg, &self.constants, Gr.gw, Gr.nzg-Gr.gw, dt)
         return
 
+    cpdef double relaxation_rate_max(self, Grid Gr, PrognosticVariables.SecondOrderMomenta M2):
+        '''
+        Largest relaxation (return-to-isotropy, dissipation) rate c / tau with 1/tau = sqrt(E)/l and the largest closure
+        constant c; zero with relaxation = 'exponential', where the relaxation terms do not limit the time step.
+        sqrt(E)/l of the workspace is from the last update (the previous time step).
+        '''
+        cdef:
+            double rate_max = 0.0
+            double c_max = fmax(fmax(self.constants.c_slow, self.constants.c_slow_scalar), self.constants.c_dissipation)
+            double [:] tau_inv = self.workspace.tau_inv
+            double [:] tau_inv_w = self.workspace.tau_inv_w
+            Py_ssize_t n, k, col_shift
+
+        if self.relaxation == 'exponential':
+            return 0.0
+        with nogil:
+            for n in xrange(Gr.ncol):
+                col_shift = n * Gr.nzg
+                for k in xrange(Gr.gw, Gr.nzg-Gr.gw):
+                    rate_max = fmax(rate_max, c_max * fmax(tau_inv[col_shift+k], tau_inv_w[col_shift+k]))
+        return rate_max
+
 
 
     # cpdef stats_io(self, Grid Gr,  DiagnosticVariables.DiagnosticVariables DV,
@@ -391,3 +472,180 @@ cdef class Turbulence2ndOrder(TurbulenceBase):
 
         return
 
+
+cdef inline double staggered(Py_ssize_t stagger, double value_phi, double value_w) noexcept nogil:
+    # value at the level of a variable with the given staggering (0 phi-grid, 1 w-grid)
+    if stagger == 1:
+        return value_w
+    return value_phi
+
+
+cdef void advect_M2_column(double *m1, double *m2, double *m2_tend,
+                           PrognosticVariables.VariableShifts *s1, PrognosticVariables.VariableShifts *s2,
+                           PrognosticVariables.VariableStagger *g2, Py_ssize_t *var_shifts, Py_ssize_t *var_stagger,
+                           Py_ssize_t nv, Py_ssize_t kmin, Py_ssize_t kmax, double dzi) noexcept nogil:
+    '''
+    Advection of all second order momenta of one column by the mean flow and production by the mean gradients,
+    in one pass over the interior levels kmin <= k < kmax (the stencils reach k-1 and k+1).
+    m1, m2, m2_tend point to the first level of the column; variables that are not registered (shift -1) are skipped.
+    Every term is evaluated at the level of the variable (var_stagger / g2: 0 phi-grid, 1 w-grid); w is on the w-grid,
+    the means u, v, th, qt on the phi-grid:
+        (i) advection by the mean vertical velocity (w interpolated to the phi-grid)
+        (ii) production of the fluxes w'phi' (phi = u, v, th, qt) by the mean gradients and of ww by dw/dz
+    '''
+    cdef:
+        Py_ssize_t i, k, p, var_shift
+        Py_ssize_t ww_shift = s2.ww
+        Py_ssize_t nflux = 0
+        Py_ssize_t flux_shift[4]
+        Py_ssize_t flux_stagger[4]
+        Py_ssize_t mean_shift[4]
+        Py_ssize_t flux_shifts[4]
+        Py_ssize_t flux_staggers[4]
+        Py_ssize_t mean_shifts[4]
+        double *w = &m1[s1.w]
+        double w_phi, dw_phi, dw_w, ww_phi, ww_w
+
+    flux_shifts[0] = s2.wu
+    flux_shifts[1] = s2.wv
+    flux_shifts[2] = s2.wth
+    flux_shifts[3] = s2.wqt
+    flux_staggers[0] = g2.wu
+    flux_staggers[1] = g2.wv
+    flux_staggers[2] = g2.wth
+    flux_staggers[3] = g2.wqt
+    mean_shifts[0] = s1.u
+    mean_shifts[1] = s1.v
+    mean_shifts[2] = s1.th
+    mean_shifts[3] = s1.qt
+    if ww_shift >= 0:
+        for p in xrange(4):
+            if flux_shifts[p] >= 0 and mean_shifts[p] >= 0:
+                flux_shift[nflux] = flux_shifts[p]
+                flux_stagger[nflux] = flux_staggers[p]
+                mean_shift[nflux] = mean_shifts[p]
+                nflux += 1
+
+    for k in xrange(kmin, kmax):
+        w_phi = 0.5 * (w[k-1] + w[k])
+        dw_phi = (w[k] - w[k-1]) * dzi
+        dw_w = 0.5 * (w[k+1] - w[k-1]) * dzi
+        # (i) advection by mean vertical velocity
+        for i in xrange(nv):
+            var_shift = var_shifts[i]
+            if var_stagger[i] == 1:
+                m2_tend[var_shift+k] -= w[k] * (m2[var_shift+k] - m2[var_shift+k-1]) * dzi
+            else:
+                m2_tend[var_shift+k] -= w_phi * (m2[var_shift+k] - m2[var_shift+k-1]) * dzi
+
+        # (ii) advection by M2
+        if ww_shift >= 0:
+            if g2.ww == 1:
+                ww_phi = 0.5 * (m2[ww_shift+k-1] + m2[ww_shift+k])
+                ww_w = m2[ww_shift+k]
+            else:
+                ww_phi = m2[ww_shift+k]
+                ww_w = 0.5 * (m2[ww_shift+k] + m2[ww_shift+k+1])
+            for p in xrange(nflux):
+                if flux_stagger[p] == 1:
+                    m2_tend[flux_shift[p]+k] -= ww_w * (m1[mean_shift[p]+k+1] - m1[mean_shift[p]+k]) * dzi \
+                                                - m2[flux_shift[p]+k] * dw_w
+                else:
+                    m2_tend[flux_shift[p]+k] -= ww_phi * 0.5 * (m1[mean_shift[p]+k+1] - m1[mean_shift[p]+k-1]) * dzi \
+                                                - m2[flux_shift[p]+k] * dw_phi
+            if g2.ww == 1:
+                m2_tend[ww_shift+k] -= m2[ww_shift+k] * dw_w
+            else:
+                m2_tend[ww_shift+k] -= m2[ww_shift+k] * dw_phi
+    return
+
+
+cdef void closure_column(double *m2, double *m2_tend, PrognosticVariables.VariableShifts *s2,
+                         PrognosticVariables.VariableStagger *g2, workspace_struct *ws, Py_ssize_t ws_shift,
+                         closure_constants *c, Py_ssize_t kmin, Py_ssize_t kmax) noexcept nogil:
+    '''
+    Closure terms of all second order momenta of one column in one pass over kmin <= k < kmax:
+        pressure-strain, slow (return to isotropy, Rotta 1951):     - c_slow * sqrt(E)/l * E * a_ij
+        pressure-strain, rapid (mean shear):                        + c_rapid * E * S_ij
+        pressure-scalar, slow:                                      - c_slow_scalar * sqrt(E)/l * <u_i'th'>
+        dissipation (isotropic):                                    - 2/3 delta_ij * c_dissipation * E^(3/2)/l
+    m2, m2_tend point to the first level of the column, ws_shift is the offset of the column in the workspace;
+    uu, vv, ww on the phi-grid, wu, wv on the w-grid (checked in Turbulence2ndOrder.initialize), the scalar fluxes with
+    sqrt(E)/l at their level (g2) and skipped if they are not registered (shift -1)
+    '''
+    cdef:
+        Py_ssize_t k, i
+        Py_ssize_t uu_shift = s2.uu
+        Py_ssize_t vv_shift = s2.vv
+        Py_ssize_t ww_shift = s2.ww
+        Py_ssize_t wu_shift = s2.wu
+        Py_ssize_t wv_shift = s2.wv
+        Py_ssize_t uth_shift = s2.uth
+        Py_ssize_t vth_shift = s2.vth
+        Py_ssize_t wth_shift = s2.wth
+        double e, e_w, tau_inv, tau_inv_w, slow, slow_w, diss
+
+    for k in xrange(kmin, kmax):
+        i = ws_shift + k
+        e = ws.tke[i]
+        e_w = ws.tke_w[i]
+        tau_inv = ws.tau_inv[i]
+        tau_inv_w = ws.tau_inv_w[i]
+        slow = c.c_slow * tau_inv * e
+        slow_w = c.c_slow * tau_inv_w * e_w
+        diss = 2.0/3.0 * c.c_dissipation * tau_inv * e
+
+        m2_tend[uu_shift+k] += - slow * ws.a_uu[i] - diss
+        m2_tend[vv_shift+k] += - slow * ws.a_vv[i] - diss
+        m2_tend[ww_shift+k] += - slow * ws.a_ww[i] + c.c_rapid * e * ws.Szz[i] - diss
+        m2_tend[wu_shift+k] += - slow_w * ws.a_wu[i] + c.c_rapid * e_w * ws.Sxz[i]
+        m2_tend[wv_shift+k] += - slow_w * ws.a_wv[i] + c.c_rapid * e_w * ws.Syz[i]
+        if uth_shift >= 0:
+            m2_tend[uth_shift+k] += - c.c_slow_scalar * staggered(g2.uth, tau_inv, tau_inv_w) * m2[uth_shift+k]
+        if vth_shift >= 0:
+            m2_tend[vth_shift+k] += - c.c_slow_scalar * staggered(g2.vth, tau_inv, tau_inv_w) * m2[vth_shift+k]
+        if wth_shift >= 0:
+            m2_tend[wth_shift+k] += - c.c_slow_scalar * staggered(g2.wth, tau_inv, tau_inv_w) * m2[wth_shift+k]
+    return
+
+
+cdef void relax_column(double *m2, PrognosticVariables.VariableShifts *s2, PrognosticVariables.VariableStagger *g2,
+                       workspace_struct *ws, Py_ssize_t ws_shift, closure_constants *c,
+                       Py_ssize_t kmin, Py_ssize_t kmax, double dt) noexcept nogil:
+    '''
+    Exact solution over dt of the linear relaxation terms of closure_column for frozen sqrt(E)/l (unconditionally stable):
+        the deviatoric part of the variances decays with c_slow*sqrt(E)/l and E with c_dissipation*sqrt(E)/l
+            uu(t+dt) = (uu - 2/3 E) * exp(-c_slow*sqrt(E)/l*dt) + 2/3 E * exp(-c_dissipation*sqrt(E)/l*dt)
+        the fluxes decay with c_slow*sqrt(E)/l (wu, wv) and c_slow_scalar*sqrt(E)/l (uth, vth, wth)
+    '''
+    cdef:
+        Py_ssize_t k, i
+        Py_ssize_t uu_shift = s2.uu
+        Py_ssize_t vv_shift = s2.vv
+        Py_ssize_t ww_shift = s2.ww
+        Py_ssize_t wu_shift = s2.wu
+        Py_ssize_t wv_shift = s2.wv
+        Py_ssize_t uth_shift = s2.uth
+        Py_ssize_t vth_shift = s2.vth
+        Py_ssize_t wth_shift = s2.wth
+        double e, iso, iso_new, decay, decay_w
+
+    for k in xrange(kmin, kmax):
+        i = ws_shift + k
+        e = 0.5 * (m2[uu_shift+k] + m2[vv_shift+k] + m2[ww_shift+k])
+        iso = 2.0/3.0 * e
+        iso_new = iso * exp(-c.c_dissipation * ws.tau_inv[i] * dt)
+        decay = exp(-c.c_slow * ws.tau_inv[i] * dt)
+        decay_w = exp(-c.c_slow * ws.tau_inv_w[i] * dt)
+        m2[uu_shift+k] = (m2[uu_shift+k] - iso) * decay + iso_new
+        m2[vv_shift+k] = (m2[vv_shift+k] - iso) * decay + iso_new
+        m2[ww_shift+k] = (m2[ww_shift+k] - iso) * decay + iso_new
+        m2[wu_shift+k] *= decay_w
+        m2[wv_shift+k] *= decay_w
+        if uth_shift >= 0:
+            m2[uth_shift+k] *= exp(-c.c_slow_scalar * staggered(g2.uth, ws.tau_inv[i], ws.tau_inv_w[i]) * dt)
+        if vth_shift >= 0:
+            m2[vth_shift+k] *= exp(-c.c_slow_scalar * staggered(g2.vth, ws.tau_inv[i], ws.tau_inv_w[i]) * dt)
+        if wth_shift >= 0:
+            m2[wth_shift+k] *= exp(-c.c_slow_scalar * staggered(g2.wth, ws.tau_inv[i], ws.tau_inv_w[i]) * dt)
+    return
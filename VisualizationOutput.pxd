@@ -0,0 +1,20 @@
+from Grid cimport Grid
+from TimeStepping cimport TimeStepping
+from PrognosticVariables cimport MeanVariables
+
+cdef class VisualizationOutput:
+    cdef:
+        str vis_path
+        str uuid
+        public double last_vis_time
+        public double frequency
+        public bint do_vis
+        Py_ssize_t queue_size
+        object queue
+        object worker
+        bint synchronous
+
+    cpdef initialize(self)
+    cpdef update(self, Grid Gr, TimeStepping TS, MeanVariables M1)
+    cpdef VisualizationOutput branch(self, Py_ssize_t member)
+    cpdef finish(self)
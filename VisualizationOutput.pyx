@@ -0,0 +1,144 @@
+#!python
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: initializedcheck=False
+#cython: cdivision=True
+
+import os
+import multiprocessing
+import numpy as np
+cimport numpy as np
+import cython
+
+from Grid cimport Grid
+from TimeStepping cimport TimeStepping
+from PrognosticVariables cimport MeanVariables
+cimport Logger
+import Logger
+
+cdef Logger.Logger Log = Logger.Log
+
+'''
+Profiles and tendencies of the mean variables as png files in Output.<simname>.<uuid>/Visualization:
+    - every visualization.frequency seconds (the time step is adjusted in Simulation1d.io to hit the output times)
+    - update copies the profiles of all columns; rendering is done by a separate worker process,
+      which is the only place where matplotlib is imported (Agg backend)
+    - if the worker is still busy with queue_size snapshots, the snapshot is skipped
+    - in a daemonic process (e.g. a sweep.py member in a multiprocessing.Pool) no worker can be started: the snapshots
+      are rendered synchronously
+'''
+
+plot_vars = ['th', 'w', 'v', 'u']
+
+
+def plot_snapshot(snapshot, vis_path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    for field, label in (('values', 'profiles'), ('tendencies', 'tendencies')):
+        plt.figure(1,figsize=(15,7))
+        for i, var in enumerate(plot_vars):
+            plt.subplot(1,len(plot_vars),i+1)
+            # one line per column
+            plt.plot(snapshot[field][var].T, snapshot['z'])
+            if field == 'values':
+                plt.title(var)
+            else:
+                plt.title(var + ' tend')
+        plt.savefig(os.path.join(vis_path, label + '_' + str(snapshot['t']) + '.png'))
+        plt.close()
+    return
+
+
+def plot_worker(queue, vis_path):
+    while True:
+        snapshot = queue.get()
+        if snapshot is None:
+            break
+        plot_snapshot(snapshot, vis_path)
+    return
+
+
+cdef class VisualizationOutput:
+    @cython.wraparound(True)
+    def __init__(self, dict namelist):
+        self.uuid = str(namelist['meta']['uuid'])
+        outpath = str(os.path.join(namelist['output']['output_root'] + 'Output.' + namelist['meta']['simname'] + '.' + self.uuid[-5:]))
+        self.vis_path = str(os.path.join(outpath, 'Visualization'))
+
+        try:
+            self.frequency = namelist['visualization']['frequency']
+            self.do_vis = True
+        except:
+            self.frequency = 1.0e20
+            self.do_vis = False
+        try:
+            self.queue_size = namelist['visualization']['queue_size']
+        except:
+            self.queue_size = 2
+
+        self.last_vis_time = 0.0
+        self.queue = None
+        self.worker = None
+        self.synchronous = False
+        return
+
+    cpdef initialize(self):
+        if not self.do_vis:
+            return
+        try:
+            os.makedirs(self.vis_path)
+        except:
+            pass
+        # daemonic processes are not allowed to have children
+        self.synchronous = multiprocessing.current_process().daemon
+        if self.synchronous:
+            return
+        self.queue = multiprocessing.Queue(maxsize=self.queue_size)
+        self.worker = multiprocessing.Process(target=plot_worker, args=(self.queue, self.vis_path))
+        self.worker.daemon = True
+        self.worker.start()
+        return
+
+    cpdef update(self, Grid Gr, TimeStepping TS, MeanVariables M1):
+        # called after the tendencies of the first RK stage are computed
+        if not self.do_vis or TS.rk_step != 0 or TS.t < self.last_vis_time + self.frequency:
+            return
+        self.last_vis_time = TS.t
+
+        # copies of the plotted variables only (the views are overwritten by the next stage)
+        snapshot = {'t': TS.t, 'z': np.array(Gr.z), 'values': {}, 'tendencies': {}}
+        for var in plot_vars:
+            snapshot['values'][var] = np.array(M1.get_variable_array(var, Gr))
+            snapshot['tendencies'][var] = np.array(M1.get_tendency_array(var, Gr))
+        if self.synchronous:
+            plot_snapshot(snapshot, self.vis_path)
+            return
+        try:
+            self.queue.put_nowait(snapshot)
+        except:
+            Log.warning('VisualizationOutput: worker busy, skipping output at t = ' + str(TS.t), 'vis_skip')
+        return
+
+    cpdef VisualizationOutput branch(self, Py_ssize_t member):
+        # figures of a forked member go to Visualization/member_<i>
+        cdef VisualizationOutput VO = VisualizationOutput.__new__(VisualizationOutput)
+        VO.uuid = self.uuid
+        VO.vis_path = str(os.path.join(self.vis_path, 'member_' + str(member)))
+        VO.frequency = self.frequency
+        VO.do_vis = self.do_vis
+        VO.queue_size = self.queue_size
+        VO.last_vis_time = self.last_vis_time
+        VO.queue = None
+        VO.worker = None
+        VO.initialize()
+        return VO
+
+    cpdef finish(self):
+        # render the remaining snapshots and stop the worker
+        if self.worker is not None:
+            self.queue.put(None)
+            self.worker.join()
+            self.worker = None
+        return
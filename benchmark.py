@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import sys
+import copy
+import time
+import timeit
+import shutil
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+
+import generate_namelist
+
+'''
+    Benchmarks of the compiled modules (python setup.py build_ext --inplace)
+
+    usage: python benchmark.py [--nz 20,50,100,200,500,1000,2000] [--ncol 1] [--n_scalars 0,4] [--lookup cubic]
+                               [--kernels advection_momentum,eos] [--cases Test,DCBLSoares] [--output results.json]
+                               [--compare results_old.json] [--validate reference_state]
+
+    (1) kernels: every kernel is timed in isolation on a synthetic state (case Test with the given nz / ncol, a
+        domain height of lz_kernels for all nz and n_scalars additional passive scalars in M1); no stats file is written
+        - best and median time per call of repeat rounds, each of number calls (number chosen such that a round
+          takes at least min_time)
+    (2) full step: Simulation1d.initialize and Simulation1d.run for the given cases (in a temporary directory, without
+        restart and visualization output), with the per-component timers (Timers.pyx)
+    (3) the results are written as json (with git commit, host and versions); with --compare, the ratio
+        old / new of the kernel times and of the time per step is printed for the entries in both files
+    (4) validations (--validate, before the benchmarks):
+        - reference_state: reference profiles of the rk4 integrator against odeint (hmax = 1 m) for every nz of the
+          kernel benchmarks, with the surface values of the case Test and with a moist surface (qt = 20 g/kg); the
+          largest relative difference of each profile over the interior levels has to be below validate_tolerance
+'''
+
+kernel_names = ['reference_state', 'reference_state_cached', 'eos', 'saturation_adjustment',
+                'saturation_adjustment_warm', 'advection_momentum', 'advection_scalar', 'advect_M2_local',
+                'turbulence_workspace', 'closure_terms', 'state_update']
+validation_names = ['reference_state']
+# domain height of the kernel benchmarks (m): nz only changes the resolution (the reference state of the Test case is
+# not valid above ~20 km)
+lz_kernels = 3000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='Benchmark')
+    parser.add_argument('--nz', default='20,50,100,200,500,1000,2000', help='column sizes of the kernel benchmarks')
+    parser.add_argument('--ncol', default='1', help='number of columns of the kernel benchmarks')
+    parser.add_argument('--n_scalars', default='0', help='number of additional passive scalars in M1')
+    parser.add_argument('--lookup', default='analytic',
+                        help='latent heat / pv_star in the kernel benchmarks: analytic, linear or cubic')
+    parser.add_argument('--kernels', default=','.join(kernel_names), help='kernels to time')
+    parser.add_argument('--cases', default='Test,DCBLSoares', help='cases of the full step benchmark (none: skip)')
+    parser.add_argument('--t_max', type=float, default=None, help='simulation time of the full step benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='number of rounds per kernel')
+    parser.add_argument('--min_time', type=float, default=0.05, help='minimum wall clock time of a round (s)')
+    parser.add_argument('--output', default=None, help='json file (default: benchmark_<commit>.json)')
+    parser.add_argument('--compare', default=None, help='json file of a previous benchmark')
+    parser.add_argument('--validate', default='', help='validations to run before the benchmarks: reference_state')
+    parser.add_argument('--validate_tolerance', type=float, default=1e-6,
+                        help='largest relative difference of the reference profiles (rk4 against odeint)')
+    args = parser.parse_args()
+
+    results = {'meta': get_meta(), 'validation': [], 'kernels': [], 'full_step': []}
+
+    kernels = [name for name in args.kernels.split(',') if name]
+    for name in kernels:
+        if name not in kernel_names:
+            print('Not a valid kernel name: ' + name + ' (' + ', '.join(kernel_names) + ')')
+            sys.exit()
+    validations = [name for name in args.validate.split(',') if name]
+    for name in validations:
+        if name not in validation_names:
+            print('Not a valid validation name: ' + name + ' (' + ', '.join(validation_names) + ')')
+            sys.exit()
+
+    if 'reference_state' in validations:
+        for nz in parse_ints(args.nz):
+            results['validation'] += validate_reference_state(nz, args.lookup, args.validate_tolerance)
+
+    for ncol in parse_ints(args.ncol):
+        for n_scalars in parse_ints(args.n_scalars):
+            for nz in parse_ints(args.nz):
+                results['kernels'] += benchmark_kernels(nz, ncol, n_scalars, args.lookup, kernels, args.repeat,
+                                                        args.min_time)
+
+    if args.cases.lower() != 'none':
+        for case_name in args.cases.split(','):
+            results['full_step'].append(benchmark_full_step(case_name, args.t_max))
+
+    output = args.output
+    if output is None:
+        output = 'benchmark_' + str(results['meta']['commit']) + '.json'
+    fh = open(output, 'w')
+    json.dump(results, fh, sort_keys=True, indent=4)
+    fh.close()
+    print('Benchmark: results written to ' + output)
+
+    if args.compare is not None:
+        compare(json.loads(open(args.compare).read()), results)
+    return
+
+
+def parse_ints(values):
+    return [int(v) for v in values.split(',') if v]
+
+
+def get_meta():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        commit = 'unknown'
+    return {'commit': commit, 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'host': platform.node(),
+            'machine': platform.machine(), 'python': platform.python_version(), 'numpy': np.__version__}
+
+
+def time_call(func, repeat, min_time):
+    # number of calls per round such that a round takes at least min_time (after one warm-up call)
+    func()
+    number = 1
+    while True:
+        t = timeit.timeit(func, number=number)
+        if t >= min_time or number >= 2**20:
+            break
+        number *= 2
+    times = np.array(timeit.repeat(func, repeat=repeat, number=number)) / number
+    return {'number': number, 'repeat': repeat, 'best': float(np.amin(times)), 'median': float(np.median(times))}
+
+
+def kernel_namelist(nz, ncol, lookup):
+    namelist = generate_namelist.Test()
+    namelist['meta']['uuid'] = '00000-benchmark'
+    namelist['grid']['nz'] = nz
+    namelist['grid']['dz'] = lz_kernels / nz
+    namelist['grid']['ncol'] = ncol
+    namelist['logging']['level'] = 'warning'
+    namelist['timers']['enabled'] = False
+    namelist.pop('visualization', None)
+    namelist['restart']['output'] = False
+    namelist['thermodynamics'] = {'lookup': lookup}
+    # the reference_state kernel times the integration: no cache (reference_state_cached times a cache hit)
+    namelist['reference_state']['cache_size'] = 0
+    namelist['reference_state'].pop('cache_dir', None)
+    return namelist
+
+
+def setup_state(namelist, n_scalars):
+    '''
+    Synthetic state for the kernel benchmarks: the components of Simulation1d with the variables and initial profiles
+    of the case, but with a stats object that only registers the variables (no output directory, no file)
+    '''
+    import Simulation1d
+    import NetCDFIO
+
+    Sim = Simulation1d.Simulation1d(namelist)
+    Sim.StatsIO = NetCDFIO.NetCDFIO_Stats()
+    Sim.StatsIO.deferred = True
+
+    Sim.add_variables()
+    for i in range(n_scalars):
+        Sim.M1.add_variable('scalar_' + str(i), '-', "scalar")
+    Sim.Th.initialize(Sim.Gr, Sim.M1, Sim.M2)
+    Sim.PV.initialize(Sim.Gr, Sim.StatsIO)
+    Sim.M1.initialize(Sim.Gr, Sim.StatsIO)
+    Sim.M2.initialize(Sim.Gr, Sim.StatsIO)
+    Sim.TS.initialize(namelist, Sim.M1, Sim.M2)
+    Sim.Init.initialize_reference(Sim.Gr, Sim.Ref, Sim.StatsIO)
+    Sim.Init.initialize_profiles(Sim.Gr, Sim.Ref, Sim.M1, Sim.M2, Sim.StatsIO)
+    Sim.MA.initialize(Sim.Gr, Sim.M1)
+    Sim.SA.initialize(Sim.Gr, Sim.M1)
+    Sim.Turb.initialize(Sim.Gr, Sim.M1, Sim.M2)
+    return Sim
+
+
+def get_kernel(name, Sim, namelist):
+    import NetCDFIO
+    import ReferenceState
+    import thermodynamic_functions
+
+    if name == 'reference_state':
+        def kernel():
+            NS = NetCDFIO.NetCDFIO_Stats()
+            NS.deferred = True
+            Sim.Ref.initialize(Sim.Gr, NS)
+    elif name == 'reference_state_cached':
+        # in-process cache; the first call fills it
+        namelist_cached = copy.deepcopy(namelist)
+        namelist_cached['reference_state']['cache_size'] = 16
+        Ref = ReferenceState.ReferenceState(Sim.Gr, namelist_cached)
+        Ref.Pg, Ref.Tg, Ref.qtg, Ref.u0, Ref.v0 = Sim.Ref.Pg, Sim.Ref.Tg, Sim.Ref.qtg, Sim.Ref.u0, Sim.Ref.v0
+        def kernel():
+            NS = NetCDFIO.NetCDFIO_Stats()
+            NS.deferred = True
+            Ref.initialize(Sim.Gr, NS)
+    elif name == 'eos':
+        # one call per level of the column (as in the integration of the hydrostatic equation)
+        p0_half = np.array(Sim.Ref.p0_half)
+        qtg = Sim.Ref.qtg
+        sg = thermodynamic_functions.entropy_from_tp(Sim.Ref.Pg, Sim.Ref.Tg, qtg, 0.0, 0.0)
+        def kernel():
+            for k in range(Sim.Gr.nzg):
+                thermodynamic_functions.eos(p0_half[k], qtg, sg)
+    elif name == 'saturation_adjustment' or name == 'saturation_adjustment_warm':
+        # eos_profile on all columns of a (mostly) saturated synthetic state: qt = 20 g/kg, entropy of the surface air;
+        # warm: started from the temperatures of the previous call
+        p0_half = np.array(Sim.Ref.p0_half)
+        n = Sim.Gr.ncol * Sim.Gr.nzg
+        p0 = np.tile(p0_half, Sim.Gr.ncol)
+        qt = np.full(n, 0.02)
+        s = np.full(n, thermodynamic_functions.entropy_from_tp(Sim.Ref.Pg, Sim.Ref.Tg, 0.02, 0.0, 0.0))
+        T = np.zeros(n)
+        ql = np.zeros(n)
+        warm_start = name == 'saturation_adjustment_warm'
+        def kernel():
+            thermodynamic_functions.eos_profile(p0, qt, s, T, ql, warm_start)
+    elif name == 'advection_momentum':
+        def kernel():
+            Sim.MA.update_M1_2nd(Sim.Gr, Sim.Ref, Sim.M1)
+    elif name == 'advection_scalar':
+        def kernel():
+            Sim.SA.update_M1_2nd(Sim.Gr, Sim.Ref, Sim.M1)
+    elif name == 'advect_M2_local':
+        def kernel():
+            Sim.Turb.advect_M2_local(Sim.Gr, Sim.M1, Sim.M2)
+    elif name == 'turbulence_workspace':
+        def kernel():
+            Sim.Turb.workspace.update(Sim.Gr, Sim.M1, Sim.M2)
+    elif name == 'closure_terms':
+        def kernel():
+            Sim.Turb.closure_terms(Sim.Gr, Sim.M1, Sim.M2)
+    elif name == 'state_update':
+        # first Runge-Kutta stage (the time is only advanced in the last stage)
+        def kernel():
+            Sim.TS.rk_step = 0
+            Sim.TS.update(Sim.Gr, Sim.M1, Sim.M2)
+    return kernel
+
+
+def validate_reference_state(nz, lookup, tolerance):
+    '''
+    Reference profiles of the rk4 integrator against odeint (hmax = 1 m) on the grid of the kernel benchmarks:
+    largest difference over the interior levels relative to the largest magnitude of the odeint profile
+    '''
+    import NetCDFIO
+    import ReferenceState
+
+    surfaces = {'Test': None, 'moist': (1.0e5, 300.0, 0.02)}
+    names = ['p0', 'p0_half', 'alpha0', 'alpha0_half', 'temperature0_half', 'ql0_half', 'qv0_half']
+
+    results = []
+    for surface in sorted(surfaces):
+        profiles = {}
+        for integrator in ('rk4', 'odeint'):
+            namelist = kernel_namelist(nz, 1, lookup)
+            namelist['reference_state']['integrator'] = integrator
+            Sim = setup_state(namelist, 0)
+            if surfaces[surface] is not None:
+                Ref = ReferenceState.ReferenceState(Sim.Gr, namelist)
+                Ref.set_surface(*surfaces[surface])
+                NS = NetCDFIO.NetCDFIO_Stats()
+                NS.deferred = True
+                Ref.initialize(Sim.Gr, NS)
+            else:
+                Ref = Sim.Ref
+            interior = slice(Sim.Gr.gw, Sim.Gr.nzg - Sim.Gr.gw)
+            profiles[integrator] = dict((name, np.array(getattr(Ref, name))[interior]) for name in names)
+
+        res = {'validation': 'reference_state', 'surface': surface, 'nz': nz, 'lookup': lookup, 'tolerance': tolerance}
+        for name in names:
+            scale = np.amax(np.abs(profiles['odeint'][name]))
+            diff = np.amax(np.abs(profiles['rk4'][name] - profiles['odeint'][name]))
+            res[name] = float(diff / scale) if scale > 0.0 else float(diff)
+        res['passed'] = all(res[name] <= tolerance for name in names)
+        results.append(res)
+        print('{:<32s} nz={:<6d} surface={:<8s} '.format('reference_state rk4/odeint', nz, surface)
+              + ' '.join('{}={:.1e}'.format(name, res[name]) for name in names)
+              + ('  passed' if res['passed'] else '  FAILED'))
+    return results
+
+
+def benchmark_kernels(nz, ncol, n_scalars, lookup, kernels, repeat, min_time):
+    namelist = kernel_namelist(nz, ncol, lookup)
+    Sim = setup_state(namelist, n_scalars)
+
+    results = []
+    for name in kernels:
+        res = time_call(get_kernel(name, Sim, namelist), repeat, min_time)
+        res.update({'kernel': name, 'nz': nz, 'ncol': ncol, 'n_scalars': n_scalars, 'lookup': lookup,
+                    'nv_M1': Sim.M1.nv, 'nv_M2': Sim.M2.nv})
+        results.append(res)
+        print('{:<32s} nz={:<6d} ncol={:<4d} n_scalars={:<4d} best={:.3e} s  median={:.3e} s'.format(
+            name, nz, ncol, n_scalars, res['best'], res['median']))
+    return results
+
+
+def benchmark_full_step(case_name, t_max):
+    '''
+    Simulation1d.initialize and Simulation1d.run of a case in a temporary directory; the time per step is the wall
+    clock time of run divided by the number of time steps
+    '''
+    import Simulation1d
+    import ReferenceState
+
+    try:
+        namelist = getattr(generate_namelist, case_name)()
+    except (AttributeError, TypeError):
+        print('Not a valid case name (only cases without additional arguments can be benchmarked): ' + case_name)
+        sys.exit()
+
+    namelist = copy.deepcopy(namelist)
+    namelist['meta']['simname'] = 'benchmark_' + case_name
+    namelist['meta']['uuid'] = '00000-benchmark'
+    namelist['output']['output_root'] = './'
+    namelist['restart']['output'] = False
+    namelist['restart']['init_from'] = False
+    namelist.pop('visualization', None)
+    namelist['timers'] = {'enabled': True}
+    if 'logging' not in namelist:
+        namelist['logging'] = {}
+    namelist['logging']['level'] = 'warning'
+    if t_max is not None:
+        namelist['time_stepping']['t_max'] = t_max
+
+    cwd = os.getcwd()
+    tmpdir = tempfile.mkdtemp(prefix='scm_benchmark_')
+    try:
+        # NetCDFIO_Stats copies ./<simname>.in into the output directory
+        os.chdir(tmpdir)
+        fh = open(namelist['meta']['simname'] + '.in', 'w')
+        json.dump(namelist, fh, sort_keys=True, indent=4)
+        fh.close()
+
+        # initialize includes the integration of the reference state (not profiles cached by the kernel benchmarks)
+        ReferenceState.reference_cache.clear()
+        Sim = Simulation1d.Simulation1d(namelist)
+        t0 = timeit.default_timer()
+        Sim.initialize(namelist)
+        t1 = timeit.default_timer()
+        Sim.run()
+        t2 = timeit.default_timer()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    res = {'case': case_name, 'nz': Sim.Gr.nz, 'ncol': Sim.Gr.ncol, 't_max': Sim.TS.t_max, 'nstep': Sim.TS.nstep,
+           'initialize': t1 - t0, 'run': t2 - t1, 'per_step': (t2 - t1) / max(Sim.TS.nstep, 1),
+           'timers': Sim.Timers.results()}
+    print('{:<32s} nz={:<6d} nstep={:<6d} initialize={:.3e} s  run={:.3e} s  per step={:.3e} s'.format(
+        case_name, res['nz'], res['nstep'], res['initialize'], res['run'], res['per_step']))
+    return res
+
+
+def compare(old, new):
+    print('Benchmark: ' + str(old['meta']['commit']) + ' --> ' + str(new['meta']['commit']) + ' (ratio old/new)')
+
+    def key(res):
+        return (res['kernel'], res['nz'], res['ncol'], res['n_scalars'], res.get('lookup', 'analytic'))
+    old_kernels = dict((key(res), res) for res in old['kernels'])
+    for res in new['kernels']:
+        if key(res) in old_kernels:
+            print('{:<32s} nz={:<6d} ncol={:<4d} n_scalars={:<4d} {:8.2f}'.format(
+                res['kernel'], res['nz'], res['ncol'], res['n_scalars'], old_kernels[key(res)]['best'] / res['best']))
+
+    old_steps = dict((res['case'], res) for res in old['full_step'])
+    for res in new['full_step']:
+        if res['case'] in old_steps:
+            print('{:<32s} per step {:8.2f}'.format(res['case'], old_steps[res['case']]['per_step'] / res['per_step']))
+    return
+
+
+if __name__ == '__main__':
+    main()
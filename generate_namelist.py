@@ -1208,6 +1208,7 @@ def DCBLSoares():
     namelist['grid']['nz'] = 150    # IOP
     namelist['grid']['gw'] = 3      # for 2nd order
     namelist['grid']['dz'] = 25.0   # IOP
+    namelist['grid']['ncol'] = 1    # number of independent columns integrated together
 
     namelist['mpi'] = {}
     namelist['mpi']['nprocz'] = 1
@@ -1251,6 +1252,13 @@ def DCBLSoares():
     namelist['damping']['Rayleigh']['gamma_r'] = 0.02
     namelist['damping']['Rayleigh']['z_d'] = 800.0  # ??? depth of damping layer?
 
+    namelist['turbulence'] = {}
+    namelist['turbulence']['scheme'] = '2nd_order'
+    namelist['turbulence']['pressure'] = 'none'          # pressure closure: 'Andre' or 'none'
+    namelist['turbulence']['dissipation'] = 'none'       # dissipation closure: 'Kolmogorov' or 'none'
+    namelist['turbulence']['length_scale'] = 100.0       # asymptotic turbulent length scale l_inf (m)
+    namelist['turbulence']['relaxation'] = 'exponential'  # M2 relaxation terms: 'exponential' or 'explicit'
+
     namelist['output'] = {}
     namelist['output']['output_root'] = './'
 
@@ -1320,6 +1328,8 @@ def DCBLSoares_moist():
 
     namelist['thermodynamics'] = {}
     namelist['thermodynamics']['latentheat'] = 'constant'       # 'constant' or 'variable', for Clausius Clapeyron calculation
+    namelist['thermodynamics']['lookup'] = 'cubic'      # latent heat and pv_star: 'analytic', 'linear' or 'cubic' (lookup tables)
+    namelist['thermodynamics']['lookup_dT'] = 0.1       # spacing of the lookup tables (K)
 
     namelist['microphysics'] = {}
     namelist['microphysics']['scheme'] = 'None_SA'     # DCBL: 'None_Dry', Bomex: 'None_SA'; options: 'None_Dry' (no qt as Progn. Var.), 'None_SA', 'SB_Liquid'
@@ -1398,6 +1408,7 @@ def Test():
     namelist['grid']['nz'] = 20
     namelist['grid']['gw'] = 3
     namelist['grid']['dz'] = 25.0
+    namelist['grid']['ncol'] = 1
 
     namelist['mpi'] = {}
     namelist['mpi']['nprocz'] = 1
@@ -1416,6 +1427,8 @@ def Test():
     namelist['sgs']['UniformViscosity']['diffusivity'] = 3.6
 
     namelist['diffusion'] = {}
+    namelist['diffusion']['implicit'] = True       # implicit vertical diffusion of M1 and M2 (ImplicitDiffusion)
+    namelist['diffusion']['implicit_theta'] = 1.0  # 1.0: backward Euler; 0.5: Crank-Nicolson
 
     namelist['momentum_transport'] = {}
     namelist['momentum_transport']['order'] = 2
@@ -1424,10 +1437,20 @@ def Test():
 
     namelist['turbulence'] = {}
     namelist['turbulence']['scheme'] = '2nd_order'
+    namelist['turbulence']['pressure'] = 'none'          # pressure closure: 'Andre' or 'none'
+    namelist['turbulence']['dissipation'] = 'none'       # dissipation closure: 'Kolmogorov' or 'none'
+    namelist['turbulence']['length_scale'] = 100.0       # asymptotic turbulent length scale l_inf (m)
+    namelist['turbulence']['relaxation'] = 'exponential'  # M2 relaxation terms: 'exponential' or 'explicit'
 
     namelist['output'] = {}
     namelist['output']['output_root'] = './'
 
+    namelist['restart'] = {}
+    namelist['restart']['output'] = True
+    namelist['restart']['init_from'] = False
+    namelist['restart']['input_path'] = './'
+    namelist['restart']['frequency'] = 600.0
+
     # profile outputs
     namelist['stats_io'] = {}
     namelist['stats_io']['stats_dir'] = 'stats'
@@ -1441,6 +1464,18 @@ def Test():
     namelist['visualization'] = {}
     namelist['visualization']['frequency'] = 1800.0
 
+    namelist['logging'] = {}
+    namelist['logging']['level'] = 'info'       # 'debug', 'info', 'warning', 'error'
+    namelist['logging']['min_interval'] = 0.0   # minimum wall clock time (s) between repeated messages
+
+    namelist['timers'] = {}
+    namelist['timers']['enabled'] = True        # wall clock time per component of the time loop
+
+    namelist['reference_state'] = {}
+    namelist['reference_state']['integrator'] = 'rk4'   # hydrostatic reference pressure: 'rk4' or 'odeint'
+    namelist['reference_state']['tolerance'] = 1.0e-8   # rk4: step doubling tolerance in log(p)
+    namelist['reference_state']['cache_size'] = 16  # in-process cache of reference profiles (0: off)
+
     namelist['microphysics'] = {}
     namelist['microphysics']['scheme'] = 'None_Dry'
 
@@ -20,13 +20,36 @@ def main():
 
 
 def main1d(namelist):
+    # returns the paths of the stats files written by the simulation (and its forked members)
     import Simulation1d
 
     Simulation = Simulation1d.Simulation1d(namelist)
     Simulation.initialize(namelist)
-    Simulation.run()
 
-    return
+    # optional: spin up once, then branch perturbed members from the spun-up state
+    try:
+        n_members = namelist['fork']['n_members']
+    except:
+        n_members = 0
+
+    if n_members > 0:
+        t_max = Simulation.TS.t_max
+        Simulation.TS.t_max = namelist['fork']['t_spinup']
+        Simulation.run()
+        Simulation.TS.t_max = t_max
+        try:
+            seed = namelist['fork']['seed']
+        except:
+            seed = 0
+        stats_files = [Simulation.StatsIO.path_plus_file]
+        for Member in Simulation.fork(namelist, n_members, seed):
+            Member.run()
+            stats_files.append(Member.StatsIO.path_plus_file)
+    else:
+        Simulation.run()
+        stats_files = [Simulation.StatsIO.path_plus_file]
+
+    return stats_files
 
 
 if __name__ == "__main__":
@@ -45,6 +45,11 @@ else:
     print('Unknown system platform: ' + sys.platform  + 'or unknown system name: ' + platform.node())
     sys.exit()
 
+_ext = Extension('Logger', ['Logger.pyx'], include_dirs=include_path,
+                 extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
+                 runtime_library_dirs=library_dirs)
+extensions.append(_ext)
+
 _ext = Extension('Simulation1d', ['Simulation1d.pyx'], include_dirs=include_path,
                      extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
                      runtime_library_dirs=library_dirs)
@@ -65,6 +70,21 @@ _ext = Extension('NetCDFIO', ['NetCDFIO.pyx'], include_dirs=include_path,
                  runtime_library_dirs=library_dirs)
 extensions.append(_ext)
 
+_ext = Extension('Timers', ['Timers.pyx'], include_dirs=include_path,
+                 extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
+                 runtime_library_dirs=library_dirs)
+extensions.append(_ext)
+
+_ext = Extension('Restart', ['Restart.pyx'], include_dirs=include_path,
+                 extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
+                 runtime_library_dirs=library_dirs)
+extensions.append(_ext)
+
+_ext = Extension('VisualizationOutput', ['VisualizationOutput.pyx'], include_dirs=include_path,
+                 extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
+                 runtime_library_dirs=library_dirs)
+extensions.append(_ext)
+
 _ext = Extension('PrognosticVariables', ['PrognosticVariables.pyx'], include_dirs=include_path,
                  extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
                  runtime_library_dirs=library_dirs)
@@ -91,6 +111,11 @@ _ext = Extension('ThermodynamicsSA', ['ThermodynamicsSA.pyx'], include_dirs=incl
 extensions.append(_ext)
 
 
+_ext = Extension('Lookup', ['Lookup.pyx'], include_dirs=include_path,
+                 extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
+                 runtime_library_dirs=library_dirs)
+extensions.append(_ext)
+
 _ext = Extension('thermodynamic_functions', ['thermodynamic_functions.pyx'], include_dirs=include_path,
                  extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
                  runtime_library_dirs=library_dirs)
@@ -122,6 +147,16 @@ _ext = Extension('ScalarDiffusion', ['ScalarDiffusion.pyx'], include_dirs=includ
                  runtime_library_dirs=library_dirs)
 extensions.append(_ext)
 
+_ext = Extension('SparseSolvers', ['SparseSolvers.pyx'], include_dirs=include_path,
+                 extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
+                 runtime_library_dirs=library_dirs)
+extensions.append(_ext)
+
+_ext = Extension('ImplicitDiffusion', ['ImplicitDiffusion.pyx'], include_dirs=include_path,
+                 extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
+                 runtime_library_dirs=library_dirs)
+extensions.append(_ext)
+
 _ext = Extension('SGS', ['SGS.pyx'], include_dirs=include_path,
                  extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
                  runtime_library_dirs=library_dirs)
@@ -182,11 +217,6 @@ extensions.append(_ext)
 #                  runtime_library_dirs=library_dirs)
 # extensions.append(_ext)
 #
-# _ext = Extension('SparseSolvers', ['SparseSolvers.pyx'], include_dirs=include_path,
-#                  extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
-#                  runtime_library_dirs=library_dirs)
-# extensions.append(_ext)
-#
 
 #
 
@@ -196,11 +226,6 @@ extensions.append(_ext)
 #                  runtime_library_dirs=library_dirs)
 # extensions.append(_ext)
 #
-# _ext = Extension('Lookup', ['Lookup.pyx'], include_dirs=include_path,
-#                  extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
-#                  runtime_library_dirs=library_dirs)
-# extensions.append(_ext)
-#
 
 #
 # _ext = Extension('Surface', ['Surface.pyx'], include_dirs=include_path,
@@ -248,15 +273,6 @@ extensions.append(_ext)
 #                  runtime_library_dirs=library_dirs)
 # extensions.append(_ext)
 #
-# _ext = Extension('Restart', ['Restart.pyx'], include_dirs=include_path,
-#                  extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
-#                  runtime_library_dirs=library_dirs)
-# extensions.append(_ext)
-#
-# _ext = Extension('VisualizationOutput', ['VisualizationOutput.pyx'], include_dirs=include_path,
-#                  extra_compile_args=extra_compile_args, libraries=libraries, library_dirs=library_dirs,
-#                  runtime_library_dirs=library_dirs)
-# extensions.append(_ext)
 
 
 ## Bettina
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import copy
+import hashlib
+import itertools
+import multiprocessing
+import ast
+from sys import exit
+
+import generate_namelist
+
+'''
+    Parameter sweeps over a generated namelist
+
+    usage: python sweep.py <case_name or namelist.in> --param sgs.UniformViscosity.viscosity=0.5,1.0,2.0
+                           --param time_stepping.cfl_limit=0.3,0.5 --nprocs 4
+
+    - every combination of the --param values is one member of the sweep; members are run in a process pool
+    - a member is identified by a hash of its namelist (without uuid / output paths), which is also used as its uuid,
+      so that the output directory of a member is the same in every invocation of the sweep
+    - a member is skipped if its output directory contains the 'sweep.done' flag (written after Simulation.run returns,
+      it holds the uuid and the paths of the stats files of the member), so rerunning a partially finished sweep only
+      runs the missing members
+    - a member that was interrupted resumes from the latest checkpoint in its Restart directory (restart.output must be
+      set for checkpoints to be written); without a checkpoint it starts again from t = 0 and overwrites its stats file
+'''
+
+# namelist entries that do not change the result of a simulation and are therefore excluded from the hash
+hash_exclude = [('meta', 'uuid'), ('meta', 'simname'), ('output', 'output_root'), ('reference_state', 'cache_dir')]
+done_file = 'sweep.done'
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='Sweep')
+    parser.add_argument('case_name', help='case name as in generate_namelist.py or path to a namelist file (.in)')
+    parser.add_argument('--param', action='append', default=[],
+                        help='namelist entry and values to sweep over, e.g. sgs.UniformViscosity.viscosity=0.5,1.0')
+    parser.add_argument('--nprocs', type=int, default=multiprocessing.cpu_count(),
+                        help='number of processes in the pool')
+    parser.add_argument('--output_root', default='./sweep/', help='root directory for the outputs of all members')
+    args = parser.parse_args()
+
+    namelist_base = get_base_namelist(args.case_name)
+    params = [parse_param(p) for p in args.param]
+    members = generate_members(namelist_base, params, args.output_root)
+
+    # skip the members that finished in a previous invocation of the sweep
+    todo = [nml for nml in members if not is_done(nml)]
+    print('Sweep: ' + str(len(members)) + ' members, ' + str(len(members) - len(todo)) + ' already done')
+
+    if not os.path.exists(args.output_root):
+        os.makedirs(args.output_root)
+    write_index(members, params, args.output_root)
+
+    if len(todo) > 0:
+        pool = multiprocessing.Pool(processes=min(args.nprocs, len(todo)), maxtasksperchild=1)
+        for simname, status in pool.imap_unordered(run_member, todo):
+            print('Sweep: ' + simname + ' ' + status)
+        pool.close()
+        pool.join()
+        # add the stats files of the members that finished now
+        write_index(members, params, args.output_root)
+
+    return
+
+
+def get_base_namelist(case_name):
+    if case_name.endswith('.in'):
+        return json.loads(open(case_name).read())
+    try:
+        case = getattr(generate_namelist, case_name)
+        return case()
+    except (AttributeError, TypeError):
+        print('Not a valid case name (only cases without additional arguments can be swept): ' + case_name)
+        exit()
+
+
+def parse_param(param):
+    # 'a.b.c=1,2,3' --> (['a','b','c'], [1, 2, 3])
+    try:
+        key, values = param.split('=', 1)
+    except ValueError:
+        print('Sweep parameter must be given as key=value1,value2,...: ' + param)
+        exit()
+    return key.split('.'), [parse_value(v) for v in values.split(',')]
+
+
+def parse_value(value):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def set_entry(namelist, keys, value):
+    d = namelist
+    for key in keys[:-1]:
+        d = d.setdefault(key, {})
+    d[keys[-1]] = value
+    return
+
+
+def namelist_hash(namelist):
+    # canonical form: sorted keys, entries that do not affect the result removed
+    nml = copy.deepcopy(namelist)
+    for group, key in hash_exclude:
+        try:
+            del nml[group][key]
+        except KeyError:
+            pass
+    canonical = json.dumps(nml, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def generate_members(namelist_base, params, output_root):
+    members = []
+    keys = [p[0] for p in params]
+    for values in itertools.product(*[p[1] for p in params]):
+        nml = copy.deepcopy(namelist_base)
+        for k, v in zip(keys, values):
+            set_entry(nml, k, v)
+        key = namelist_hash(nml)
+        nml['meta']['uuid'] = key
+        nml['meta']['simname'] = namelist_base['meta']['simname'] + '_' + key[:8]
+        nml['output']['output_root'] = os.path.join(output_root, '')
+        # members with the same surface values and grid share the reference profiles
+        nml.setdefault('reference_state', {}).setdefault('cache_dir', os.path.join(output_root, 'ReferenceCache'))
+        members.append(nml)
+    return members
+
+
+def get_outpath(namelist):
+    # same convention as NetCDFIO_Stats.initialize
+    return str(os.path.join(namelist['output']['output_root'] + 'Output.' + namelist['meta']['simname'] + '.'
+                            + namelist['meta']['uuid'][-5:]))
+
+
+def is_done(namelist):
+    return os.path.exists(os.path.join(get_outpath(namelist), done_file))
+
+
+def get_stats_files(namelist):
+    # stats files recorded in the done flag of a finished member
+    try:
+        fh = open(os.path.join(get_outpath(namelist), done_file))
+        stats_files = json.load(fh)['stats']
+        fh.close()
+    except (IOError, ValueError, KeyError):
+        stats_files = []
+    return stats_files
+
+
+def get_checkpoint_path(namelist):
+    # Restart directory of an interrupted member if it contains a checkpoint (same convention as Restart.__init__)
+    restart_path = os.path.join(get_outpath(namelist), 'Restart')
+    if os.path.isdir(restart_path) and any(f.endswith('.bin') for f in os.listdir(restart_path)):
+        return restart_path
+    return None
+
+
+def write_index(members, params, output_root):
+    # overview of all members and their parameter values
+    index = {}
+    for nml in members:
+        entry = {}
+        for keys, values in params:
+            d = nml
+            for key in keys:
+                d = d[key]
+            entry['.'.join(keys)] = d
+        entry['outpath'] = get_outpath(nml)
+        entry['stats'] = get_stats_files(nml)
+        index[nml['meta']['simname']] = entry
+    fh = open(os.path.join(output_root, 'sweep_index.json'), 'w')
+    json.dump(index, fh, sort_keys=True, indent=4)
+    fh.close()
+    return
+
+
+def run_member(namelist):
+    import main as main_
+
+    simname = namelist['meta']['simname']
+    # resume an interrupted member from its latest checkpoint
+    checkpoint_path = get_checkpoint_path(namelist)
+    stats_files = []
+    if checkpoint_path is not None:
+        # the statistics up to the checkpoint stay in the stats files of the interrupted attempts; the resumed run
+        # writes to a new file Stats.<simname>.Restart_<i>.nc
+        stats_path = os.path.join(get_outpath(namelist), namelist['stats_io']['stats_dir'])
+        stats_files = sorted([os.path.join(stats_path, f) for f in os.listdir(stats_path)
+                              if f.startswith('Stats.' + simname + '.') and f.endswith('.nc')], key=os.path.getmtime)
+        namelist = copy.deepcopy(namelist)
+        namelist.setdefault('restart', {})['init_from'] = True
+        namelist['restart']['input_path'] = checkpoint_path
+
+    # NetCDFIO_Stats copies ./<simname>.in into the output directory
+    fh = open(simname + '.in', 'w')
+    json.dump(namelist, fh, sort_keys=True, indent=4)
+    fh.close()
+
+    # the model stops with sys.exit() (SystemExit) on invalid input and NaNs: report the member as failed, otherwise
+    # the pool never receives a result for this task
+    try:
+        stats_files += main_.main1d(namelist)
+    except (Exception, SystemExit) as e:
+        return simname, 'failed: ' + repr(e)
+
+    fh = open(os.path.join(get_outpath(namelist), done_file), 'w')
+    json.dump({'uuid': namelist['meta']['uuid'], 'stats': stats_files}, fh, indent=4)
+    fh.close()
+    if checkpoint_path is not None:
+        return simname, 'done (resumed from ' + checkpoint_path + ')'
+    return simname, 'done'
+
+
+if __name__ == '__main__':
+    main()
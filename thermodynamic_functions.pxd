@@ -3,6 +3,14 @@ cdef struct eos_struct:
     double T
     double ql
 
+cpdef double entropy_from_tp(double p0, double T, double qt, double ql, double qi) nogil
+cpdef double alpha_from_tp(double p0, double T, double  qt, double qv) nogil
+cpdef double latent_heat(double T) nogil
+cpdef double pv_star(double T) nogil
+cdef Py_ssize_t eos_c(double p0, double qt, double prog, double T_guess, eos_struct *ret) nogil
+cpdef Py_ssize_t eos_profile(double [:] p0, double [:] qt, double [:] prog, double [:] T, double [:] ql,
+                             bint warm_start) nogil
+
 cdef extern from "thermodynamic_functions.h":
     inline double theta_c(const double p0, const double T) nogil
     inline double thetali_c(const double p0, const double T, const double qt, const double ql, const double qi, const double L) nogil
@@ -1,27 +1,97 @@
 include "parameters.pxi"
+import sys
 import numpy as np
 cimport numpy as np
 from libc.math cimport sqrt, log, fabs,atan, exp, fmax, pow
+cimport Lookup
+from Lookup cimport lookup_struct, lookup_linear, lookup_cubic
+
+'''
+Latent heat and saturation vapour pressure (namelist['thermodynamics']['lookup']):
+    - 'analytic' (default): latent_heat_analytic (cubic polynomial) and pv_star_analytic (Magnus formula)
+    - 'linear' / 'cubic': interpolation in tables of the analytic functions for lookup_T_min <= T <= lookup_T_max
+      with spacing lookup_dT (default 0.1 K), built in configure(namelist); outside of the table range the
+      first / last interval is extrapolated
+    latent_heat and pv_star (nogil) select between the two; lookup_accuracy() reports the interpolation errors
+'''
+
+cdef Py_ssize_t eos_max_iter = 50     # saturation adjustment
+cdef double lookup_T_min = 150.0
+cdef double lookup_T_max = 350.0
+cdef int lookup_order = 0           # 0: analytic, 1: linear, 3: cubic
+cdef str lookup_name = 'analytic'
+cdef Lookup.Lookup LH_table = None
+cdef Lookup.Lookup pv_star_table = None
+cdef lookup_struct *LH_ls = NULL
+cdef lookup_struct *pv_star_ls = NULL
+
+cpdef configure(namelist):
+    global lookup_order, lookup_name, LH_table, pv_star_table, LH_ls, pv_star_ls
+    cdef double dT
+
+    try:
+        scheme = namelist['thermodynamics']['lookup']
+    except:
+        scheme = 'analytic'
+    try:
+        dT = namelist['thermodynamics']['lookup_dT']
+    except:
+        dT = 0.1
+
+    if scheme == 'analytic':
+        lookup_order = 0
+        lookup_name = 'analytic'
+        return
+    elif scheme == 'linear':
+        order = 1
+    elif scheme == 'cubic':
+        order = 3
+    else:
+        print('Not a valid thermodynamics lookup: ' + str(scheme) + ' (analytic, linear, cubic)')
+        sys.exit()
+
+    LH_table = Lookup.Lookup(order)
+    LH_table.initialize_function(latent_heat_analytic, lookup_T_min, lookup_T_max, dT)
+    pv_star_table = Lookup.Lookup(order)
+    pv_star_table.initialize_function(pv_star_analytic, lookup_T_min, lookup_T_max, dT)
+    LH_ls = &LH_table.ls
+    pv_star_ls = &pv_star_table.ls
+    lookup_order = order
+    lookup_name = scheme + ', dT = ' + repr(dT)
+
+    for name, acc in sorted(lookup_accuracy().items()):
+        print('Lookup ' + name + ' (' + scheme + ', dT = ' + str(dT) + ' K): max abs error = '
+              + str(acc['max_abs_error']) + ', max rel error = ' + str(acc['max_rel_error']))
+    return
+
+cpdef str lookup_config():
+    return lookup_name
+
+cpdef dict lookup_accuracy(Py_ssize_t n_test=100001):
+    # errors of the lookup tables with respect to the analytic functions in [lookup_T_min, lookup_T_max]
+    if lookup_order == 0:
+        return {}
+    return {'latent_heat': LH_table.accuracy(latent_heat_analytic, n_test),
+            'pv_star': pv_star_table.accuracy(pv_star_analytic, n_test)}
 
 '''Pressure'''
-cpdef double pv_c(double p0, double qt, double qv):
-    a = p0 * eps_vi * qv /(1.0 - qt + eps_vi * qv)
-    # print('pv_c: ', p0, qt, qv, a)
+cpdef double pv_c(double p0, double qt, double qv) nogil:
+    # print('pv_c: ', p0, qt, qv)
     return p0 * eps_vi * qv /(1.0 - qt + eps_vi * qv)
 
 
 '''entropies'''
-cpdef double sd_c(double pd, double T):
-    return sd_tilde + cpd*np.log(T/T_tilde) -Rd*np.log(pd/p_tilde)
+cpdef double sd_c(double pd, double T) nogil:
+    return sd_tilde + cpd*log(T/T_tilde) -Rd*log(pd/p_tilde)
 
-cpdef double sv_c(double pv, double T):
+cpdef double sv_c(double pv, double T) nogil:
     # !! Problem: sv_c(pv, T) is ill-defined for qv=0, since pv_c(p0, qt, qv)~log(pv)=inf
-    return sv_tilde + cpv*np.log(T/T_tilde) - Rv * np.log(pv/p_tilde)
+    return sv_tilde + cpv*log(T/T_tilde) - Rv * log(pv/p_tilde)
 
-cpdef double sc_c(double L, double T):
+cpdef double sc_c(double L, double T) nogil:
     return -L/T
 
-cpdef double entropy_from_tp(double p0, double T, double qt, double ql, double qi):
+cpdef double entropy_from_tp(double p0, double T, double qt, double ql, double qi) nogil:
     cdef:
         double qv = qt - ql - qi
         double qd = 1.0 - qt
@@ -39,7 +109,7 @@ cpdef double entropy_from_tp(double p0, double T, double qt, double ql, double q
     return ret
 
 '''Density'''
-cpdef double alpha_from_tp(double p0, double T, double  qt, double qv):
+cpdef double alpha_from_tp(double p0, double T, double  qt, double qv) nogil:
     return (Rd * T)/p0 * (1.0 - qt + eps_vi * qv)
 # cpdef inline double alpha(const double p0, const double T, const double qt, const double qv) nogil:
 #     return alpha_c(p0, T, qt, qv)
@@ -48,15 +118,29 @@ cpdef double alpha_from_tp(double p0, double T, double  qt, double qv):
 
 
 '''Clausius Clapeyron: Latent Heat, Saturation Pressure'''
-cpdef double latent_heat(double T):
+cpdef double latent_heat_analytic(double T) nogil:
     cdef double TC = T - 273.15
     return (2500.8 - 2.36 * TC + 0.0016 * TC *
             TC - 0.00006 * TC * TC * TC) * 1000.0
 
-cpdef double pv_star(double T)   :
+cpdef double pv_star_analytic(double T) nogil:
     #    Magnus formula
     cdef double TC = T - 273.15
-    return 6.1094*exp((17.625*TC)/float(TC+243.04))*100
+    return 6.1094*exp((17.625*TC)/(TC+243.04))*100
+
+cpdef double latent_heat(double T) nogil:
+    if lookup_order == 1:
+        return lookup_linear(LH_ls, T)
+    elif lookup_order == 3:
+        return lookup_cubic(LH_ls, T)
+    return latent_heat_analytic(T)
+
+cpdef double pv_star(double T) nogil:
+    if lookup_order == 1:
+        return lookup_linear(pv_star_ls, T)
+    elif lookup_order == 3:
+        return lookup_cubic(pv_star_ls, T)
+    return pv_star_analytic(T)
 
 
 
@@ -66,90 +150,93 @@ cpdef double pv_star(double T)   :
 
 
 '''Saturation Adjustment'''
-cpdef double eos_first_guess_thetal(double s, double pd, double pv, double qt)   :
+cpdef double eos_first_guess_thetal(double s, double pd, double pv, double qt) nogil:
     cdef double p0 = pd + pv
     return s * exner_c(p0)
 
-cpdef double eos_first_guess_entropy(double s, double pd, double pv, double qt )   :
-    ## PROBLEM: nan in a, b=inf
+cpdef double eos_first_guess_entropy(double s, double pd, double pv, double qt ) nogil:
+    ## PROBLEM: nan if s small (s=0.005) or qv < 0 (pv > p0 --> pd < 0)
     cdef double qd = 1.0 - qt
-    a = (T_tilde * exp((s - qd*(sd_tilde - Rd *log(pd/p_tilde))
-                              - qt * (sv_tilde - Rv * log(pv/p_tilde)))/((qd*cpd + qt * cpv))))
-    b = T_tilde * exp(s - qd*(sd_tilde - Rd *log(pd/p_tilde)))
-    c = qd*(sd_tilde - Rd *log(pd/p_tilde))
-    # if np.isnan(a):
-        # print('')
-        # print('eos first guess: ', a, b, c, s)
-        # a = nan if s small (s=0.005), qt = 6900 ~ -qv
-        # ???? qt = 6900 ??? qv < 0 ???
-        # print('qt', qt, 'qd', qd)
-        # print(qt, qd, s, T_tilde, sd_tilde, Rd, Rv, pv, p_tilde)
-        # print(log(pv/p_tilde), cpd, cpv)
-        # print('')
-        # print('')
     return (T_tilde *exp((s - qd*(sd_tilde - Rd *log(pd/p_tilde))
                               - qt * (sv_tilde - Rv * log(pv/p_tilde)))/((qd*cpd + qt * cpv))))
 
-# cpdef eos_struct eos( t_to_prog, prog_to_t,double p0, double qt, double prog):
-cpdef eos_struct eos(double p0, double qt, double prog):
-# cpdef eos(double p0, double qt, double prog):
-    cdef double qv = qt
-    # cdef double ql = 0.0
-    # cdef double T = 0.0
-    cdef eos_struct _ret    # ql = _ret['ql'], T = _ret['T']
-
-    cdef double pv_1 = pv_c(p0,qt,qt)
-    cdef double pd_1 = p0 - pv_1
-    # cdef double T_1 = prog_to_t(prog, pd_1, pv_1, qt)
-    cdef double T_1 = eos_first_guess_entropy(prog, pd_1, pv_1, qt)
-
-    cdef double pv_star_1 = pv_star(T_1)
-    cdef double qv_star_1 = qv_star_c(p0,qt,pv_star_1)
+cdef Py_ssize_t eos_c(double p0, double qt, double prog, double T_guess, eos_struct *ret) nogil:
+    '''
+    Saturation adjustment: T and ql from p0, qt and the entropy prog (secant iteration on prog - s(T)).
+    T_guess > 0 (e.g. the temperature of the previous time step): if the level is saturated at T_guess, the iteration
+    starts from T_guess and a Newton estimate instead of the dry first guess
+    :return: number of iterations (0 if unsaturated)
+    '''
+    cdef:
+        double pv_1 = pv_c(p0,qt,qt)
+        double pd_1 = p0 - pv_1
+        double T_1 = eos_first_guess_entropy(prog, pd_1, pv_1, qt)
+        double qv_star_1 = qv_star_c(p0,qt,pv_star(T_1))
+        double ql_1, f_1, T_2, T_n, L
+        double qv_star_2, ql_2, f_2
+        Py_ssize_t iter = 0
 
-    cdef double ql_1, prog_1, f_1, T_2, delta_T
-    cdef double qv_star_2, ql_2=0.0, pv_star_2, pv_2, pd_2, prog_2, f_2
     # If not saturated
-
-    # if np.isnan(T_1):
-        # print('T_1', T_1, eos_first_guess_entropy(prog, pd_1, pv_1, qt), prog, pd_1, pv_1, qt)
-        # print('pd_q', pd_1, 'pv_1', pv_1, p0, qt)
-        # ???? pv_1 > 250'000 --> pd_q < 0
     if(qt <= qv_star_1):
-        # print('unsaturated')
-        # T = T_1
-        # ql = 0.0
-        _ret.T = T_1
-        _ret.ql = 0.0
-
+        ret.T = T_1
+        ret.ql = 0.0
+        return iter
+
+    # condensation heats: the saturated temperature is above the dry first guess
+    if T_guess > T_1:
+        qv_star_2 = qv_star_c(p0,qt,pv_star(T_guess))
+    if T_guess > T_1 and qt > qv_star_2:
+        # warm start (ds/dT = c/T at saturation)
+        T_1 = T_guess
+        ql_1 = qt - qv_star_2
+        L = latent_heat(T_1)
+        f_1 = prog - entropy_from_tp(p0, T_1, qt, ql_1, 0.0)
+        T_2 = T_1 + f_1 * T_1 / ((1.0 - qt)*cpd + qv_star_2 * cpv + ql_1 * cl + L * L * qv_star_2 / (Rv * T_1 * T_1))
     else:
         ql_1 = qt - qv_star_1
-        prog_1 = entropy_from_tp(p0, T_1, qt, ql_1, 0.0)
-        f_1 = prog - prog_1
+        f_1 = prog - entropy_from_tp(p0, T_1, qt, ql_1, 0.0)
         T_2 = T_1 + ql_1 * latent_heat(T_1) /((1.0 - qt)*cpd + qv_star_1 * cpv)
-        delta_T  = fabs(T_2 - T_1)
-
-        while delta_T > 1.0e-3 or ql_2 < 0.0:
-            pv_star_2 = pv_star(T_2)
-            qv_star_2 = qv_star_c(p0,qt,pv_star_2)
-            pv_2 = pv_c(p0, qt, qv_star_2)
-            pd_2 = p0 - pv_2
-            ql_2 = qt - qv_star_2
-            prog_2 =  entropy_from_tp(p0, T_2, qt, ql_2, 0.0)
-            f_2 = prog - prog_2
-            T_n = T_2 - f_2*(T_2 - T_1)/(f_2 - f_1)
-            T_1 = T_2
-            T_2 = T_n
-            f_1 = f_2
-            delta_T  = fabs(T_2 - T_1)
-
-        _ret.T  = T_2
-        # T = T_2
-        qv = qv_star_2
-        _ret.ql = ql_2
-        # ql = ql_2
 
+    while True:
+        qv_star_2 = qv_star_c(p0,qt,pv_star(T_2))
+        ql_2 = qt - qv_star_2
+        f_2 = prog - entropy_from_tp(p0, T_2, qt, ql_2, 0.0)
+        iter += 1
+        if (fabs(T_2 - T_1) <= 1.0e-3 and ql_2 >= 0.0) or iter >= eos_max_iter or f_2 == f_1:
+            break
+        T_n = T_2 - f_2*(T_2 - T_1)/(f_2 - f_1)
+        T_1 = T_2
+        T_2 = T_n
+        f_1 = f_2
+
+    ret.T = T_2
+    ret.ql = ql_2
+    return iter
+
+cpdef eos_struct eos(double p0, double qt, double prog):
+    cdef eos_struct _ret    # ql = _ret['ql'], T = _ret['T']
+    eos_c(p0, qt, prog, 0.0, &_ret)
     return _ret
-    # return T, ql
+
+cpdef Py_ssize_t eos_profile(double [:] p0, double [:] qt, double [:] prog, double [:] T, double [:] ql,
+                             bint warm_start) nogil:
+    '''
+    Saturation adjustment of a column: T and ql are written to the caller-owned arrays; with warm_start, T holds
+    the temperatures of the previous call (T <= 0: cold start at this level)
+    :return: total number of iterations
+    '''
+    cdef:
+        Py_ssize_t k, iterations = 0
+        double T_guess = 0.0
+        eos_struct ret
+
+    for k in xrange(p0.shape[0]):
+        if warm_start:
+            T_guess = T[k]
+        iterations += eos_c(p0[k], qt[k], prog[k], T_guess, &ret)
+        T[k] = ret.T
+        ql[k] = ret.ql
+    return iterations
 
 
 